@@ -16,8 +16,10 @@ If not, see <http://www.gnu.org/licenses/>.
 """
 
 import argparse
+import os
 import pathlib
 import sys
+from .fastq_writer import find_shard_files
 from .help_formatter import MyParser, MyHelpFormatter
 from .version import __version__
 from .misc import bold, str_is_int, str_is_dna_sequence
@@ -31,7 +33,11 @@ def main(output=sys.stderr):
     if args.subparser_name == 'simulate':
         check_simulate_args(args)
         from .simulate import simulate
-        simulate(args, output=output)
+        if args.quiet:
+            with open(os.devnull, 'wt') as null:
+                simulate(args, output=null)
+        else:
+            simulate(args, output=output)
 
     elif args.subparser_name == 'error_model':
         from .error_model import make_error_model
@@ -41,6 +47,10 @@ def main(output=sys.stderr):
         from .qscore_model import make_qscore_model
         make_qscore_model(args, output=output)
 
+    elif args.subparser_name == 'compile_model':
+        from .compile_model import compile_model
+        compile_model(args, output=output)
+
     elif args.subparser_name == 'plot':
         from .plot_window_identity import plot_window_identity
         plot_window_identity(args)
@@ -55,6 +65,7 @@ def parse_args(args):
     simulate_subparser(subparsers)
     error_model_subparser(subparsers)
     qscore_model_subparser(subparsers)
+    compile_model_subparser(subparsers)
     plot_subparser(subparsers)
 
     longest_choice_name = max(len(c) for c in subparsers.choices)
@@ -106,9 +117,51 @@ def simulate_subparser(subparsers):
     sim_args.add_argument('--qscore_model', type=str, default='nanopore2023',
                           help='Can be "nanopore2018", "nanopore2020", "nanopore2023", '
                                '"pacbio2016", "pacbio2021", "random", "ideal" or a model filename')
+    sim_args.add_argument('--engine', type=str, default='standard',
+                          help='Error-adding engine: "standard" (one k-mer at a time) or "fast" '
+                               '(vectorised batches of k-mers, default: DEFAULT)')
+    sim_args.add_argument('--read_alignment', type=str, default='edlib',
+                          help='How reads are aligned to their fragments for qscores and '
+                               'identity: "edlib" (a full alignment) or "edits" (built from the '
+                               'added errors, faster but gives slightly lower identities, default: '
+                               'DEFAULT)')
+    sim_args.add_argument('--ref_cache', action='store_true',
+                          help='Store the reference in a 2-bit cache file next to the reference '
+                               'and read fragments from it (saves memory and loading time for '
+                               'large references)')
     sim_args.add_argument('--seed', type=int,
                           help='Random number generator seed for deterministic output (default: '
                                'different output each time)')
+    sim_args.add_argument('--threads', type=int, default=1,
+                          help='Number of worker processes used to generate reads and threads '
+                               'used to compress .gz output (output is the same for any number '
+                               'of threads, default: DEFAULT)')
+
+    output_args = group.add_argument_group('Output')
+    output_args.add_argument('--output', type=str,
+                             help='Write reads to this FASTQ file, BGZF-compressed if it ends '
+                                  'in .gz (default: stdout)')
+    output_args.add_argument('--output_buffer', type=int,
+                             default=settings.OUTPUT_BUFFER_SIZE // 1024,
+                             help='Size (in kB) of the buffer that reads are collected in before '
+                                  'writing (0 writes each read immediately, default: DEFAULT)')
+    output_args.add_argument('--output_dir', type=str,
+                             help='Instead of one file, write reads to FASTQ files in this '
+                                  'directory, each renamed from a hidden name once complete')
+    output_args.add_argument('--reads_per_file', type=int, default=4000,
+                             help='Number of reads in each --output_dir file (default: DEFAULT)')
+    output_args.add_argument('--compress_shards', action='store_true',
+                             help='BGZF-compress the --output_dir files (default: uncompressed '
+                                  '.fastq files)')
+    output_args.add_argument('--report', type=str,
+                             help='Write a JSON report of the time spent in each stage of the '
+                                  'simulation and counts of hot-loop events to this file')
+    output_args.add_argument('--checkpoint', action='store_true',
+                             help='Regularly save progress next to the output, so the run can be '
+                                  'continued with --resume if stopped')
+    output_args.add_argument('--resume', action='store_true',
+                             help='Continue a checkpointed run where it stopped, or extend a '
+                                  'finished one to a larger --quantity (other settings must match)')
 
     problem_args = group.add_argument_group('Adapters',
                                             description='Controls adapter sequences on the start '
@@ -141,6 +194,9 @@ def simulate_subparser(subparsers):
                                    'included regardless of fragment length)')
 
     other_args = group.add_argument_group('Other')
+    other_args.add_argument('--quiet', action='store_true',
+                            help='Don\'t print anything to stderr, including progress (default: '
+                                 'print settings and progress)')
     other_args.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
                             help='Show this help message and exit')
     other_args.add_argument('--version', action='version', version='Badread v' + __version__,
@@ -209,6 +265,25 @@ def qscore_model_subparser(subparsers):
                             help="Show program's version number and exit")
 
 
+def compile_model_subparser(subparsers):
+    group = subparsers.add_parser('compile_model',
+                                  description='Compile a Badread model for faster loading',
+                                  formatter_class=MyHelpFormatter, add_help=False)
+
+    required_args = group.add_argument_group('Required arguments')
+    required_args.add_argument('--model', type=str, required=True,
+                               help='Error or qscore model made by badread error_model or '
+                                    'badread qscore_model (can be gzipped)')
+    required_args.add_argument('--output', type=str, required=True,
+                               help='Filename for the compiled model (e.g. model.npz)')
+
+    other_args = group.add_argument_group('Other')
+    other_args.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                            help='Show this help message and exit')
+    other_args.add_argument('--version', action='version', version='Badread v' + __version__,
+                            help="Show program's version number and exit")
+
+
 def plot_subparser(subparsers):
     group = subparsers.add_parser('plot', description='View read identities over a sliding window',
                                   formatter_class=MyHelpFormatter, add_help=False)
@@ -236,6 +311,22 @@ def plot_subparser(subparsers):
                             help="Show program's version number and exit")
 
 
+def get_simulate_args(reference, **options):
+    """
+    Returns checked simulate arguments for using Badread from Python (see simulate.Simulator).
+    Options are named like the command-line options (e.g. error_model='pacbio2021'), and any not
+    given take their command-line defaults.
+    """
+    args = parse_args(['simulate', '--reference', str(reference), '--quantity', ''])
+    args.quantity = None
+    for name, value in options.items():
+        if name in ['subparser_name', 'reference'] or name not in vars(args):
+            sys.exit(f'Error: {name} is not a simulate option')
+        setattr(args, name, value)
+    check_simulate_args(args)
+    return args
+
+
 def check_simulate_args(args):
     if not pathlib.Path(args.reference).is_file():
         sys.exit(f'Error: {args.reference} is not a file')
@@ -254,6 +345,39 @@ def check_simulate_args(args):
         sys.exit(f'Error: {args.qscore_model} is not a file\n'
                  f'  --qscore_model must be from {qscore_model_names} or a filename')
 
+    if args.engine not in ['standard', 'fast']:
+        sys.exit('Error: --engine must be either standard or fast')
+    if args.read_alignment not in ['edits', 'edlib']:
+        sys.exit('Error: --read_alignment must be either edits or edlib')
+
+    if args.threads < 1:
+        sys.exit('Error: --threads must be at least 1')
+
+    if args.output is not None:
+        output_dir = pathlib.Path(args.output).parent
+        if not output_dir.is_dir():
+            sys.exit(f'Error: directory {output_dir} does not exist')
+        if pathlib.Path(args.output).resolve() == pathlib.Path(args.reference).resolve():
+            sys.exit('Error: --output cannot be the same file as --reference')
+    if args.output_buffer < 0:
+        sys.exit('Error: --output_buffer cannot be negative')
+    if args.output_dir is not None:
+        if args.output is not None:
+            sys.exit('Error: --output and --output_dir cannot both be used')
+        if pathlib.Path(args.output_dir).exists():
+            if not pathlib.Path(args.output_dir).is_dir():
+                sys.exit(f'Error: {args.output_dir} is not a directory')
+            if find_shard_files(args.output_dir) and not args.resume:
+                sys.exit(f'Error: {args.output_dir} already contains read files')
+    if args.reads_per_file < 1:
+        sys.exit('Error: --reads_per_file must be at least 1')
+    if args.report is not None and not pathlib.Path(args.report).resolve().parent.is_dir():
+        sys.exit('Error: directory for --report does not exist')
+    if (args.checkpoint or args.resume) and args.output is None and args.output_dir is None:
+        sys.exit('Error: --checkpoint and --resume need --output or --output_dir')
+    if args.resume and args.output is not None and not pathlib.Path(args.output).is_file():
+        sys.exit(f'Error: cannot resume because {args.output} does not exist')
+
     if args.chimeras > 50:
         sys.exit('Error: --chimeras cannot be greater than 50')
     if args.junk_reads > 100:
@@ -0,0 +1,97 @@
+"""
+This module contains code for checkpointing simulate runs, so a run which was stopped can be
+continued (with --resume) and a finished run can be extended to a larger --quantity. Since each
+read's random numbers come from its own stream of the base seed (see rng.py), the random state
+which needs saving is just the base seed and the index of the next read. The checkpoint also holds
+the read count, the amount of sequence made and the state of the output file(s).
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import json
+import os
+import sys
+import time
+from .version import __version__
+from . import settings
+
+
+# The settings which affect the output and so must be the same when resuming a run. Others (like
+# --quantity and --threads) can change.
+CHECKPOINT_ARGS = ['reference', 'mean_frag_length', 'frag_length_stdev', 'mean_identity',
+                   'max_identity', 'identity_stdev', 'error_model', 'qscore_model', 'engine',
+                   'read_alignment', 'seed', 'start_adapter', 'end_adapter', 'start_adapter_seq',
+                   'end_adapter_seq', 'junk_reads', 'random_reads', 'chimeras', 'glitch_rate',
+                   'glitch_size', 'glitch_skip', 'small_plasmid_bias', 'output', 'output_dir',
+                   'reads_per_file', 'compress_shards']
+
+
+class Checkpointer(object):
+    """
+    Saves a checkpoint whenever settings.CHECKPOINT_INTERVAL seconds have passed since the last.
+    The settings are the run's as given (from get_checkpoint_settings), before setup changes any
+    (e.g. replacing a random adapter length with the adapter), as that's what a resume compares.
+    """
+    def __init__(self, args, base_seed, run_settings):
+        self.filename = get_checkpoint_filename(args)
+        self.base_seed = base_seed
+        self.settings = run_settings
+        self.last_save = time.monotonic()
+
+    def save_if_due(self, next_index, count, total_size, writer):
+        if time.monotonic() - self.last_save >= settings.CHECKPOINT_INTERVAL:
+            self.save(next_index, count, total_size, writer)
+
+    def save(self, next_index, count, total_size, writer):
+        checkpoint = {'version': __version__, 'settings': self.settings,
+                      'base_seed': self.base_seed, 'next_index': next_index, 'count': count,
+                      'total_size': total_size, 'output': writer.checkpoint()}
+        # Written to a temporary file first, so a stop mid-save can't lose the last checkpoint.
+        temp_filename = self.filename + '.temp'
+        with open(temp_filename, 'wt') as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, self.filename)
+        self.last_save = time.monotonic()
+
+
+def get_checkpoint_filename(args):
+    if args.output_dir is not None:
+        return os.path.join(args.output_dir, '.badread_checkpoint')
+    return args.output + '.checkpoint'
+
+
+def get_checkpoint_settings(args):
+    return {name: getattr(args, name) for name in CHECKPOINT_ARGS}
+
+
+def load_checkpoint(args):
+    """
+    Returns the checkpoint for resuming this run, after making sure it matches the run's settings.
+    """
+    filename = get_checkpoint_filename(args)
+    try:
+        with open(filename, 'rt') as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        sys.exit(f'Error: could not find a checkpoint to resume from ({filename})')
+    except (OSError, ValueError):
+        sys.exit(f'Error: could not read checkpoint file {filename}')
+    if checkpoint.get('version') != __version__:
+        sys.exit(f'Error: {filename} was made by a different version of Badread')
+    changed = [name for name, value in get_checkpoint_settings(args).items()
+               if checkpoint['settings'].get(name) != value]
+    if changed:
+        sys.exit(f'Error: settings have changed since the checkpoint was made '
+                 f'({", ".join(changed)})')
+    return checkpoint
@@ -0,0 +1,47 @@
+"""
+This module contains code for Badread's compile_model subcommand, which converts a text error or
+qscore model into a binary (NumPy .npz) model. Compiled models hold the k-mer alternatives already
+aligned to their k-mers, so they load much faster than text models.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+from .error_model import ErrorModel
+from .misc import get_open_func, is_compiled_model
+from .qscore_model import QScoreModel
+
+
+def compile_model(args, output=sys.stderr):
+    if is_compiled_model(args.model):
+        sys.exit(f'Error: {args.model} is already a compiled model')
+    model_type = get_text_model_type(args.model)
+    if model_type == 'error':
+        model = ErrorModel(args.model, output)
+    else:
+        model = QScoreModel(args.model, output)
+    model.save_compiled_file(args.output)
+    print(f'\nSaved compiled {model_type} model to {args.output}\n', file=output)
+
+
+def get_text_model_type(filename):
+    """
+    Error model lines start with a k-mer and its probability (e.g. 'ACGTACG,0.95;...'), while qscore
+    model lines start with a CIGAR and its count (e.g. '=X=;1000;...').
+    """
+    with get_open_func(filename)(filename, 'rt') as model_file:
+        first_field = model_file.readline().split(';', 1)[0]
+    if ',' in first_field:
+        return 'error'
+    elif first_field:
+        return 'qscore'
+    sys.exit(f'Error: {filename} does not seem to be a valid error or qscore model file')
@@ -18,14 +18,15 @@ If not, see <http://www.gnu.org/licenses/>.
 import collections
 import edlib
 import itertools
+import numpy as np
 import os
 import pathlib
-import random
 import re
 import sys
 from .alignment import load_alignments, align_sequences
 from .misc import load_fasta, load_fastq, reverse_complement, random_chance, get_random_base, \
-    get_random_different_base, get_open_func, check_alignment_matches_read_and_refs, only_acgt
+    get_random_different_base, get_open_func, check_alignment_matches_read_and_refs, only_acgt, \
+    is_compiled_model
 
 
 def make_error_model(args, output=sys.stderr, dot_interval=1000):
@@ -89,6 +90,8 @@ class ErrorModel(object):
         self.kmer_size = None
         self.alternatives = {}
         self.probabilities = {}
+        self.sampling_tables = {}
+        self.edit_tables = None
         this_script_dir = pathlib.Path(os.path.dirname(os.path.realpath(__file__)))
 
         if model_type_or_filename == 'random':
@@ -100,11 +103,15 @@ class ErrorModel(object):
         elif model_type_or_filename == 'nanopore2020':
             self.load_from_file(str(this_script_dir / 'error_models' / 'nanopore2020.gz'), output)
         elif model_type_or_filename == 'nanopore2023':
-            self.load_from_file(str(this_script_dir / 'error_models' / 'nanopore2023.gz'), output)
+            self.load_from_compiled_file(str(this_script_dir / 'error_models' /
+                                             'nanopore2023.npz'), output)
         elif model_type_or_filename == 'pacbio2016':
             self.load_from_file(str(this_script_dir / 'error_models' / 'pacbio2016.gz'), output)
         elif model_type_or_filename == 'pacbio2021':
-            self.load_from_file(str(this_script_dir / 'error_models' / 'pacbio2021.gz'), output)
+            self.load_from_compiled_file(str(this_script_dir / 'error_models' / 'pacbio2021.npz'),
+                                         output)
+        elif is_compiled_model(model_type_or_filename):
+            self.load_from_compiled_file(model_type_or_filename, output)
         else:
             self.load_from_file(model_type_or_filename, output)
 
@@ -128,49 +135,180 @@ class ErrorModel(object):
 
                 self.alternatives[kmer] = [align_kmers(kmer, x[0]) for x in alternatives]
                 self.probabilities[kmer] = [float(x[1]) for x in alternatives]
+                self.sampling_tables[kmer] = \
+                    make_sampling_table(self.alternatives[kmer], self.probabilities[kmer])
                 count += 1
         print(f'\r  done: loaded error distributions for {count} {self.kmer_size}-mers',
               file=output)
 
-    def add_errors_to_kmer(self, kmer):
+    def load_from_compiled_file(self, filename, output):
+        """
+        Loads a model made by badread compile_model, which holds the k-mer alternatives already
+        aligned to their k-mers.
+        """
+        print('\nLoading error model from {}'.format(filename), file=output)
+        self.type = 'model'
+        with np.load(filename) as model:
+            if str(model['model_type']) != 'error':
+                sys.exit(f'Error: {filename} is not a compiled error model')
+            self.kmer_size = int(model['kmer_size'])
+            kmers = model['kmers'].tolist()
+            alt_counts = model['alt_counts'].tolist()
+            probabilities = model['probabilities'].tolist()
+            alternatives = [alt.split(',') for alt in
+                            model['alternatives'].tobytes().decode().split(';')]
+        i = 0
+        for kmer, count in zip(kmers, alt_counts):
+            j = i + count
+            self.alternatives[kmer] = alternatives[i:j]
+            self.probabilities[kmer] = probabilities[i:j]
+            self.sampling_tables[kmer] = \
+                make_sampling_table(self.alternatives[kmer], self.probabilities[kmer])
+            i = j
+        print(f'  done: loaded error distributions for {len(kmers)} {self.kmer_size}-mers',
+              file=output)
+
+    def save_compiled_file(self, filename):
+        """
+        Saves the model in the binary format read by load_from_compiled_file.
+        """
+        kmers = list(self.alternatives.keys())
+
+        # The aligned alternatives are stored as text (e.g. 'A,C,GT,T;A,C,,T'), as fixed-width
+        # string arrays would waste space when there are long insertions.
+        alternatives = ';'.join(','.join(alt) for kmer in kmers
+                                for alt in self.alternatives[kmer])
+        with open(filename, 'wb') as model_file:
+            np.savez_compressed(model_file, model_type='error', kmer_size=self.kmer_size,
+                                kmers=np.array(kmers),
+                                alt_counts=np.array([len(self.alternatives[k]) for k in kmers]),
+                                probabilities=np.array([p for k in kmers
+                                                        for p in self.probabilities[k]]),
+                                alternatives=np.frombuffer(alternatives.encode(), dtype=np.uint8))
+
+    def add_errors_to_kmer(self, kmer, rng):
         """
         Takes a k-mer and returns a (possibly) mutated version of the k-mer, along with the edit
         distance.
         """
         if self.type == 'random':
-            return add_one_random_change(kmer)
-
-        if kmer not in self.alternatives:
-            return add_one_random_change(kmer)
-
-        alts = self.alternatives[kmer]
-        probs = self.probabilities[kmer]
+            return add_one_random_change(kmer, rng)
 
-        # The model probabilities for alternate k-mers should total to 1 or a bit less than 1.
-        # If less, then the remaining probability is given to random change.
-        random_change_prob = 1.0 - sum(probs)
-        if random_change_prob > 0.0:
-            alts.append(None)
-            probs.append(random_change_prob)
+        if kmer not in self.sampling_tables:
+            return add_one_random_change(kmer, rng)
 
-        alt = random.choices(alts, weights=probs)[0]
+        alts, cum_weights = self.sampling_tables[kmer]
+        alt = rng.weighted_choice(alts, cum_weights)
         if alt is None:
-            return add_one_random_change(kmer)
+            return add_one_random_change(kmer, rng)
         else:
             return alt
 
+    def get_edit_tables(self):
+        """
+        Returns the array-based version of this model used by the fast sequencing engine. It's
+        built on first use, as the standard engine doesn't need it.
+        """
+        if self.edit_tables is None:
+            self.edit_tables = EditTables(self)
+        return self.edit_tables
+
+
+class EditTables(object):
+    """
+    This class holds an error model in a form suited to vectorised sampling. Each of the 4^k
+    possible k-mers gets an integer code (two bits per base) and a row of cumulative alternative
+    probabilities. Each alternative is stored as the edits (k-mer offset, replacement string) which
+    turn the original k-mer into the alternative. Replacement strings are stored once in the reps
+    list and referred to by their index.
+    """
+    def __init__(self, error_model):
+        self.kmer_size = error_model.kmer_size
+        self.random_only = error_model.type == 'random'
+        self.kmer_weights = 4 ** np.arange(self.kmer_size - 1, -1, -1)
+
+        # The first entries in the replacement list are the ones needed for random changes:
+        # deletion, the four substitutions and the sixteen possible two-base insertions.
+        self.reps = [''] + list('ACGT') + [a + b for a in 'ACGT' for b in 'ACGT']
+        rep_ids = {r: i for i, r in enumerate(self.reps)}
+
+        if self.random_only:
+            self.errors_per_draw = 1.0
+            return
+
+        code_count = 4 ** self.kmer_size
+        max_alts = max(len(alts) for alts in error_model.alternatives.values())
+        self.cum_probs = np.zeros((code_count, max_alts))
+        self.alt_counts = np.zeros(code_count, dtype=np.int64)
+        self.edit_starts = np.zeros((code_count, max_alts), dtype=np.int64)
+        self.edit_counts = np.zeros((code_count, max_alts), dtype=np.int64)
+        edit_offsets, edit_reps, edit_weights = [], [], []
+        total_errors_per_draw = 0.0
+
+        for code, kmer in enumerate(itertools.product('ACGT', repeat=self.kmer_size)):
+            kmer = ''.join(kmer)
+            if kmer not in error_model.alternatives:
+                total_errors_per_draw += 1.0
+                continue  # all-zero cumulative probabilities mean a random change every time
+            alts_and_probs = list(zip(error_model.alternatives[kmer],
+                                      error_model.probabilities[kmer]))
+            probs = np.array([p for _, p in alts_and_probs])
+            total = max(probs.sum(), 1.0)
+            cum_probs = np.cumsum(probs) / total
+            self.cum_probs[code, :len(probs)] = cum_probs
+            self.cum_probs[code, len(probs):] = cum_probs[-1]
+            self.alt_counts[code] = len(probs)
+            total_errors_per_draw += 1.0 - cum_probs[-1]  # random change
+
+            for i, (alt, prob) in enumerate(alts_and_probs):
+                self.edit_starts[code, i] = len(edit_offsets)
+                for offset, (original_base, new_base) in enumerate(zip(kmer, alt)):
+                    if new_base == original_base:
+                        continue
+                    if new_base not in rep_ids:
+                        rep_ids[new_base] = len(self.reps)
+                        self.reps.append(new_base)
+                    edit_offsets.append(offset)
+                    edit_reps.append(rep_ids[new_base])
+                    edit_weights.append(1 if len(new_base) < 2 else len(new_base) - 1)
+                    total_errors_per_draw += edit_weights[-1] * prob / total
+                self.edit_counts[code, i] = len(edit_offsets) - self.edit_starts[code, i]
+
+        self.edit_offsets = np.array(edit_offsets, dtype=np.int64)
+        self.edit_reps = np.array(edit_reps, dtype=np.int64)
+        self.edit_weights = np.array(edit_weights, dtype=np.float64)
+
+        # The average number of errors added per randomly-positioned k-mer draw (assuming all
+        # k-mers are equally common), used to decide how many draws to make at once.
+        self.errors_per_draw = max(total_errors_per_draw / code_count, 0.001)
+
+
+def make_sampling_table(alts, probs):
+    """
+    Returns a k-mer's alternatives and their cumulative probabilities as tuples, ready to be used
+    with Rng.weighted_choice. The model probabilities for alternate k-mers should total to 1 or a bit
+    less than 1. If less, then the remaining probability is given to random change (represented by
+    None).
+    """
+    alts, cum_weights = list(alts), list(itertools.accumulate(probs))
+    random_change_prob = 1.0 - sum(probs)
+    if random_change_prob > 0.0:
+        alts.append(None)
+        cum_weights.append(cum_weights[-1] + random_change_prob)
+    return tuple(alts), tuple(cum_weights)
+
 
-def add_one_random_change(kmer):
+def add_one_random_change(kmer, rng):
     result = [x for x in kmer]  # Change 'ACGT' to ['A', 'C', 'G', 'T']
-    error_type = random.choice(['s', 'i', 'd'])
-    error_pos = random.randint(0, len(kmer) - 1)
+    error_type = rng.choice(['s', 'i', 'd'])
+    error_pos = rng.randint(0, len(kmer) - 1)
     if error_type == 's':  # substitution
-        result[error_pos] = get_random_different_base(result[error_pos])
+        result[error_pos] = get_random_different_base(result[error_pos], rng)
     elif error_type == 'i':  # insertion
-        if random_chance(0.5):
-            result[error_pos] = result[error_pos] + get_random_base()
+        if random_chance(0.5, rng):
+            result[error_pos] = result[error_pos] + get_random_base(rng)
         else:
-            result[error_pos] = get_random_base() + result[error_pos]
+            result[error_pos] = get_random_base(rng) + result[error_pos]
     else:  # deletion
         result[error_pos] = ''
     return result
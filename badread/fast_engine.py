@@ -0,0 +1,247 @@
+"""
+This module contains Badread's fast sequencing engine, an alternative to the sequence_fragment
+function in simulate.py. Instead of adding errors one k-mer at a time, it draws error positions in
+batches with NumPy and applies all of a batch's edits at once. It aims for the same target identity
+behaviour as the standard engine, but most of the per-error work happens in arrays instead of
+Python loops.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import edlib
+import numpy as np
+import time
+from .misc import get_random_sequence, identity_from_edlib_cigar
+from .qscore_model import get_qscores, cigar_from_edits
+from . import settings
+
+
+# Maps ASCII values to base codes: A=0, C=1, G=2, T=3 and anything else (e.g. N) = 4.
+BASE_CODES = np.full(256, 4, dtype=np.int64)
+for _i, _b in enumerate('ACGT'):
+    BASE_CODES[ord(_b)] = _i
+    BASE_CODES[ord(_b.lower())] = _i
+
+
+def sequence_fragment_fast(fragment, target_identity, error_model, qscore_model, rng,
+                           edlib_alignment=False, stats=None):
+    tables = error_model.get_edit_tables()
+
+    # Buffer the fragment a bit so errors can be added to the first and last bases.
+    k_size = tables.kmer_size
+    fragment = get_random_sequence(k_size, rng) + fragment + get_random_sequence(k_size, rng)
+    frag_len = len(fragment)
+    frag_codes = BASE_CODES[np.frombuffer(fragment.encode(), dtype=np.uint8)]
+
+    # For each base of the fragment, the index (in reps) of its replacement string, or -1 if the
+    # base is unchanged. The reps list is copied because random changes to non-ACGT bases can add
+    # new replacement strings.
+    changes = np.full(frag_len, -1, dtype=np.int64)
+    reps = list(tables.reps)
+
+    errors, raw_errors = 0.0, 0.0
+    change_count, draw_count, no_change_count = 0, 0, 0
+    max_kmer_index = frag_len - 1 - k_size
+    errors_needed = frag_len * (1.0 - target_identity)
+
+    # For the run report (see run_stats.py).
+    loop_start_time = time.perf_counter()
+    batch_count, alignment_count, alignment_time = 0, 0, 0.0
+
+    # The same stopping conditions as the standard engine: fewer than 1 error needed, too many
+    # draws, almost every base changed or the estimated identity has reached the target.
+    while errors_needed >= 0.5:
+        max_draws = 100 * frag_len - draw_count
+        if max_draws <= 0 or change_count > 0.9 * frag_len:
+            break
+        estimated_identity = 1.0 - (errors / frag_len)
+        if estimated_identity <= target_identity:
+            break
+
+        # Make enough draws to (probably) reach the target. Any draws past the point where the
+        # target is reached are thrown away, so overshooting the count doesn't matter much.
+        scale = estimated_identity ** 1.5
+        errors_per_draw = raw_errors / draw_count if raw_errors > 0.0 else tables.errors_per_draw
+        draws = int(1.25 * (errors_needed - errors) / (errors_per_draw * scale)) + 16
+        draws = min(draws, max_draws, settings.FAST_ENGINE_MAX_BATCH)
+        batch_count += 1
+        positions = rng.generator.integers(0, max_kmer_index + 1, size=draws)
+        edit_draws, edit_positions, edit_weights, edit_reps = \
+            draw_edits(tables, fragment, frag_codes, positions, reps, rng)
+
+        # A base can only be changed once, so edits on already-changed bases are dropped, as are
+        # edits on bases changed by an earlier draw in this batch.
+        kept = np.flatnonzero(changes[edit_positions] < 0)
+        _, first = np.unique(edit_positions[kept], return_index=True)
+        kept = np.sort(kept[first])
+
+        # Find the draw at which the target identity (or the change limit) is reached and drop
+        # everything after it.
+        kept_draws = edit_draws[kept]
+        draw_errors = np.bincount(kept_draws, weights=edit_weights[kept], minlength=draws)
+        cum_errors = np.cumsum(draw_errors)
+        cum_changes = change_count + np.cumsum(np.bincount(kept_draws, minlength=draws))
+        stop = np.flatnonzero((errors + cum_errors * scale >= errors_needed) |
+                              (cum_changes > 0.9 * frag_len))
+        last_draw = stop[0] if len(stop) > 0 else draws - 1
+        kept = kept[kept_draws <= last_draw]
+        changes[edit_positions[kept]] = edit_reps[kept]
+
+        previous_change_count = change_count
+        errors += cum_errors[last_draw] * scale
+        raw_errors += cum_errors[last_draw]
+        change_count = int(cum_changes[last_draw])
+        draw_count += last_draw + 1
+
+        # Draws which chose the unchanged k-mer made no edits (counted like the standard engine's).
+        used_edit_draws = edit_draws[:np.searchsorted(edit_draws, last_draw, side='right')]
+        no_change_count += last_draw + 1 - len(np.unique(used_edit_draws))
+
+        # Align pieces of the sequence to improve the identity estimate, as often (per change) as
+        # the standard engine does.
+        alignments = (change_count // settings.ALIGNMENT_INTERVAL -
+                      previous_change_count // settings.ALIGNMENT_INTERVAL)
+        alignment_start_time = time.perf_counter()
+        if alignments > 0 and frag_len <= settings.ALIGNMENT_SIZE:
+            alignment_count += 1
+            cigar = edlib.align(fragment, apply_changes(fragment, changes, reps, 0, frag_len),
+                                task='path')['cigar']
+            errors = (1.0 - identity_from_edlib_cigar(cigar)) * frag_len
+        elif alignments > 0:
+            alignment_count += alignments
+            for _ in range(alignments):
+                pos = rng.randint(0, frag_len - settings.ALIGNMENT_SIZE)
+                pos2 = pos + settings.ALIGNMENT_SIZE
+                cigar = edlib.align(fragment[pos:pos2],
+                                    apply_changes(fragment, changes, reps, pos, pos2),
+                                    task='path')['cigar']
+                estimated_errors = (1.0 - identity_from_edlib_cigar(cigar)) * frag_len
+                weight = settings.ALIGNMENT_SIZE / frag_len
+                errors = (estimated_errors * weight) + (errors * (1-weight))
+        alignment_time += time.perf_counter() - alignment_start_time
+
+    if stats is not None:
+        stats.add_time('sequence_fragment/error_loop', time.perf_counter() - loop_start_time)
+        stats.add_time('sequence_fragment/error_loop/edlib', alignment_time)
+        stats.add_count('kmer_draws', draw_count)
+        stats.add_count('no_change_kmer_draws', no_change_count)
+        stats.add_count('fast_engine_batches', batch_count)
+        stats.add_count('error_loop_edlib_alignments', alignment_count)
+        stats.add_count('base_changes', change_count)
+
+    start_trim = changed_length(changes, reps, 0, k_size)
+    end_trim = changed_length(changes, reps, frag_len - k_size, frag_len)
+
+    seq = apply_changes(fragment, changes, reps, 0, frag_len)
+    if edlib_alignment:
+        full_cigar = None
+    else:
+        changed = np.flatnonzero(changes >= 0)
+        full_cigar = cigar_from_edits(fragment, zip(changed.tolist(),
+                                                    (reps[r] for r in changes[changed].tolist())))
+    qual, actual_identity, identity_by_qscores = \
+        get_qscores(seq, fragment, qscore_model, rng, full_cigar, stats)
+    assert(len(seq) == len(qual))
+
+    seq = seq[start_trim:-end_trim]
+    qual = qual[start_trim:-end_trim]
+
+    return seq, qual, actual_identity, identity_by_qscores
+
+
+def draw_edits(tables, fragment, frag_codes, positions, reps, rng):
+    """
+    For each k-mer position, chooses an alternative k-mer from the error model (or a random change)
+    and returns the resulting edits as arrays: the draw each edit came from, the edit's fragment
+    position, its error count and its replacement string index. Edits are in draw order. Draws which
+    chose the unchanged k-mer produce no edits.
+    """
+    k_size = tables.kmer_size
+    windows = frag_codes[positions[:, None] + np.arange(k_size)]
+    if tables.random_only:
+        is_random = np.ones(len(positions), dtype=bool)
+    else:
+        # K-mers containing non-ACGT bases aren't in the model, so they get a random change.
+        codes = (windows & 3) @ tables.kmer_weights
+        draws = rng.generator.random(len(positions))
+        choices = (tables.cum_probs[codes] <= draws[:, None]).sum(axis=1)
+        is_random = (choices >= tables.alt_counts[codes]) | (windows == 4).any(axis=1)
+
+    # Edits from the model's alternative k-mers.
+    alt_draws = np.flatnonzero(~is_random)
+    if len(alt_draws) > 0:
+        alt_codes, alt_choices = codes[alt_draws], choices[alt_draws]
+        counts = tables.edit_counts[alt_codes, alt_choices]
+        starts = np.repeat(tables.edit_starts[alt_codes, alt_choices], counts)
+        offsets_in_alt = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        edit_indices = starts + offsets_in_alt
+        model_draws = np.repeat(alt_draws, counts)
+        model_positions = positions[model_draws] + tables.edit_offsets[edit_indices]
+        model_weights = tables.edit_weights[edit_indices]
+        model_reps = tables.edit_reps[edit_indices]
+    else:
+        model_draws = model_positions = model_reps = np.zeros(0, dtype=np.int64)
+        model_weights = np.zeros(0)
+
+    # Random changes: a substitution, insertion or deletion of one base in the k-mer. Each adds
+    # exactly one error.
+    random_draws = np.flatnonzero(is_random)
+    count = len(random_draws)
+    random_positions = positions[random_draws] + rng.generator.integers(0, k_size, size=count)
+    error_types = rng.generator.integers(0, 3, size=count)  # 0 = sub, 1 = ins, 2 = del
+    random_bases = rng.generator.integers(0, 4, size=count)
+    before = rng.generator.random(count) < 0.5
+    sub_shifts = rng.generator.integers(1, 4, size=count)
+    original_bases = frag_codes[random_positions]
+    sub_bases = np.where(original_bases < 4, (original_bases + sub_shifts) % 4, random_bases)
+    ins_reps = np.where(before, 5 + 4 * random_bases + original_bases % 4,
+                        5 + 4 * (original_bases % 4) + random_bases)
+    random_reps = np.where(error_types == 0, 1 + sub_bases,
+                           np.where(error_types == 1, ins_reps, 0))
+
+    # Insertions next to a non-ACGT base need a replacement string made the slow way.
+    for i in np.flatnonzero((error_types == 1) & (original_bases == 4)):
+        original_base = fragment[random_positions[i]]
+        new_base = 'ACGT'[random_bases[i]]
+        reps.append(new_base + original_base if before[i] else original_base + new_base)
+        random_reps[i] = len(reps) - 1
+
+    edit_draws = np.concatenate((model_draws, random_draws))
+    order = np.argsort(edit_draws, kind='stable')
+    return (edit_draws[order],
+            np.concatenate((model_positions, random_positions))[order],
+            np.concatenate((model_weights, np.ones(count)))[order],
+            np.concatenate((model_reps, random_reps))[order])
+
+
+def apply_changes(fragment, changes, reps, start, end):
+    """
+    Returns the error-added sequence for the given range of the original fragment.
+    """
+    changed = np.flatnonzero(changes[start:end] >= 0) + start
+    pieces, prev = [], start
+    for pos, rep in zip(changed.tolist(), changes[changed].tolist()):
+        pieces.append(fragment[prev:pos])
+        pieces.append(reps[rep])
+        prev = pos + 1
+    pieces.append(fragment[prev:end])
+    return ''.join(pieces)
+
+
+def changed_length(changes, reps, start, end):
+    """
+    Returns the length of the error-added sequence for the given range of the original fragment.
+    """
+    length = end - start
+    for rep in changes[start:end][changes[start:end] >= 0].tolist():
+        length += len(reps[rep]) - 1
+    return length
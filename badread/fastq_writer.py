@@ -0,0 +1,317 @@
+"""
+This module contains Badread's FASTQ output. Records are collected in a buffer and written in
+large chunks, which is much faster than writing each line of each read separately. Output to a
+.gz file is BGZF-compressed (like bgzip) on a pool of threads.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import base64
+import collections
+import concurrent.futures
+import os
+import re
+import struct
+import sys
+import zlib
+from . import settings
+
+
+# Each BGZF block holds at most this much uncompressed data (the same limit as bgzip), which keeps
+# the compressed block within the 64 kB BGZF limit.
+BGZF_BLOCK_SIZE = 65280
+
+# The empty block which marks the end of a BGZF file.
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+class FastqWriter(object):
+    """
+    Writes FASTQ records to a file (or stdout if no filename is given). Records are held until
+    the buffer reaches buffer_size bytes, so a buffer size of 0 writes each record immediately.
+    Use as a context manager, so the last records are written when done. A writer can continue
+    a file from the state returned by its checkpoint method (see checkpoint.py).
+    """
+    def __init__(self, filename=None, buffer_size=settings.OUTPUT_BUFFER_SIZE, threads=1,
+                 executor=None, resume_from=None):
+        self.filename = filename
+        self.buffer_size = buffer_size
+        self.records, self.buffered = [], 0
+        if filename is None:
+            # sys.stdout may have been replaced by a text-only stream (e.g. when testing).
+            sys.stdout.flush()
+            self.file = getattr(sys.stdout, 'buffer', sys.stdout)
+        else:
+            try:
+                if is_compressed_filename(filename):
+                    self.file = BgzfWriter(filename, threads, executor=executor,
+                                           resume_from=resume_from)
+                elif resume_from is not None:
+                    self.file = reopen_file(filename, resume_from['offset'])
+                else:
+                    self.file = open(filename, 'wb')
+            except OSError as e:
+                sys.exit(f'Error: could not write to {filename} ({e.strerror})')
+        self.binary = self.file is not sys.stdout
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, read_name, seq, quals, info):
+        record = f'@{read_name} {info}\n{seq}\n+\n{quals}\n'
+        self.records.append(record)
+        self.buffered += len(record)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.records:
+            chunk = ''.join(self.records)
+            self.file.write(chunk.encode() if self.binary else chunk)
+            self.records, self.buffered = [], 0
+        self.file.flush()
+
+    def checkpoint(self):
+        """
+        Makes sure everything so far is on disk and returns what's needed to carry on from here.
+        """
+        self.flush()
+        if isinstance(self.file, BgzfWriter):
+            return self.file.checkpoint()
+        os.fsync(self.file.fileno())
+        return {'offset': self.file.tell()}
+
+    def close(self):
+        self.flush()
+        if self.filename is not None:
+            self.file.close()
+
+
+class ShardedFastqWriter(object):
+    """
+    Writes FASTQ records to a directory of shard files with reads_per_file reads each (the last
+    may have fewer), named like reads_00000.fastq (or .fastq.gz if compressed). A shard is written
+    under a hidden name (starting with '.') and only given its real name once it is complete, so
+    other programs can start on finished shards while the simulation continues. The last of a
+    shard's compression is finished by a background thread, which also does the renaming.
+    """
+    def __init__(self, directory, reads_per_file, compress=False,
+                 buffer_size=settings.OUTPUT_BUFFER_SIZE, threads=1, resume_from=None):
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            sys.exit(f'Error: could not create directory {directory} ({e.strerror})')
+        self.directory = directory
+        self.reads_per_file = reads_per_file
+        self.extension = '.fastq.gz' if compress else '.fastq'
+        self.buffer_size = buffer_size
+        self.threads = threads
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+        self.finisher = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.finished = []
+        self.shard, self.shard_count, self.shard_reads = None, 0, 0
+        if resume_from is not None:
+            self.resume(resume_from)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, read_name, seq, quals, info):
+        if self.shard is None:
+            self.start_shard()
+        self.shard.write(read_name, seq, quals, info)
+        self.shard_reads += 1
+        if self.shard_reads >= self.reads_per_file:
+            self.finish_shard()
+
+    def start_shard(self, resume_from=None):
+        filename = get_shard_filename(self.shard_count, self.extension)
+        self.partial_filename = os.path.join(self.directory, '.' + filename)
+        self.shard_filename = os.path.join(self.directory, filename)
+        self.shard = FastqWriter(self.partial_filename, self.buffer_size, self.threads,
+                                 executor=self.executor, resume_from=resume_from)
+        self.shard_count += 1
+        self.shard_reads = 0
+
+    def finish_shard(self):
+        self.finished.append(self.finisher.submit(close_shard, self.shard, self.partial_filename,
+                                                  self.shard_filename))
+        self.shard = None
+        # Check on earlier shards, so any error in finishing them is raised here.
+        while self.finished and self.finished[0].done():
+            self.finished.pop(0).result()
+
+    def flush(self):
+        if self.shard is not None:
+            self.shard.flush()
+
+    def checkpoint(self):
+        for f in self.finished:
+            f.result()
+        self.finished = []
+        shard = None if self.shard is None else self.shard.checkpoint()
+        return {'shard_count': self.shard_count, 'shard_reads': self.shard_reads, 'shard': shard}
+
+    def resume(self, state):
+        """
+        Carries on from a checkpoint. The shard which was being written is reopened under its
+        hidden name (it may have been finished since) and any later shards are deleted.
+        """
+        self.shard_count = state['shard_count']
+        if state['shard'] is not None:
+            self.shard_count -= 1
+            filename = get_shard_filename(self.shard_count, self.extension)
+            finished_filename = os.path.join(self.directory, filename)
+            if os.path.isfile(finished_filename):
+                os.replace(finished_filename, os.path.join(self.directory, '.' + filename))
+        for f in find_shard_files(self.directory):
+            if get_shard_number(f) > self.shard_count or \
+                    (get_shard_number(f) == self.shard_count and state['shard'] is None):
+                os.remove(os.path.join(self.directory, f))
+        if state['shard'] is not None:
+            self.start_shard(resume_from=state['shard'])
+            self.shard_reads = state['shard_reads']
+
+    def close(self):
+        if self.shard is not None:
+            self.finish_shard()
+        for f in self.finished:
+            f.result()
+        self.finished = []
+        self.finisher.shutdown()
+        self.executor.shutdown()
+
+
+def close_shard(shard, partial_filename, shard_filename):
+    shard.close()
+    os.replace(partial_filename, shard_filename)
+
+
+def get_shard_filename(shard_number, extension):
+    return f'reads_{shard_number:05d}{extension}'
+
+
+def get_shard_number(filename):
+    return int(re.search(r'reads_(\d+)', filename).group(1))
+
+
+def find_shard_files(directory):
+    """
+    Returns any files in the directory which look like shards (finished or not).
+    """
+    return sorted(f for f in os.listdir(directory)
+                  if re.fullmatch(r'\.?reads_\d+\.fastq(\.gz)?', f))
+
+
+class BgzfWriter(object):
+    """
+    A binary file-like object which writes BGZF: a series of gzip members, each with a 'BC' extra
+    subfield holding the block's size. This is readable by any gzip tool and can be indexed (e.g.
+    by samtools fqidx). zlib releases the GIL, so blocks are compressed in parallel on a thread
+    pool, and they are written in order as they finish. The thread pool can be shared between
+    writers, in which case it is up to the caller to shut it down.
+    """
+    def __init__(self, filename, threads=1, level=settings.BGZF_COMPRESSION_LEVEL, executor=None,
+                 resume_from=None):
+        if resume_from is None:
+            self.file = open(filename, 'wb')
+            self.data = bytearray()
+        else:
+            self.file = reopen_file(filename, resume_from['offset'])
+            self.data = bytearray(base64.b64decode(resume_from['partial_block']))
+        self.level = level
+        self.max_pending = threads * settings.BGZF_BLOCKS_PER_THREAD
+        self.own_executor = executor is None
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+        self.executor = executor
+        self.pending = collections.deque()
+
+    def write(self, data):
+        self.data += data
+        if len(self.data) < BGZF_BLOCK_SIZE:
+            return
+        for start in range(0, len(self.data) - BGZF_BLOCK_SIZE + 1, BGZF_BLOCK_SIZE):
+            self.submit(bytes(self.data[start:start + BGZF_BLOCK_SIZE]))
+        del self.data[:start + BGZF_BLOCK_SIZE]
+
+    def submit(self, block):
+        self.pending.append(self.executor.submit(compress_bgzf_block, block, self.level))
+        while len(self.pending) > self.max_pending:
+            self.file.write(self.pending.popleft().result())
+
+    def flush(self):
+        """
+        Writes any blocks which have finished compressing. Data which doesn't yet fill a block is
+        kept until more is written or the file is closed.
+        """
+        while self.pending and self.pending[0].done():
+            self.file.write(self.pending.popleft().result())
+        self.file.flush()
+
+    def checkpoint(self):
+        """
+        Writes all full blocks and returns the file position after them, along with the data which
+        doesn't yet fill a block. Blocks are therefore the same as if there was no checkpoint.
+        """
+        while self.pending:
+            self.file.write(self.pending.popleft().result())
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {'offset': self.file.tell(),
+                'partial_block': base64.b64encode(bytes(self.data)).decode()}
+
+    def close(self):
+        if self.data:
+            self.submit(bytes(self.data))
+            self.data = bytearray()
+        while self.pending:
+            self.file.write(self.pending.popleft().result())
+        self.file.write(BGZF_EOF)
+        self.file.close()
+        if self.own_executor:
+            self.executor.shutdown()
+
+
+def compress_bgzf_block(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)  # raw deflate, no zlib header
+    compressed = compressor.compress(data) + compressor.flush()
+    block_size = len(compressed) + 26  # 18-byte header and 8-byte footer
+    header = struct.pack('<4BI2BH2BHH', 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, block_size - 1)
+    footer = struct.pack('<2I', zlib.crc32(data), len(data))
+    return header + compressed + footer
+
+
+def reopen_file(filename, offset):
+    """
+    Opens an existing output file to continue writing at the given offset, dropping anything which
+    was written after that point.
+    """
+    try:
+        f = open(filename, 'r+b')
+    except OSError as e:
+        sys.exit(f'Error: could not continue writing {filename} ({e.strerror})')
+    if os.path.getsize(filename) < offset:
+        sys.exit(f'Error: {filename} is shorter than expected, so it cannot be continued')
+    f.truncate(offset)
+    f.seek(offset)
+    return f
+
+
+def is_compressed_filename(filename):
+    return filename.lower().endswith(('.gz', '.bgz'))
@@ -44,13 +44,23 @@ class FragmentLengths(object):
                                  output=output)
             quickhist_gamma(gamma_a, gamma_b, n50, 8, output=output)
 
-    def get_fragment_length(self):
+    def get_fragment_length(self, rng):
         if self.stdev == 0:
             return int(round(self.mean))
         else:  # gamma distribution
-            fragment_length = int(round(np.random.gamma(self.gamma_k, self.gamma_t)))
+            fragment_length = int(round(rng.generator.gamma(self.gamma_k, self.gamma_t)))
             return max(fragment_length, 1)
 
+    def get_fragment_lengths(self, rng, count):
+        """
+        Returns an array of fragment lengths.
+        """
+        if self.stdev == 0:
+            return np.full(count, int(round(self.mean)), dtype=np.int64)
+        else:  # gamma distribution
+            fragment_lengths = np.rint(rng.generator.gamma(self.gamma_k, self.gamma_t, count))
+            return np.maximum(fragment_lengths.astype(np.int64), 1)
+
 
 def gamma_parameters(gamma_mean, gamma_stdev):
     # Shape and rate parametrisation:
@@ -73,23 +73,44 @@ class Identities(object):
             print(f'  mean  = {float_to_str(self.mean):>3}', file=output)
             print(f'  stdev = {float_to_str(self.stdev):>3}', file=output)
 
-    def get_identity(self):
+    def get_identity(self, rng):
         while True:
             if self.type == "beta":
-                identity = self.get_beta_identity()
+                identity = self.get_beta_identity(rng)
             else:
-                identity = self.get_normal_identity()
+                identity = self.get_normal_identity(rng)
             if 0 <= identity <= 100:
                 return identity
 
-    def get_beta_identity(self):
+    def get_identities(self, rng, count):
+        """
+        Returns an array of identities. Like get_identity, values outside of 0-100 are redrawn.
+        """
+        identities = np.empty(count)
+        to_draw = np.arange(count)
+        while len(to_draw) > 0:
+            if self.type == "beta":
+                if self.mean == self.max_identity:
+                    values = np.full(len(to_draw), self.mean)
+                else:  # beta distribution
+                    values = self.max_identity * rng.generator.beta(self.beta_a, self.beta_b,
+                                                                    len(to_draw))
+            else:
+                qscores = rng.generator.normal(self.mean, self.stdev, len(to_draw))
+                values = 1.0 - 10**(-qscores / 10)
+            good = (values >= 0) & (values <= 100)
+            identities[to_draw[good]] = values[good]
+            to_draw = to_draw[~good]
+        return identities
+
+    def get_beta_identity(self, rng):
         if self.mean == self.max_identity:
             return self.mean
         else:  # beta distribution
-            return self.max_identity * np.random.beta(self.beta_a, self.beta_b)
+            return self.max_identity * rng.generator.beta(self.beta_a, self.beta_b)
 
-    def get_normal_identity(self):
-        qscore = np.random.normal(self.mean, self.stdev)
+    def get_normal_identity(self, rng):
+        qscore = rng.generator.normal(self.mean, self.stdev)
         return 1.0 - 10**(-qscore / 10)
 
 
@@ -0,0 +1,184 @@
+"""
+This module contains code for reading reference sequence on demand from an indexed FASTA: either a
+plain FASTA with a samtools faidx index (.fai) or a bgzipped FASTA with both a .fai and a .gzi
+index. Contig lengths and positions come from the .fai file and each contig's depth, circularity
+and hairpin settings come from its header line, so nothing else needs to be read at startup.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import bisect
+import collections
+import os
+import struct
+import sys
+import zlib
+from .misc import parse_fasta_header
+from .reference_cache import LazySequence
+
+
+def find_fasta_index(reference):
+    """
+    Returns the .fai filename and the .gzi filename (None for an uncompressed FASTA) if the
+    reference has usable indices, otherwise None. Indices older than the reference are ignored, as
+    they may not match it.
+    """
+    fai_filename = reference + '.fai'
+    if not os.path.isfile(fai_filename) or is_older(fai_filename, reference):
+        return None
+    with open(reference, 'rb') as f:
+        file_start = f.read(18)
+    if not file_start.startswith(b'\x1f\x8b'):
+        return fai_filename, None
+    gzi_filename = reference + '.gzi'
+    if not is_bgzf(file_start) or not os.path.isfile(gzi_filename) or \
+            is_older(gzi_filename, reference):
+        return None
+    return fai_filename, gzi_filename
+
+
+def is_older(filename, other_filename):
+    return os.path.getmtime(filename) < os.path.getmtime(other_filename)
+
+
+def is_bgzf(file_start):
+    """
+    BGZF blocks are gzip members with a 'BC' extra subfield holding the block size.
+    """
+    return len(file_start) >= 18 and file_start[:4] == b'\x1f\x8b\x08\x04' and \
+        file_start[12:14] == b'BC'
+
+
+def load_indexed_fasta(reference, fai_filename, gzi_filename, output):
+    """
+    Returns the reference's contigs (as IndexedSequence objects) and header settings, in the same
+    form as misc.load_fasta.
+    """
+    print(f'  using index: {fai_filename}' +
+          ('' if gzi_filename is None else f' and {gzi_filename}'), file=output)
+    if gzi_filename is None:
+        reader = PlainFileReader(reference)
+    else:
+        reader = BgzfFileReader(reference, gzi_filename)
+    ref_seqs = collections.OrderedDict()
+    depths, circular, hairpin_left, hairpin_right = {}, {}, {}, {}
+    with open(fai_filename, 'rt') as fai_file:
+        for line in fai_file:
+            try:
+                name, length, offset, line_bases, line_width = line.rstrip('\n').split('\t')[:5]
+                length, offset = int(length), int(offset)
+                line_bases, line_width = int(line_bases), int(line_width)
+            except ValueError:
+                sys.exit(f'Error: {fai_filename} does not seem to be a valid FASTA index')
+            header = get_header(reader, offset)
+            short_name, depths[name], circular[name], hairpin_left[name], hairpin_right[name] = \
+                parse_fasta_header(header)
+            if short_name != name:
+                sys.exit(f'Error: {fai_filename} does not match {reference}')
+            ref_seqs[name] = IndexedSequence(reader, length, offset, line_bases, line_width)
+    return ref_seqs, depths, circular, hairpin_left, hairpin_right
+
+
+def get_header(reader, offset):
+    """
+    Returns the header line which ends just before a contig's sequence starts.
+    """
+    window = 1024
+    while True:
+        start = max(0, offset - window)
+        data = reader.read(start, offset).rstrip(b'\r\n')
+        header_start = data.rfind(b'\n>') + 1
+        if header_start > 0 or (start == 0 and data.startswith(b'>')):
+            return data[header_start + 1:].decode()
+        if start == 0:
+            sys.exit('Error: could not find the FASTA header for an indexed sequence')
+        window *= 4
+
+
+class PlainFileReader(object):
+    """
+    Reads byte ranges from an uncompressed file. Positional reads don't move a shared file offset,
+    so worker processes which inherit the file can all use it at once.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_file'] = None
+        return state
+
+    def read(self, start, end):
+        if self._file is None:
+            self._file = open(self.filename, 'rb')
+        if hasattr(os, 'pread'):
+            return os.pread(self._file.fileno(), end - start, start)
+        self._file.seek(start)
+        return self._file.read(end - start)
+
+
+class BgzfFileReader(PlainFileReader):
+    """
+    Reads byte ranges of uncompressed data from a BGZF (bgzip) file, using its .gzi index to find
+    the block holding the start of the range.
+    """
+    def __init__(self, filename, gzi_filename):
+        super().__init__(filename)
+        with open(gzi_filename, 'rb') as gzi_file:
+            count = struct.unpack('<Q', gzi_file.read(8))[0]
+            offsets = struct.unpack(f'<{2 * count}Q', gzi_file.read(16 * count))
+        # The first block (at 0 in both files) isn't in the .gzi file.
+        self.compressed_offsets = [0] + list(offsets[0::2])
+        self.uncompressed_offsets = [0] + list(offsets[1::2])
+
+    def read(self, start, end):
+        i = bisect.bisect_right(self.uncompressed_offsets, start) - 1
+        compressed_pos, uncompressed_pos = self.compressed_offsets[i], self.uncompressed_offsets[i]
+        blocks_start = uncompressed_pos
+        blocks = []
+        while uncompressed_pos < end:
+            block_header = super().read(compressed_pos, compressed_pos + 18)
+            if len(block_header) < 18:
+                break  # end of file
+            if not is_bgzf(block_header):
+                sys.exit(f'Error: {self.filename} does not seem to be a valid BGZF file')
+            block_size = struct.unpack('<H', block_header[16:18])[0] + 1
+            block = zlib.decompress(super().read(compressed_pos, compressed_pos + block_size),
+                                    wbits=31)
+            blocks.append(block)
+            compressed_pos += block_size
+            uncompressed_pos += len(block)
+        return b''.join(blocks)[start - blocks_start:end - blocks_start]
+
+
+class IndexedSequence(LazySequence):
+    """
+    A contig sequence in an indexed FASTA. Slices are read from the file when needed, using the
+    .fai line lengths to turn base positions into byte offsets.
+    """
+    def __init__(self, reader, length, offset, line_bases, line_width):
+        super().__init__(length)
+        self.reader = reader
+        self.offset = offset
+        self.line_bases = line_bases
+        self.line_width = line_width
+
+    def byte_offset(self, pos):
+        return self.offset + (pos // self.line_bases) * self.line_width + pos % self.line_bases
+
+    def decode(self, start, end):
+        data = self.reader.read(self.byte_offset(start), self.byte_offset(end - 1) + 1)
+        bases = data.translate(None, b'\r\n').upper()
+        if len(bases) != end - start:
+            sys.exit('Error: FASTA index does not match the FASTA file')
+        return bases.decode()
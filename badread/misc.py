@@ -18,7 +18,6 @@ import contextlib
 import gzip
 import io
 import os
-import random
 import re
 import sys
 
@@ -46,6 +45,14 @@ def get_compression_type(filename):
     return compression_type
 
 
+def is_compiled_model(filename):
+    """
+    Compiled models (made by badread compile_model) are NumPy .npz files, which are zip archives.
+    """
+    with open(str(filename), 'rb') as f:
+        return f.read(4) == b'\x50\x4b\x03\x04'
+
+
 def get_open_func(filename):
     if get_compression_type(filename) == 'gz':
         return gzip.open
@@ -60,6 +67,10 @@ REV_COMP_DICT = {'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G', 'a': 't', 't': 'a', 'g'
                  '?': '?'}
 
 
+# For reverse complementing with str.translate: anything not in REV_COMP_DICT becomes N.
+REV_COMP_TABLE = str.maketrans({chr(i): REV_COMP_DICT.get(chr(i), 'N') for i in range(256)})
+
+
 def complement_base(base):
     try:
         return REV_COMP_DICT[base]
@@ -68,7 +79,7 @@ def complement_base(base):
 
 
 def reverse_complement(seq):
-    return ''.join([complement_base(x) for x in seq][::-1])
+    return seq.translate(REV_COMP_TABLE)[::-1]
 
 
 def get_sequence_file_type(filename):
@@ -122,7 +133,6 @@ def load_fastq(filename, output=sys.stderr, dot_interval=1000):
 def load_fasta(filename):
     fasta_seqs = collections.OrderedDict()
     depths, circular, hairpin_left, hairpin_right = {}, {}, {}, {}
-    p = re.compile(r'depth=([\d.]+)')
     with get_open_func(filename)(filename, 'rt') as fasta_file:
         name = ''
         sequence = []
@@ -135,17 +145,8 @@ def load_fasta(filename):
                     fasta_seqs[name.split()[0]] = ''.join(sequence).upper()
                     sequence = []
                 name = line[1:]
-                short_name = name.split()[0]
-                if 'depth=' in name.lower():
-                    try:
-                        depths[short_name] = float(p.search(name.lower()).group(1))
-                    except (ValueError, AttributeError):
-                        depths[short_name] = 1.0
-                else:
-                    depths[short_name] = 1.0
-                circular[short_name] = 'circular=true' in name.lower()
-                hairpin_left[short_name] = 'hairpin_left=true' in name.lower()
-                hairpin_right[short_name] = 'hairpin_right=true' in name.lower()
+                short_name, depths[short_name], circular[short_name], hairpin_left[short_name], \
+                    hairpin_right[short_name] = parse_fasta_header(name)
             else:
                 sequence.append(line)
         if name:
@@ -153,33 +154,55 @@ def load_fasta(filename):
     return fasta_seqs, depths, circular, hairpin_left, hairpin_right
 
 
+def parse_fasta_header(name):
+    """
+    Returns a contig's short name along with the depth, circularity and hairpin settings from its
+    FASTA header (e.g. 'chr1 depth=2.5 circular=true').
+    """
+    short_name = name.split()[0]
+    lower_name = name.lower()
+    depth = 1.0
+    if 'depth=' in lower_name:
+        try:
+            depth = float(re.search(r'depth=([\d.]+)', lower_name).group(1))
+        except (ValueError, AttributeError):
+            pass
+    return short_name, depth, 'circular=true' in lower_name, \
+        'hairpin_left=true' in lower_name, 'hairpin_right=true' in lower_name
+
+
 RANDOM_SEQ_DICT = {0: 'A', 1: 'C', 2: 'G', 3: 'T'}
 
+# Maps each byte value to a base using its two lowest bits, so uniform random bytes become uniform
+# random bases.
+RANDOM_SEQ_TABLE = bytes.maketrans(bytes(range(256)), b'ACGT' * 64)
+
 
-def get_random_base():
+def get_random_base(rng):
     """
     Returns a random base with 25% probability of each.
     """
-    return RANDOM_SEQ_DICT[random.randint(0, 3)]
+    return RANDOM_SEQ_DICT[rng.randint(0, 3)]
 
 
-def get_random_different_base(b):
-    random_base = get_random_base()
+def get_random_different_base(b, rng):
+    random_base = get_random_base(rng)
     while b == random_base:
-        random_base = get_random_base()
+        random_base = get_random_base(rng)
     return random_base
 
 
-def get_random_sequence(length):
+def get_random_sequence(length, rng):
     """
-    Returns a random sequence of the given length.
+    Returns a random sequence of the given length. The bases are made all at once, from random
+    bytes translated to ACGT.
     """
-    return ''.join([get_random_base() for _ in range(length)])
+    return rng.bytes(length).translate(RANDOM_SEQ_TABLE).decode()
 
 
-def random_chance(chance):
+def random_chance(chance, rng):
     assert 0.0 <= chance <= 1.0
-    return random.random() < chance
+    return rng.random() < chance
 
 
 END_FORMATTING = '\033[0m'
@@ -0,0 +1,82 @@
+"""
+This module contains the progress display for Badread's simulate subcommand. It shows the number
+of reads and bases made, the percentage of the target, throughput and an estimated time remaining.
+It is only updated every so often, so it costs almost nothing per read.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import datetime
+import time
+from . import settings
+
+
+class Progress(object):
+    """
+    On a terminal, the progress line is redrawn in place every settings.PROGRESS_INTERVAL seconds.
+    Otherwise (e.g. stderr redirected to a log file), a new line is written every
+    settings.PROGRESS_LOG_INTERVAL seconds. Rates only count reads made in this run, so they
+    aren't thrown off when resuming from a checkpoint.
+    """
+    def __init__(self, target, output, count=0, bp=0):
+        self.target = target
+        self.output = output
+        self.tty = is_tty(output)
+        self.interval = settings.PROGRESS_INTERVAL if self.tty else settings.PROGRESS_LOG_INTERVAL
+        self.start_time = time.monotonic()
+        self.start_count, self.start_bp = count, bp
+        self.next_update = self.start_time  # the first update is shown straight away
+        self.line_length = 0
+
+    def update(self, count, bp):
+        now = time.monotonic()
+        if now >= self.next_update:
+            self.show(count, bp, now)
+            self.next_update = now + self.interval
+
+    def finish(self, count, bp):
+        self.show(count, bp, time.monotonic())
+        print('\n' if self.tty else '', file=self.output)
+
+    def show(self, count, bp, now):
+        line = get_progress_line(count, bp, self.target, now - self.start_time,
+                                 count - self.start_count, bp - self.start_bp)
+        if self.tty:
+            # Padded to cover any leftovers of a longer previous line.
+            print('\r' + line.ljust(self.line_length), file=self.output, flush=True, end='')
+            self.line_length = len(line)
+        else:
+            print(line, file=self.output, flush=True)
+
+
+def get_progress_line(count, bp, target, elapsed, new_count, new_bp):
+    plural = ' ' if count == 1 else 's'
+    percent = min(int(1000.0 * bp / target) / 10, 100.0)
+    line = f'Simulating: {count:,} read{plural}  {bp:,} bp  {percent:.1f}%'
+    if elapsed <= 0.0 or new_bp <= 0:
+        return line
+    reads_per_sec, bp_per_sec = new_count / elapsed, new_bp / elapsed
+    line += f'  {reads_per_sec:,.1f} reads/s  {bp_per_sec:,.0f} bp/s'
+    if bp < target:
+        line += f'  ETA {format_duration((target - bp) / bp_per_sec)}'
+    return line
+
+
+def format_duration(seconds):
+    return str(datetime.timedelta(seconds=int(round(seconds))))
+
+
+def is_tty(output):
+    try:
+        return output.isatty()
+    except (AttributeError, ValueError):  # not a file or closed
+        return False
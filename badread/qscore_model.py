@@ -19,60 +19,133 @@ import collections
 import edlib
 import os
 import pathlib
-import random
+import numpy as np
 import re
-import statistics
 import sys
+import time
 from .alignment import load_alignments, align_sequences
 from .misc import load_fasta, load_fastq, reverse_complement, float_to_str, get_open_func, \
-    identity_from_edlib_cigar, check_alignment_matches_read_and_refs
+    identity_from_edlib_cigar, check_alignment_matches_read_and_refs, is_compiled_model
 from . import settings
 
 
-def get_qscores(seq, frag, qscore_model):
-    assert len(seq) > 0
-
-    # TODO: I fear this full sequence alignment will be slow for long and inaccurate sequences.
-    #       Can I break it into chunks for better performance?
-    cigar = edlib.align(seq, frag, task='path')['cigar']
-    actual_identity = identity_from_edlib_cigar(cigar)
-
-    aligned_seq, aligned_frag, full_cigar = align_sequences_from_edlib_cigar(seq, frag, cigar)
-    unaligned_len = len(seq)
-    margins = (qscore_model.kmer_size - 1) // 2
+CIGAR_CODES = {'=': 0, 'X': 1, 'I': 2, 'D': 3}
 
-    qscores, error_probs = [], []
+# Cigars longer than this can't be packed into an int64 key. Model cigars this long would need
+# 20+ deletions in one context, so they are left out of the packed tables.
+MAX_PACKED_CIGAR_LEN = 31
 
-    seq_pos_to_alignment_pos = {}
-    i, j = 0, 0
-    for c in full_cigar:
-        if c != 'D':
-            seq_pos_to_alignment_pos[i] = j
-            i += 1
-        j += 1
+# The error probability for each qscore value which can be represented by a FASTQ character.
+QSCORE_ERROR_PROBS = 10.0 ** (-np.arange(94) / 10.0)
 
-    for i in range(unaligned_len):
-        start = i - margins
-        end = i + margins
-        while start < 0 or end >= unaligned_len:  # pull back to a smaller k-mer near the seq ends
-            start += 1
-            end -= 1
-        start = seq_pos_to_alignment_pos[start]
-        end = seq_pos_to_alignment_pos[end]
-        partial_cigar = full_cigar[start:end + 1]
-        assert not partial_cigar.startswith('D')
-        assert not partial_cigar.endswith('D')
-        k_size = len(partial_cigar.replace('D', ''))
-        assert k_size <= qscore_model.kmer_size
-        assert k_size % 2 == 1  # should be an odd length k-mer
-        q = qscore_model.get_qscore(partial_cigar)
 
-        qscores.append(q)
-        error_probs.append(qscore_char_to_error_prob(q))
+def get_qscores(seq, frag, qscore_model, rng, full_cigar=None, stats=None):
+    """
+    Returns qscores for a sequence, along with its identity to the fragment it came from. The
+    seq-to-frag alignment can be given as a cigar array (e.g. from cigar_from_edits), otherwise it
+    is made with edlib.
+    """
+    assert len(seq) > 0
+    start_time = time.perf_counter()
+    if stats is not None:
+        stats.add_count('qscore_edlib_alignments', int(full_cigar is None))
+
+    # The full cigar as an array of op codes (see CIGAR_CODES).
+    if full_cigar is None:
+        cigar = edlib.align(seq, frag, task='path')['cigar']
+        actual_identity = identity_from_edlib_cigar(cigar)
+        full_cigar = cigar_to_array(cigar)
+    else:
+        actual_identity = np.count_nonzero(full_cigar == CIGAR_CODES['=']) / len(full_cigar)
+
+    # The alignment position of each base in the sequence.
+    seq_pos_to_alignment_pos = np.flatnonzero(full_cigar != CIGAR_CODES['D'])
+    unaligned_len = len(seq)
+    assert len(seq_pos_to_alignment_pos) == unaligned_len
+    margins = (qscore_model.kmer_size - 1) // 2
+    alignment_end_time = time.perf_counter()
+
+    # Each base's cigar context spans the bases half_widths either side of it (pulled back to a
+    # smaller k-mer near the seq ends). If a context isn't in the model, it's trimmed by one base
+    # on each side and looked up again.
+    seq_positions = np.arange(unaligned_len)
+    half_widths = np.minimum(np.minimum(seq_positions, unaligned_len - 1 - seq_positions), margins)
+    context_ids = np.full(unaligned_len, -1, dtype=np.int64)
+    unresolved = seq_positions
+    fallback_rounds, fallback_bases = -1, -unaligned_len  # the first lookup isn't a fallback
+    while len(unresolved) > 0:
+        fallback_rounds += 1
+        fallback_bases += len(unresolved)
+        starts = seq_pos_to_alignment_pos[unresolved - half_widths[unresolved]]
+        ends = seq_pos_to_alignment_pos[unresolved + half_widths[unresolved]]
+        ids = qscore_model.get_context_ids(full_cigar, starts, ends)
+        context_ids[unresolved] = ids
+        unresolved = unresolved[ids < 0]
+        assert np.all(half_widths[unresolved] > 0)
+        half_widths[unresolved] -= 1
+
+    qscores = qscore_model.get_qscores_for_contexts(context_ids, rng)
+    qual = (qscores + 33).astype(np.uint8).tobytes().decode()
+    identity_by_qscores = 1.0 - QSCORE_ERROR_PROBS[qscores].mean()
+
+    if stats is not None:
+        sampling_time = time.perf_counter() - alignment_end_time
+        stats.add_time('sequence_fragment/get_qscores/alignment', alignment_end_time - start_time)
+        stats.add_time('sequence_fragment/get_qscores/sampling', sampling_time)
+        stats.add_count('qscore_bases', unaligned_len)
+        stats.add_count('qscore_fallback_rounds', fallback_rounds)
+        stats.add_count('qscore_fallback_bases', fallback_bases)
+    return qual, actual_identity, identity_by_qscores
+
+
+def cigar_to_array(cigar):
+    """
+    Expands an edlib cigar (e.g. '3=1I2=') into an array with one op code per alignment position.
+    """
+    cigar_parts = re.findall(r'(\d+)([IDX=])', cigar)
+    sizes = np.array([int(size) for size, _ in cigar_parts], dtype=np.int64)
+    codes = np.array([CIGAR_CODES[cigar_type] for _, cigar_type in cigar_parts], dtype=np.int64)
+    return np.repeat(codes, sizes)
+
+
+def cigar_from_edits(fragment, edits):
+    """
+    Builds the cigar array for a sequence made by editing a fragment, using the edits themselves
+    instead of an alignment. The edits are (fragment position, replacement) pairs in position
+    order, where the replacement can be '' (deletion), one base (substitution) or more than one
+    base (insertion).
+    """
+    ops, prev = bytearray(), 0
+    for pos, new_bases in edits:
+        ops += bytes(pos - prev)  # unchanged bases are all '=' (code 0)
+        original_base = fragment[pos]
+        if len(new_bases) == 0:
+            ops.append(CIGAR_CODES['D'])
+        elif len(new_bases) == 1:
+            ops.append(CIGAR_CODES['='] if new_bases == original_base else CIGAR_CODES['X'])
+        else:
+            i = new_bases.find(original_base)
+            if i == -1:
+                ops.append(CIGAR_CODES['X'])
+                ops += bytes([CIGAR_CODES['I']]) * (len(new_bases) - 1)
+            else:
+                ops += bytes([CIGAR_CODES['I']]) * i
+                ops.append(CIGAR_CODES['='])
+                ops += bytes([CIGAR_CODES['I']]) * (len(new_bases) - 1 - i)
+        prev = pos + 1
+    ops += bytes(len(fragment) - prev)
+    return np.frombuffer(bytes(ops), dtype=np.uint8).astype(np.int64)
 
-    identity_by_qscores = 1.0 - statistics.mean(error_probs)
 
-    return ''.join(qscores), actual_identity, identity_by_qscores
+def cigar_to_key(cigar):
+    """
+    Packs a cigar string into an integer: two bits per op, after a leading 1 so cigars of different
+    lengths get different keys.
+    """
+    key = 1
+    for c in cigar:
+        key = (key << 2) | CIGAR_CODES[c]
+    return key
 
 
 def make_qscore_model(args, output=sys.stderr, dot_interval=1000):
@@ -179,6 +252,7 @@ class QScoreModel(object):
 
     def __init__(self, model_type_or_filename, output=sys.stderr):
         self.scores, self.probabilities = {}, {}
+        self.alias_tables = {}
         self.kmer_size = 1
         self.type = None
         this_script_dir = pathlib.Path(os.path.dirname(os.path.realpath(__file__)))
@@ -192,11 +266,15 @@ class QScoreModel(object):
         elif model_type_or_filename == 'nanopore2020':
             self.load_from_file(str(this_script_dir / 'qscore_models' / 'nanopore2020.gz'), output)
         elif model_type_or_filename == 'nanopore2023':
-            self.load_from_file(str(this_script_dir / 'qscore_models' / 'nanopore2023.gz'), output)
+            self.load_from_compiled_file(str(this_script_dir / 'qscore_models' /
+                                             'nanopore2023.npz'), output)
         elif model_type_or_filename == 'pacbio2016':
             self.load_from_file(str(this_script_dir / 'qscore_models' / 'pacbio2016.gz'), output)
         elif model_type_or_filename == 'pacbio2021':
-            self.load_from_file(str(this_script_dir / 'qscore_models' / 'pacbio2021.gz'), output)
+            self.load_from_compiled_file(str(this_script_dir / 'qscore_models' /
+                                             'pacbio2021.npz'), output)
+        elif is_compiled_model(model_type_or_filename):
+            self.load_from_compiled_file(model_type_or_filename, output)
         else:
             self.load_from_file(model_type_or_filename, output)
 
@@ -206,6 +284,34 @@ class QScoreModel(object):
         assert 'X' in self.scores
         assert 'I' in self.scores
 
+        for cigar in self.scores:
+            self.alias_tables[cigar] = make_alias_table(self.scores[cigar],
+                                                        self.probabilities[cigar])
+        self.pack_alias_tables()
+
+    def pack_alias_tables(self):
+        """
+        Packs the alias tables into arrays (one row per cigar) for vectorised qscore drawing. The
+        rows are sorted by the cigars' integer keys, so contexts can be looked up with a binary
+        search.
+        """
+        cigars = sorted((c for c in self.alias_tables if len(c) <= MAX_PACKED_CIGAR_LEN),
+                        key=cigar_to_key)
+        self.context_keys = np.array([cigar_to_key(c) for c in cigars], dtype=np.int64)
+        self.max_context_len = max(len(c) for c in cigars)
+        max_count = max(len(self.alias_tables[c][0]) for c in cigars)
+        self.context_score_counts = np.zeros(len(cigars), dtype=np.int64)
+        self.context_scores = np.zeros((len(cigars), max_count), dtype=np.int64)
+        self.context_thresholds = np.ones((len(cigars), max_count))
+        self.context_aliases = np.zeros((len(cigars), max_count), dtype=np.int64)
+        for i, cigar in enumerate(cigars):
+            chars, thresholds, aliases = self.alias_tables[cigar]
+            count = len(chars)
+            self.context_score_counts[i] = count
+            self.context_scores[i, :count] = [qscore_char_to_val(c) for c in chars]
+            self.context_thresholds[i, :count] = thresholds
+            self.context_aliases[i, :count] = aliases
+
     def set_up_random_model(self, output):
         print('\nUsing a random qscore model', file=output)
         self.type = 'random'
@@ -270,21 +376,90 @@ class QScoreModel(object):
             print(f'\r  done: loaded qscore distributions for {count} alignments',
                   file=output)
 
-    def get_qscore(self, cigar):
+    def load_from_compiled_file(self, filename, output):
+        """
+        Loads a model made by badread compile_model.
+        """
+        print('\nLoading qscore model from {}'.format(filename), file=output)
+        self.type = 'model'
+        with np.load(filename) as model:
+            if str(model['model_type']) != 'qscore':
+                sys.exit(f'Error: {filename} is not a compiled qscore model')
+            self.kmer_size = int(model['kmer_size'])
+            cigars = model['cigars'].tolist()
+            score_counts = model['score_counts'].tolist()
+            scores = model['scores'].tolist()
+            probabilities = model['probabilities'].tolist()
+        i = 0
+        for cigar, count in zip(cigars, score_counts):
+            j = i + count
+            self.scores[cigar] = scores[i:j]
+            self.probabilities[cigar] = probabilities[i:j]
+            i = j
+        print(f'  done: loaded qscore distributions for {len(cigars)} alignments', file=output)
+
+    def save_compiled_file(self, filename):
+        """
+        Saves the model in the binary format read by load_from_compiled_file.
+        """
+        cigars = list(self.scores.keys())
+        with open(filename, 'wb') as model_file:
+            np.savez_compressed(model_file, model_type='qscore', kmer_size=self.kmer_size,
+                                cigars=np.array(cigars),
+                                score_counts=np.array([len(self.scores[c]) for c in cigars]),
+                                scores=np.array([q for c in cigars for q in self.scores[c]]),
+                                probabilities=np.array([p for c in cigars
+                                                        for p in self.probabilities[c]]))
+
+    def get_qscore(self, cigar, rng):
         """
         If the cigar is in the model, then we use it to choose a qscore. If not, then we trim the
         cigar down by 2 (1 off each end) and try again with the simpler cigar.
         """
         while True:
             assert len(cigar.replace('D', '')) % 2 == 1
-            if cigar in self.scores:
-                scores = self.scores[cigar]
-                probs = self.probabilities[cigar]
-                qscore = random.choices(scores, weights=probs)[0]
+            if cigar in self.alias_tables:
+                chars, thresholds, aliases = self.alias_tables[cigar]
                 break
             else:
                 cigar = cigar[1:-1].strip('D')
-        return qscore_val_to_char(qscore)
+
+        # Alias method: one random number picks a column and decides between the column's own
+        # qscore and its alias.
+        r = rng.random() * len(chars)
+        i = int(r)
+        return chars[i] if r - i < thresholds[i] else chars[aliases[i]]
+
+    def get_context_ids(self, full_cigar, starts, ends):
+        """
+        Takes a cigar array and the start/end (inclusive) of some contexts in it. Returns each
+        context's row in the packed tables, or -1 if the context isn't in the model.
+        """
+        lengths = ends - starts + 1
+        ids = np.full(len(starts), -1, dtype=np.int64)
+        packable = np.flatnonzero(lengths <= self.max_context_len)
+        if len(packable) == 0:
+            return ids
+        starts, lengths = starts[packable], lengths[packable]
+        keys = np.ones(len(packable), dtype=np.int64)
+        for i in range(lengths.max()):
+            in_context = i < lengths
+            keys[in_context] = (keys[in_context] << 2) | full_cigar[starts[in_context] + i]
+        rows = np.minimum(np.searchsorted(self.context_keys, keys), len(self.context_keys) - 1)
+        found = self.context_keys[rows] == keys
+        ids[packable[found]] = rows[found]
+        return ids
+
+    def get_qscores_for_contexts(self, context_ids, rng):
+        """
+        Draws one qscore value for each context (given as rows in the packed tables), using the
+        same alias method as get_qscore.
+        """
+        r = rng.generator.random(len(context_ids)) * self.context_score_counts[context_ids]
+        columns = r.astype(np.int64)
+        use_alias = r - columns >= self.context_thresholds[context_ids, columns]
+        columns = np.where(use_alias, self.context_aliases[context_ids, columns], columns)
+        return self.context_scores[context_ids, columns]
 
 
 def align_sequences_from_edlib_cigar(seq, frag, cigar, gap_char='-'):
@@ -318,6 +493,31 @@ def uniform_dist_scores_and_probs(bottom_q, top_q):
     return scores, probabilities
 
 
+def make_alias_table(scores, probabilities):
+    """
+    Builds a Walker/Vose alias table for a qscore distribution, so a qscore can be drawn in
+    constant time. Returns the qscores (as characters), each column's threshold and each column's
+    alias.
+    """
+    count = len(scores)
+    total = sum(probabilities)
+    scaled = [p * count / total for p in probabilities]
+    thresholds, aliases = [1.0] * count, list(range(count))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        thresholds[s], aliases[s] = scaled[s], l
+        scaled[l] = (scaled[l] + scaled[s]) - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+    # Anything left over (only due to floating point error) keeps a threshold of 1.
+    chars = tuple(qscore_val_to_char(q) for q in scores)
+    return chars, tuple(thresholds), tuple(aliases)
+
+
 def qscore_char_to_val(q):
     return ord(q) - 33
 
@@ -0,0 +1,137 @@
+"""
+This module contains a class for drawing each read's random parameters (fragment length, read
+type, reference position, identity, adapters and chimera count) in vectorised blocks, instead of
+with separate random calls for each read.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import numpy as np
+from .rng import get_child_rng
+from . import settings
+
+
+ReadParameterSet = collections.namedtuple('ReadParameterSet',
+                                          ['fragment_length', 'fragment_type', 'contig', 'strand',
+                                           'start_pos', 'identity', 'start_adapter',
+                                           'end_adapter', 'chimeras'])
+
+FRAGMENT_TYPES = ['good', 'junk', 'random']
+
+
+class ReadParameters(object):
+    """
+    Reads are grouped into fixed blocks of settings.READ_PARAMETER_BLOCK_SIZE read indices and
+    each block's parameters are drawn at once, from the base seed's child stream for that block
+    (see rng.get_child_rng). A read's parameters therefore depend only on the base seed and its
+    index, not on which process makes it. Chimeric parts after the first fragment are rare, so
+    they are still drawn one at a time when the read is built.
+
+    The most recently used blocks are kept (up to settings.READ_PARAMETER_CACHED_BLOCKS), so that
+    out-of-order access (e.g. a shuffled ReadSet) doesn't redraw a whole block for every read.
+    """
+    def __init__(self, base_seed, frag_lengths, identities, ref_seqs, ref_contigs,
+                 ref_contig_cum_weights, args, start_adapt_rate, start_adapt_amount,
+                 end_adapt_rate, end_adapt_amount):
+        self.base_seed = base_seed
+        self.frag_lengths = frag_lengths
+        self.identities = identities
+        self.ref_contigs = ref_contigs
+        self.contig_lengths = np.array([len(ref_seqs[c]) for c in ref_contigs], dtype=np.int64)
+        self.cum_weights = np.array(ref_contig_cum_weights, dtype=np.float64)
+        self.junk_read_rate = args.junk_reads / 100      # percentage to fraction
+        self.random_read_rate = args.random_reads / 100  # percentage to fraction
+        self.chimera_rate = args.chimeras / 100          # percentage to fraction
+        self.start_adapter = (args.start_adapter_seq, start_adapt_rate, start_adapt_amount)
+        self.end_adapter = (args.end_adapter_seq, end_adapt_rate, end_adapt_amount)
+        self.blocks = collections.OrderedDict()  # block index to block, least recent first
+
+    def __getstate__(self):
+        # Worker processes draw their own blocks.
+        state = self.__dict__.copy()
+        state['blocks'] = collections.OrderedDict()
+        return state
+
+    def get(self, read_index):
+        """
+        Returns the ReadParameterSet for one read.
+        """
+        block_index, i = divmod(read_index, settings.READ_PARAMETER_BLOCK_SIZE)
+        block = self.get_block(block_index)
+        lengths, types, contigs, strands, starts, identities, start_adapters, end_adapters, \
+            chimeras = block
+        start_adapter, end_adapter = self.start_adapter[0], self.end_adapter[0]
+        return ReadParameterSet(int(lengths[i]), FRAGMENT_TYPES[types[i]],
+                                self.ref_contigs[contigs[i]], '+' if strands[i] else '-',
+                                int(starts[i]), float(identities[i]),
+                                start_adapter[len(start_adapter) - start_adapters[i]:],
+                                end_adapter[:end_adapters[i]], int(chimeras[i]))
+
+    def get_block(self, block_index):
+        try:
+            self.blocks.move_to_end(block_index)
+        except KeyError:
+            self.blocks[block_index] = self.draw_block(block_index)
+            if len(self.blocks) > settings.READ_PARAMETER_CACHED_BLOCKS:
+                self.blocks.popitem(last=False)
+        return self.blocks[block_index]
+
+    def draw_block(self, block_index):
+        count = settings.READ_PARAMETER_BLOCK_SIZE
+        rng = get_child_rng(self.base_seed, settings.READ_PARAMETER_SEED_KEY, block_index)
+
+        lengths = self.frag_lengths.get_fragment_lengths(rng, count)
+
+        type_draws = rng.generator.random(count)
+        types = np.zeros(count, dtype=np.int64)
+        types[type_draws < self.junk_read_rate + self.random_read_rate] = 2
+        types[type_draws < self.junk_read_rate] = 1
+
+        # Contig, strand and start position, as in simulate.get_real_fragment.
+        weight_draws = rng.generator.random(count) * self.cum_weights[-1]
+        contigs = np.searchsorted(self.cum_weights, weight_draws, side='right')
+        contigs = np.minimum(contigs, len(self.cum_weights) - 1)
+        strands = rng.generator.random(count) < 0.5
+        starts = (rng.generator.random(count) * self.contig_lengths[contigs]).astype(np.int64)
+
+        identities = self.identities.get_identities(rng, count)
+        start_adapters = draw_adapter_lengths(rng, count, *self.start_adapter)
+        end_adapters = draw_adapter_lengths(rng, count, *self.end_adapter)
+
+        # Each chimeric join happens with the chimera rate, until one doesn't.
+        if self.chimera_rate > 0.0:
+            chimeras = rng.generator.geometric(1.0 - self.chimera_rate, count) - 1
+        else:
+            chimeras = np.zeros(count, dtype=np.int64)
+
+        return lengths, types, contigs, strands, starts, identities, start_adapters, \
+            end_adapters, chimeras
+
+
+def draw_adapter_lengths(rng, count, adapter, rate, amount):
+    """
+    Returns how much of the adapter each read gets, as in simulate.get_start_adapter and
+    simulate.get_end_adapter: the whole adapter, part of it or nothing. Start adapters are the
+    last that many bases of the adapter and end adapters are the first that many. Lengths are
+    returned instead of sequences, as making a string for every read in a block costs more than
+    the rest of the block's draws put together.
+    """
+    if not adapter or rate == 0.0 or amount == 0.0:
+        return np.zeros(count, dtype=np.int64)
+    has_adapter = rng.generator.random(count) < rate
+    if amount == 1.0:
+        return np.where(has_adapter, len(adapter), 0)
+    beta_a = 2.0 * amount
+    beta_b = 2.0 - beta_a
+    frag_lengths = (len(adapter) * rng.generator.beta(beta_a, beta_b, count)).astype(np.int64)
+    return np.where(has_adapter, frag_lengths, 0)
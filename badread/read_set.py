@@ -0,0 +1,53 @@
+"""
+This module contains a class for a virtual read set: a fixed number of simulated reads which are
+made on demand, by index, instead of being stored. It's intended for uses like machine learning
+data loaders, which may want millions of reads in a different order each epoch.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections.abc
+from .simulate import make_read
+
+
+class ReadSet(collections.abc.Sequence):
+    """
+    Read i of the set is the Simulator's read with index i, as (name, seq, qual, info). Each read's
+    random numbers come from its own stream, derived from only the base seed and the read's index
+    (see rng.get_child_rng), so a read can be remade at any time, in any order and in any process,
+    for the cost of making that one read. Its parameters come in blocks of a thousand reads (see
+    read_parameters.py), and drawing a block that isn't cached costs less than making a read.
+    For example:
+        read_set = ReadSet(Simulator('reference.fasta', seed=0), 1000000)
+        name, seq, qual, info = read_set[123456]
+    With a seeded Simulator, the reads are the same as those in a simulate run with that seed.
+    Slicing gives a ReadSet of those indices (e.g. to split the set between workers). Reads which
+    come out empty (rare, and skipped by simulate) are None. A negative count raises a ValueError.
+    """
+    def __init__(self, simulator, count):
+        if count < 0:
+            raise ValueError('read count cannot be negative')
+        self.state = simulator.state
+        self.indices = range(count)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            read_set = ReadSet.__new__(ReadSet)
+            read_set.state, read_set.indices = self.state, self.indices[i]
+            return read_set
+        return make_read(self.state, self.indices[i])
+
+    def __repr__(self):
+        return f'ReadSet({self.indices})'
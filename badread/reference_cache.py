@@ -0,0 +1,271 @@
+"""
+This module contains code for Badread's reference cache: an on-disk copy of a reference with two
+bits per base. The cache is built once (next to the reference FASTA) and reused as long as the
+reference's checksum matches. Contig sequences are memory-mapped from the cache and only the
+parts needed for each fragment are decoded, so large references don't need to be held in memory
+and parallel simulations can share the page cache.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import struct
+import sys
+import numpy as np
+from .misc import get_open_func, parse_fasta_header
+
+
+CACHE_MAGIC = b'BRCACHE1'
+CACHE_VERSION = 1
+
+# Maps ASCII values to 2-bit codes (A=0, C=1, G=2, T=3). Other characters also get 0, but are
+# stored separately as exceptions.
+BASE_TO_CODE = np.zeros(256, dtype=np.uint8)
+for _i, _b in enumerate(b'ACGT'):
+    BASE_TO_CODE[_b] = _i
+IS_ACGT = np.zeros(256, dtype=bool)
+IS_ACGT[list(b'ACGT')] = True
+
+# Maps each packed byte to its four bases.
+BYTE_TO_BASES = np.array([[b'ACGT'[(i >> shift) & 3] for shift in (6, 4, 2, 0)]
+                          for i in range(256)], dtype=np.uint8)
+
+
+def get_cache_filename(reference):
+    return reference + '.badread_cache'
+
+
+def load_reference_cache(reference, output):
+    """
+    Returns the reference's contigs (as PackedSequence objects) and header settings, in the same
+    form as misc.load_fasta. The cache is (re)built if it doesn't exist or doesn't match the
+    reference.
+    """
+    cache_filename = get_cache_filename(reference)
+    checksum = get_file_checksum(reference)
+    header = read_cache_header(cache_filename)
+    if header is None or header['checksum'] != checksum:
+        print(f'  building reference cache: {cache_filename}', file=output)
+        build_reference_cache(reference, cache_filename, checksum)
+        header = read_cache_header(cache_filename)
+        if header is None:
+            sys.exit(f'Error: could not read reference cache {cache_filename}')
+    else:
+        print(f'  using reference cache: {cache_filename}', file=output)
+
+    ref_seqs = collections.OrderedDict()
+    depths, circular, hairpin_left, hairpin_right = {}, {}, {}, {}
+    for c in header['contigs']:
+        name = c['name']
+        exceptions = slice(c['exceptions_start'], c['exceptions_end'])
+        ref_seqs[name] = PackedSequence(cache_filename, header['checksum'], c['offset'],
+                                        c['length'],
+                                        header['exception_starts'][exceptions],
+                                        header['exception_ends'][exceptions],
+                                        header['exception_chars'][exceptions])
+        depths[name], circular[name] = c['depth'], c['circular']
+        hairpin_left[name], hairpin_right[name] = c['hairpin_left'], c['hairpin_right']
+    return ref_seqs, depths, circular, hairpin_left, hairpin_right
+
+
+def get_file_checksum(filename):
+    md5 = hashlib.md5()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 24), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def build_reference_cache(reference, cache_filename, checksum):
+    """
+    Writes the cache file: the magic bytes, each contig's packed bases, then a JSON header
+    (contig info and the non-ACGT exceptions), then the header's length and the magic bytes again.
+    The file is written under a temporary name and then moved into place, so simultaneous runs
+    never see a partial cache.
+    """
+    contigs, exception_starts, exception_ends, exception_chars = [], [], [], []
+    temp_filename = f'{cache_filename}.{os.getpid()}.tmp'
+    try:
+        with open(temp_filename, 'wb') as cache_file:
+            cache_file.write(CACHE_MAGIC)
+            for header, seq in iterate_fasta_bytes(reference):
+                name, depth, circular, hairpin_left, hairpin_right = parse_fasta_header(header)
+                starts, ends, chars = find_exceptions(seq)
+                contigs.append({'name': name, 'length': len(seq), 'offset': cache_file.tell(),
+                                'depth': depth, 'circular': circular,
+                                'hairpin_left': hairpin_left, 'hairpin_right': hairpin_right,
+                                'exceptions_start': len(exception_starts),
+                                'exceptions_end': len(exception_starts) + len(starts)})
+                exception_starts += starts
+                exception_ends += ends
+                exception_chars += chars
+                cache_file.write(pack_bases(seq))
+            header = json.dumps({'version': CACHE_VERSION, 'checksum': checksum,
+                                 'contigs': contigs, 'exception_starts': exception_starts,
+                                 'exception_ends': exception_ends,
+                                 'exception_chars': exception_chars}).encode()
+            cache_file.write(header)
+            cache_file.write(struct.pack('<Q', len(header)))
+            cache_file.write(CACHE_MAGIC)
+        os.replace(temp_filename, cache_filename)
+    except OSError as e:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        sys.exit(f'Error: could not write reference cache {cache_filename}: {e.strerror}')
+
+
+def read_cache_header(cache_filename):
+    """
+    Returns the cache's header, or None if the cache doesn't exist or isn't valid.
+    """
+    try:
+        with open(cache_filename, 'rb') as cache_file:
+            if cache_file.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                return None
+            cache_file.seek(-(8 + len(CACHE_MAGIC)), os.SEEK_END)
+            header_length = struct.unpack('<Q', cache_file.read(8))[0]
+            if cache_file.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                return None
+            cache_file.seek(-(header_length + 8 + len(CACHE_MAGIC)), os.SEEK_END)
+            header = json.loads(cache_file.read(header_length).decode())
+    except (OSError, ValueError, struct.error):
+        return None
+    if header.get('version') != CACHE_VERSION:
+        return None
+    return header
+
+
+def iterate_fasta_bytes(filename):
+    """
+    Yields the header and uppercase sequence (as bytes) for each contig in a FASTA file, one contig
+    at a time.
+    """
+    with get_open_func(filename)(filename, 'rb') as fasta_file:
+        header, sequence = None, []
+        for line in fasta_file:
+            line = line.strip()
+            if not line:
+                continue
+            if line[:1] == b'>':
+                if header is not None:
+                    yield header, b''.join(sequence).upper()
+                    sequence = []
+                header = line[1:].decode()
+            else:
+                sequence.append(line)
+        if header is not None:
+            yield header, b''.join(sequence).upper()
+
+
+def pack_bases(seq):
+    """
+    Packs a sequence (bytes) into two bits per base, four bases per byte (first base in the high
+    bits).
+    """
+    codes = BASE_TO_CODE[np.frombuffer(seq, dtype=np.uint8)]
+    codes = np.concatenate((codes, np.zeros(-len(codes) % 4, dtype=np.uint8))).reshape(-1, 4)
+    return ((codes[:, 0] << 6) | (codes[:, 1] << 4) | (codes[:, 2] << 2) | codes[:, 3]).tobytes()
+
+
+def find_exceptions(seq):
+    """
+    Finds runs of the same non-ACGT character (e.g. N) in a sequence (bytes), returning their
+    starts, ends and characters.
+    """
+    values = np.frombuffer(seq, dtype=np.uint8)
+    other = ~IS_ACGT[values]
+    if not other.any():
+        return [], [], []
+    positions = np.flatnonzero(other)
+    breaks = np.flatnonzero((np.diff(positions) != 1) |
+                            (values[positions[1:]] != values[positions[:-1]])) + 1
+    starts = positions[np.concatenate(([0], breaks))]
+    ends = positions[np.concatenate((breaks - 1, [len(positions) - 1]))] + 1
+    chars = [chr(c) for c in values[starts].tolist()]
+    return starts.tolist(), ends.tolist(), chars
+
+
+class LazySequence(object):
+    """
+    The base class for contig sequences which are read on demand. It supports len() and slicing
+    (which returns a str) like a normal sequence, but only reads the bases in the slice. Subclasses
+    provide the decode method, which returns the forward-strand bases in a range.
+    """
+    def __init__(self, length):
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError(f'{type(self).__name__} only supports slicing with a step of 1')
+        start, end, _ = key.indices(self.length)
+        if end <= start:
+            return ''
+        return self.decode(start, end)
+
+    def decode(self, start, end):
+        raise NotImplementedError
+
+
+# Each process memory-maps a cache file once, on first use, and every contig reads from that one
+# map. A map per contig would hold a file descriptor per contig, which references with many
+# contigs would run out of. Maps are keyed by the reference checksum too, as a rebuilt cache is a
+# new file.
+_cache_maps = {}
+
+
+def get_cache_map(cache_filename, checksum):
+    try:
+        return _cache_maps[(cache_filename, checksum)]
+    except KeyError:
+        cache_map = np.memmap(cache_filename, dtype=np.uint8, mode='r')
+        _cache_maps[(cache_filename, checksum)] = cache_map
+        return cache_map
+
+
+class PackedSequence(LazySequence):
+    """
+    A contig sequence stored in the reference cache, as an offset into the cache file's shared
+    memory map (see get_cache_map).
+    """
+    def __init__(self, cache_filename, checksum, offset, length, exception_starts,
+                 exception_ends, exception_chars):
+        super().__init__(length)
+        self.cache_filename = cache_filename
+        self.checksum = checksum
+        self.offset = offset
+        self.exception_starts = np.asarray(exception_starts, dtype=np.int64)
+        self.exception_ends = np.asarray(exception_ends, dtype=np.int64)
+        self.exception_chars = exception_chars
+
+    def decode(self, start, end):
+        cache_map = get_cache_map(self.cache_filename, self.checksum)
+        packed = cache_map[self.offset + start // 4:self.offset + (end + 3) // 4]
+        bases = BYTE_TO_BASES[packed].reshape(-1)
+        bases = bases[start % 4:start % 4 + end - start]
+
+        # Put back any non-ACGT runs which overlap the range.
+        first = np.searchsorted(self.exception_ends, start, side='right')
+        if first < len(self.exception_starts) and self.exception_starts[first] < end:
+            bases = bases.copy()
+            for i in range(first, len(self.exception_starts)):
+                run_start, run_end = int(self.exception_starts[i]), int(self.exception_ends[i])
+                if run_start >= end:
+                    break
+                bases[max(run_start, start) - start:min(run_end, end) - start] = \
+                    ord(self.exception_chars[i])
+        return bases.tobytes().decode()
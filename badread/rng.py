@@ -0,0 +1,104 @@
+"""
+This module contains Badread's random number generator class. All of the simulation's randomness
+comes from Rng objects which are passed to the functions that need them, so there is no global
+random state: each read gets its own stream, derived from the base seed and the read's index.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import bisect
+import numpy as np
+
+
+UNIFORM_BLOCK_SIZE = 1024
+BYTES_BLOCK_SIZE = 4096
+
+
+class Rng(object):
+    """
+    A NumPy Generator (PCG64) along with fast scalar draws. Array draws (e.g.
+    rng.generator.gamma(k, theta, count)) go straight to the generator. But each scalar call to a
+    Generator costs around a microsecond, which adds up when made for every k-mer or base, so the
+    scalar methods here instead use uniform values drawn in blocks.
+    """
+    def __init__(self, seed=None):
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.generator = np.random.Generator(np.random.PCG64(seed))
+        self._uniforms = []
+        self._bytes, self._bytes_pos = b'', 0
+
+    def spawn(self, count):
+        """
+        Returns independent child Rngs, using SeedSequence.spawn.
+        """
+        return [Rng(s) for s in self.seed_sequence.spawn(count)]
+
+    def random(self):
+        """
+        Returns a uniform value in [0, 1).
+        """
+        try:
+            return self._uniforms.pop()
+        except IndexError:
+            self._uniforms = self.generator.random(UNIFORM_BLOCK_SIZE).tolist()
+            return self._uniforms.pop()
+
+    def bytes(self, length):
+        """
+        Returns random bytes, like Generator.bytes. That costs around ten microseconds per call
+        whatever the length, so short requests are served from a buffered block.
+        """
+        if length > BYTES_BLOCK_SIZE:
+            return self.generator.bytes(length)
+        if self._bytes_pos + length > len(self._bytes):
+            self._bytes, self._bytes_pos = self.generator.bytes(BYTES_BLOCK_SIZE), 0
+        self._bytes_pos += length
+        return self._bytes[self._bytes_pos - length:self._bytes_pos]
+
+    def chance(self, probability):
+        return self.random() < probability
+
+    def randint(self, a, b):
+        """
+        Returns an integer from a to b (inclusive), like random.randint.
+        """
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+    def weighted_choice(self, population, cum_weights):
+        """
+        Returns one item from the population, like random.choices with cumulative weights.
+        """
+        return population[bisect.bisect_right(cum_weights, self.random() * cum_weights[-1],
+                                              0, len(cum_weights) - 1)]
+
+    def getrandbits(self, k):
+        """
+        Returns an integer with k random bits, like random.getrandbits.
+        """
+        value = 0
+        for word in self.generator.bit_generator.random_raw((k + 63) // 64).tolist():
+            value = (value << 64) | word
+        return value >> (-k % 64)
+
+
+def get_child_rng(base_seed, *spawn_key):
+    """
+    Returns the Rng for one of the base seed's child streams. This is the stream that spawning
+    would give (e.g. a spawn key of (0, 5) is child 5 of child 0), but made directly, so one read's
+    stream doesn't depend on how many others were made before it.
+    """
+    return Rng(np.random.SeedSequence(base_seed, spawn_key=spawn_key))
@@ -0,0 +1,58 @@
+"""
+This module contains code for timing the stages of a simulate run and counting what happens in
+its hot loops (e.g. k-mer draws and edlib calls). With --report, these are written to a JSON file,
+which is useful for tracking performance changes and for seeing how fast an error/qscore model is.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import json
+import sys
+from .version import __version__
+
+
+class RunStats(object):
+    """
+    Cumulative seconds per stage and totals per counter. Stages can be nested, shown with a '/' in
+    the name (e.g. 'sequence_fragment/error_loop' is part of 'sequence_fragment'). Worker processes
+    keep their own RunStats, which are merged into the main one, so with multiple threads the
+    stage times add up to more than the wall time.
+    """
+    def __init__(self):
+        self.times = collections.Counter()
+        self.counts = collections.Counter()
+
+    def add_time(self, stage, seconds):
+        self.times[stage] += seconds
+
+    def add_count(self, name, count=1):
+        self.counts[name] += count
+
+    def merge(self, other):
+        self.times.update(other.times)
+        self.counts.update(other.counts)
+
+    def get_report(self, wall_time, threads):
+        return {'badread_version': __version__,
+                'wall_time': wall_time,
+                'threads': threads,
+                'stage_times': {s: float(self.times[s]) for s in sorted(self.times)},
+                'counts': {c: int(self.counts[c]) for c in sorted(self.counts)}}
+
+    def write_report(self, filename, wall_time, threads):
+        try:
+            with open(filename, 'wt') as f:
+                json.dump(self.get_report(wall_time, threads), f, indent=2)
+                f.write('\n')
+        except OSError as e:
+            sys.exit(f'Error: could not write report to {filename} ({e.strerror})')
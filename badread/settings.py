@@ -25,6 +25,11 @@ ALIGNMENT_INTERVAL = 25
 ALIGNMENT_SIZE = 1000
 
 
+# The fast engine draws k-mer positions in batches. Its arrays are a few dozen bytes per draw, so
+# this caps a batch's memory use on long reads (more batches are drawn as needed).
+FAST_ENGINE_MAX_BATCH = 250000
+
+
 # I don't let users set a very small minimum mean read length (e.g. 2) or very low minimum read
 # identity (e.g. 50%) as that might break some things. These settings control how low they can go.
 MIN_MEAN_READ_LENGTH = 100
@@ -49,3 +54,43 @@ IDEAL_QSCORE_RANK_6_MIN, IDEAL_QSCORE_RANK_6_MAX = 41, 50
 # Chimeric reads may or may not get adapters in the middle.
 CHIMERA_START_ADAPTER_CHANCE = 0.25
 CHIMERA_END_ADAPTER_CHANCE = 0.25
+
+
+# Simulated reads are collected into a buffer of roughly this many bytes (adjustable with
+# --output_buffer) before being written.
+OUTPUT_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Compressed output (BGZF) uses this zlib level (the same default as bgzip) and each compression
+# thread may have up to BGZF_BLOCKS_PER_THREAD 64 kB blocks waiting to be written.
+BGZF_COMPRESSION_LEVEL = 6
+BGZF_BLOCKS_PER_THREAD = 16
+
+
+# Simulate's progress line is redrawn every PROGRESS_INTERVAL seconds on a terminal. When stderr
+# isn't a terminal (e.g. a log file), a new line is written every PROGRESS_LOG_INTERVAL seconds.
+PROGRESS_INTERVAL = 0.2
+PROGRESS_LOG_INTERVAL = 30
+
+
+# With --checkpoint, simulate saves its progress every CHECKPOINT_INTERVAL seconds.
+CHECKPOINT_INTERVAL = 60
+
+
+# When simulating with multiple threads, reads are handed out to worker processes in batches of
+# roughly BASES_PER_TASK bases, and each worker is kept up to TASKS_PER_THREAD batches ahead of the
+# output.
+BASES_PER_TASK = 1000000
+TASKS_PER_THREAD = 4
+
+
+# All random numbers come from child streams of the base seed (see rng.py), identified by these
+# keys: one stream for setting up the simulation, one per read (keyed by the read's index) and one
+# per block of READ_PARAMETER_BLOCK_SIZE reads for the parameters drawn in read_parameters.py.
+SETUP_SEED_KEY = 0
+READ_SEED_KEY = 1
+READ_PARAMETER_SEED_KEY = 2
+READ_PARAMETER_BLOCK_SIZE = 1000
+
+# How many blocks of read parameters each process keeps. A block takes about 70 kB, and a
+# shuffled ReadSet of up to this many blocks' reads only draws each block once.
+READ_PARAMETER_CACHED_BLOCKS = 64
@@ -14,111 +14,391 @@ details. You should have received a copy of the GNU General Public License along
 If not, see <http://www.gnu.org/licenses/>.
 """
 
+import collections
+import contextlib
 import edlib
+import itertools
+import multiprocessing
 import numpy as np
-import random
+import os
 import sys
+import time
 import uuid
 from .misc import load_fasta, get_random_sequence, reverse_complement, random_chance, \
     float_to_str, str_is_int, identity_from_edlib_cigar
+from .checkpoint import Checkpointer, get_checkpoint_settings, load_checkpoint
 from .error_model import ErrorModel
-from .qscore_model import QScoreModel, get_qscores
+from .fastq_writer import FastqWriter, ShardedFastqWriter
+from .indexed_fasta import find_fasta_index, load_indexed_fasta
+from .reference_cache import load_reference_cache
+from .qscore_model import QScoreModel, get_qscores, cigar_from_edits
+from .fast_engine import sequence_fragment_fast
 from .fragment_lengths import FragmentLengths
+from .progress import Progress
 from .identities import Identities
+from .read_parameters import ReadParameters
+from .rng import get_child_rng
+from .run_stats import RunStats
 from .version import __version__
 from . import settings
 
 
+SimulationState = collections.namedtuple('SimulationState',
+                                         ['base_seed', 'frag_lengths', 'ref_seqs',
+                                          'ref_contigs', 'ref_contig_cum_weights',
+                                          'ref_circular', 'left_hairpin', 'right_hairpin', 'args',
+                                          'start_adapt_rate', 'start_adapt_amount',
+                                          'end_adapt_rate', 'end_adapt_amount', 'read_parameters',
+                                          'error_model', 'qscore_model'])
+
+
 def simulate(args, output=sys.stderr):
-    print_intro(output)
-    if args.seed is not None:
-        random.seed(args.seed)
-        np.random.seed(args.seed)
-    ref_seqs, ref_depths, ref_circular, left_hairpin, right_hairpin = load_reference(args.reference, output)
-    rev_comp_ref_seqs = {name: reverse_complement(seq) for name, seq in ref_seqs.items()}
-    frag_lengths = FragmentLengths(args.mean_frag_length, args.frag_length_stdev, output)
-    adjust_depths(ref_seqs, ref_depths, ref_circular, frag_lengths, args)
-    identities = Identities(args.mean_identity, args.identity_stdev, args.max_identity, output)
-    error_model = ErrorModel(args.error_model, output)
-    qscore_model = QScoreModel(args.qscore_model, output)
-    ref_contigs, ref_contig_weights = get_ref_contig_weights(ref_seqs, ref_depths)
-    print_glitch_summary(args.glitch_rate, args.glitch_size, args.glitch_skip, output)
-
-    start_adapt_rate, start_adapt_amount = adapter_parameters(args.start_adapter)
-    end_adapt_rate, end_adapt_amount = adapter_parameters(args.end_adapter)
-    random_start, random_end = build_random_adapters(args)
-    print_adapter_summary(start_adapt_rate, start_adapt_amount, args.start_adapter_seq,
-                          end_adapt_rate, end_adapt_amount, args.end_adapter_seq,
-                          random_start, random_end, output)
-
-    print_other_problem_summary(args, output)
-    ref_size = sum(len(x) for x in ref_seqs.values())
-    target_size = get_target_size(ref_size, args.quantity)
+    start_time = time.perf_counter()
+    stats = RunStats() if args.report is not None else None
+    checkpoint = load_checkpoint(args) if args.resume else None
+    run_settings = get_checkpoint_settings(args)  # before setup makes any random adapters
+    simulator = Simulator.from_args(args, output,
+                                    None if checkpoint is None else checkpoint['base_seed'])
+    target_size = simulator.get_target_size(args.quantity)
     print('', file=output)
     print(f'Target read set size: {target_size:,} bp', file=output)
+    if args.threads > 1:
+        print(f'Generating reads with {args.threads} worker processes', file=output)
 
     print('', file=output)
-    count, total_size = 0, 0
-    print_progress(count, total_size, target_size, output)
-    while total_size < target_size:
-        fragment, info = build_fragment(frag_lengths, ref_seqs, rev_comp_ref_seqs, ref_contigs,
-                                        ref_contig_weights, ref_circular, left_hairpin, right_hairpin,
-                                        args, start_adapt_rate, start_adapt_amount, end_adapt_rate, end_adapt_amount)
-        target_identity = identities.get_identity()
-        seq, quals, actual_identity, identity_by_qscores = \
-            sequence_fragment(fragment, target_identity, error_model, qscore_model)
-        if len(seq) == 0:
-            continue
+    if checkpoint is None:
+        next_index, count, total_size = 0, 0, 0
+    else:
+        next_index, count, total_size = \
+            checkpoint['next_index'], checkpoint['count'], checkpoint['total_size']
+        print(f'Resuming from checkpoint: {count:,} reads, {total_size:,} bp', file=output)
+    checkpointer = Checkpointer(args, simulator.base_seed, run_settings) \
+        if args.checkpoint or args.resume else None
+    progress = Progress(target_size, output, count, total_size)
+    task_size = reads_per_task(args.mean_frag_length, target_size, args.threads)
+    loop_start_time = time.perf_counter()
+    output_time = 0.0
+    with contextlib.closing(generate_reads(simulator.state, args.threads, task_size, next_index,
+                                           stats)) as reads, \
+            get_fastq_writer(args, checkpoint) as writer:
+        while total_size < target_size:
+            read_index, (read_name, seq, quals, info) = next(reads)
+            write_start_time = time.perf_counter()
+            writer.write(read_name, seq, quals, info)
+            output_time += time.perf_counter() - write_start_time
+            next_index = read_index + 1
+
+            total_size += len(seq)
+            count += 1
+            progress.update(count, total_size)
+            if checkpointer is not None:
+                checkpointer.save_if_due(next_index, count, total_size, writer)
+
+        # A final checkpoint lets a finished run be extended.
+        if checkpointer is not None:
+            checkpointer.save(next_index, count, total_size, writer)
+        close_start_time = time.perf_counter()
+    output_time += time.perf_counter() - close_start_time  # finishing the output
+
+    progress.finish(count, total_size)
+    if stats is not None:
+        stats.add_time('setup', loop_start_time - start_time)
+        stats.add_time('output', output_time)
+        stats.add_count('reads_written', count)
+        stats.add_count('bases_written', total_size)
+        stats.write_report(args.report, time.perf_counter() - start_time, args.threads)
+
+
+class Simulator(object):
+    """
+    Badread's read simulation for use from Python. The reference, models and length and identity
+    distributions are loaded once, and then reads can be made as many times as needed, without
+    going through stdout or FASTQ files:
+        simulator = Simulator('reference.fasta', seed=0, error_model='pacbio2021')
+        for name, seq, qual, info in simulator.reads('10x'):
+            ...
+    The options are the simulate subcommand's (e.g. length='15000,13000' or threads=4), with the
+    same defaults. Nothing is printed unless a log stream (e.g. log=sys.stderr) is given. Bad
+    options raise a ValueError (with the message the command line would give) instead of exiting.
+    """
+    def __init__(self, reference, log=None, **options):
+        from .__main__ import get_simulate_args
+        try:
+            args = get_simulate_args(reference, **options)
+        except SystemExit as e:
+            raise ValueError(e.code) from None
+        if log is None:
+            with open(os.devnull, 'wt') as null:
+                self.set_up(args, null)
+        else:
+            self.set_up(args, log)
+
+    @classmethod
+    def from_args(cls, args, log=sys.stderr, base_seed=None):
+        """
+        Makes a Simulator from already-checked command-line arguments. The base seed can be given
+        (e.g. from a checkpoint) in place of the one from args.seed.
+        """
+        simulator = cls.__new__(cls)
+        simulator.set_up(args, log, base_seed)
+        return simulator
+
+    def set_up(self, args, log, base_seed=None):
+        print_intro(log)
+        self.args = args
+        self.base_seed = get_base_seed(args.seed) if base_seed is None else base_seed
+        rng = get_child_rng(self.base_seed, settings.SETUP_SEED_KEY)
+        ref_seqs, ref_depths, ref_circular, left_hairpin, right_hairpin = \
+            load_reference(args.reference, log, args.ref_cache)
+        frag_lengths = FragmentLengths(args.mean_frag_length, args.frag_length_stdev, log)
+        adjust_depths(ref_seqs, ref_depths, ref_circular, frag_lengths, args, rng)
+        identities = Identities(args.mean_identity, args.identity_stdev, args.max_identity, log)
+        error_model = ErrorModel(args.error_model, log)
+        if args.engine == 'fast':
+            error_model.get_edit_tables()  # built now so worker processes can share it
+        qscore_model = QScoreModel(args.qscore_model, log)
+        ref_contigs, ref_contig_cum_weights = get_ref_contig_weights(ref_seqs, ref_depths)
+        print_glitch_summary(args.glitch_rate, args.glitch_size, args.glitch_skip, log)
+
+        start_adapt_rate, start_adapt_amount = adapter_parameters(args.start_adapter)
+        end_adapt_rate, end_adapt_amount = adapter_parameters(args.end_adapter)
+        random_start, random_end = build_random_adapters(args, rng)
+        print_adapter_summary(start_adapt_rate, start_adapt_amount, args.start_adapter_seq,
+                              end_adapt_rate, end_adapt_amount, args.end_adapter_seq,
+                              random_start, random_end, log)
+        print_other_problem_summary(args, log)
+
+        self.ref_size = sum(len(x) for x in ref_seqs.values())
+        read_parameters = ReadParameters(self.base_seed, frag_lengths, identities, ref_seqs,
+                                         ref_contigs, ref_contig_cum_weights, args,
+                                         start_adapt_rate, start_adapt_amount, end_adapt_rate,
+                                         end_adapt_amount)
+        self.state = SimulationState(self.base_seed, frag_lengths, ref_seqs, ref_contigs,
+                                     ref_contig_cum_weights, ref_circular, left_hairpin,
+                                     right_hairpin, args, start_adapt_rate, start_adapt_amount,
+                                     end_adapt_rate, end_adapt_amount, read_parameters,
+                                     error_model, qscore_model)
+        self.next_index = 0
+
+    def get_target_size(self, quantity):
+        return get_target_size(self.ref_size, str(quantity))
+
+    def reads(self, quantity=None):
+        """
+        Yields reads as (name, seq, qual, info) tuples, where info is the rest of the FASTQ
+        header. Reads stop once the quantity (e.g. '25x' or 250000, default: the Simulator's
+        quantity option) of sequence has been made, or with no quantity, when the caller stops.
+        Each call carries on from the reads of the one before, so a seeded Simulator's reads from
+        consecutive calls are the same as those from a single simulate run.
+        """
+        if quantity is None:
+            quantity = self.args.quantity
+        target_size = None if quantity is None else self.get_target_size(quantity)
+        task_size = reads_per_task(self.args.mean_frag_length,
+                                   float('inf') if target_size is None else target_size,
+                                   self.args.threads)
+        total_size = 0
+        with contextlib.closing(generate_reads(self.state, self.args.threads, task_size,
+                                               self.next_index)) as reads:
+            while target_size is None or total_size < target_size:
+                read_index, read = next(reads)
+                self.next_index = read_index + 1
+                total_size += len(read[1])
+                yield read
+
+
+def get_fastq_writer(args, checkpoint=None):
+    buffer_size = args.output_buffer * 1024  # kB to bytes
+    resume_from = None if checkpoint is None else checkpoint['output']
+    if args.output_dir is not None:
+        return ShardedFastqWriter(args.output_dir, args.reads_per_file, args.compress_shards,
+                                  buffer_size, args.threads, resume_from=resume_from)
+    return FastqWriter(args.output, buffer_size, args.threads, resume_from=resume_from)
+
+
+def get_base_seed(seed):
+    """
+    Returns the seed from which every read's random numbers are derived. If the user didn't give
+    a seed, one is made from system entropy, so each run is different.
+    """
+    if seed is not None:
+        return seed
+    return np.random.SeedSequence().entropy
 
-        info.append(f'length={len(seq)}')
-        info.append(f'error-free_length={len(fragment)}')
-        info.append(f'read_identity={actual_identity * 100.0:.3f}%')
 
-        read_name = uuid.UUID(int=random.getrandbits(128))
-        info = ' '.join(info)
-        print(f'@{read_name} {info}')
-        print(seq)
-        print('+')
-        print(quals)
+def make_read(state, read_index, stats=None):
+    """
+    Builds and sequences a single read, returning its name, sequence, qualities and header info.
+    Returns None if the read ended up with no sequence. If a RunStats object is given, the time
+    spent in each stage is added to it.
+    """
+    start_time = time.perf_counter()
+    rng = get_child_rng(state.base_seed, settings.READ_SEED_KEY, read_index)
+    params = state.read_parameters.get(read_index)
+    params_time = time.perf_counter()
+    fragment, info = build_fragment(state.frag_lengths, state.ref_seqs,
+                                    state.ref_contigs, state.ref_contig_cum_weights,
+                                    state.ref_circular, state.left_hairpin, state.right_hairpin,
+                                    state.args, state.start_adapt_rate, state.start_adapt_amount,
+                                    state.end_adapt_rate, state.end_adapt_amount, rng, params,
+                                    stats)
+    build_time = time.perf_counter()
+    target_identity = params.identity
+    sequence_func = sequence_fragment_fast if state.args.engine == 'fast' else sequence_fragment
+    seq, quals, actual_identity, identity_by_qscores = \
+        sequence_func(fragment, target_identity, state.error_model, state.qscore_model, rng,
+                      edlib_alignment=state.args.read_alignment == 'edlib', stats=stats)
+    if stats is not None:
+        stats.add_time('read_parameters', params_time - start_time)
+        stats.add_time('build_fragment', build_time - params_time)
+        stats.add_time('sequence_fragment', time.perf_counter() - build_time)
+        stats.add_count('reads_made')
+        stats.add_count('fragment_bases', len(fragment))
+    if len(seq) == 0:
+        return None
+
+    info.append(f'length={len(seq)}')
+    info.append(f'error-free_length={len(fragment)}')
+    info.append(f'read_identity={actual_identity * 100.0:.3f}%')
+
+    read_name = uuid.UUID(int=rng.getrandbits(128))
+    return str(read_name), seq, quals, ' '.join(info)
+
+
+def make_reads(state, first_index, read_count, stats=None):
+    reads = ((i, make_read(state, i, stats)) for i in range(first_index, first_index + read_count))
+    return [(i, r) for i, r in reads if r is not None]
+
+
+def reads_per_task(mean_frag_length, target_size, threads):
+    """
+    Worker processes are given reads in batches which total roughly settings.BASES_PER_TASK, so
+    short reads don't drown in inter-process overhead. Batches are made smaller for small read
+    sets, so the workers don't make far more reads than are needed.
+    """
+    expected_reads = target_size / mean_frag_length
+    task_size = min(settings.BASES_PER_TASK / mean_frag_length,
+                    expected_reads / (threads * settings.TASKS_PER_THREAD))
+    return max(1, int(task_size))
 
-        total_size += len(seq)
-        count += 1
-        print_progress(count, total_size, target_size, output)
 
-    print('\n', file=output)
+def generate_reads(state, threads, task_size, first_index=0, stats=None):
+    """
+    Yields reads (with their read index, in index order) indefinitely - it's up to the caller to
+    stop when enough sequence has been made. With more than one thread, the reads are made in a
+    pool of worker processes, a few batches ahead of the caller.
+    """
+    if threads == 1:
+        for i in itertools.count(first_index):
+            read = make_read(state, i, stats)
+            if read is not None:
+                yield i, read
+        return
+
+    with get_multiprocessing_context().Pool(threads, initializer=init_worker,
+                                            initargs=(state,)) as pool:
+        pending = collections.deque()
+        while True:
+            while len(pending) < threads * settings.TASKS_PER_THREAD:
+                pending.append(pool.apply_async(make_reads_in_worker,
+                                                (first_index, task_size, stats is not None)))
+                first_index += task_size
+            reads, task_stats, error = pending.popleft().get()
+            if error is not None:
+                sys.exit(error)
+            if stats is not None:
+                stats.merge(task_stats)
+            yield from reads
+
+
+def get_multiprocessing_context():
+    # Forking lets the workers share the reference and models with the parent process instead of
+    # pickling them, so it's preferred where available.
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+_worker_state = None
+
+
+def init_worker(state):
+    global _worker_state
+    _worker_state = state
+
+
+def make_reads_in_worker(first_index, read_count, keep_stats):
+    # A sys.exit in a pool worker would kill the worker and leave the parent waiting forever, so
+    # the error message is instead passed back to the parent.
+    stats = RunStats() if keep_stats else None
+    try:
+        return make_reads(_worker_state, first_index, read_count, stats), stats, None
+    except SystemExit as e:
+        return [], stats, e.code
 
 
-def build_fragment(frag_lengths, ref_seqs, rev_comp_ref_seqs, ref_contigs, ref_contig_weights,
+def build_fragment(frag_lengths, ref_seqs, ref_contigs, ref_contig_cum_weights,
                    ref_circular, left_hairpin, right_hairpin, args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                   end_adapt_amount):
-    fragment = [get_start_adapter(start_adapt_rate, start_adapt_amount, args.start_adapter_seq)]
-    info = []
-    frag_seq, frag_info = get_fragment(frag_lengths, ref_seqs, rev_comp_ref_seqs,
-                                       ref_contigs, ref_contig_weights, ref_circular, left_hairpin, right_hairpin, args)
-    fragment.append(frag_seq)
-    info.append(','.join(frag_info))
-
-    while random_chance(args.chimeras / 100):  # percentage to fraction
+                   end_adapt_amount, rng, params=None, stats=None):
+    """
+    If params (a ReadParameterSet) is given, the first fragment, adapters and number of chimeric
+    joins come from it. Otherwise they are drawn here.
+    """
+    if params is None:
+        start_adapter = get_start_adapter(start_adapt_rate, start_adapt_amount,
+                                          args.start_adapter_seq, rng)
+        end_adapter = get_end_adapter(end_adapt_rate, end_adapt_amount, args.end_adapter_seq, rng)
+        chimeras = get_chimera_count(args.chimeras / 100, rng)  # percentage to fraction
+        frag_seq, frag_info = get_fragment(frag_lengths, ref_seqs, ref_contigs,
+                                           ref_contig_cum_weights, ref_circular, left_hairpin,
+                                           right_hairpin, args, rng)
+    else:
+        start_adapter, end_adapter, chimeras = \
+            params.start_adapter, params.end_adapter, params.chimeras
+        frag_seq, frag_info = get_preset_fragment(params, ref_seqs, ref_contigs,
+                                                  ref_contig_cum_weights, ref_circular,
+                                                  left_hairpin, right_hairpin, rng)
+    fragment = [start_adapter, frag_seq]
+    info = [','.join(frag_info)]
+
+    for _ in range(chimeras):
         info.append('chimera')
-        if random_chance(settings.CHIMERA_END_ADAPTER_CHANCE):
+        if random_chance(settings.CHIMERA_END_ADAPTER_CHANCE, rng):
             fragment.append(args.end_adapter_seq)
-        if random_chance(settings.CHIMERA_START_ADAPTER_CHANCE):
+        if random_chance(settings.CHIMERA_START_ADAPTER_CHANCE, rng):
             fragment.append(args.start_adapter_seq)
-        frag_seq, frag_info = get_fragment(frag_lengths, ref_seqs, rev_comp_ref_seqs,
-                                           ref_contigs, ref_contig_weights, ref_circular, left_hairpin, right_hairpin, args)
+        frag_seq, frag_info = get_fragment(frag_lengths, ref_seqs, ref_contigs,
+                                           ref_contig_cum_weights, ref_circular, left_hairpin,
+                                           right_hairpin, args, rng)
         fragment.append(frag_seq)
         info.append(','.join(frag_info))
-    fragment.append(get_end_adapter(end_adapt_rate, end_adapt_amount, args.end_adapter_seq))
+    fragment.append(end_adapter)
     fragment = ''.join(fragment)
-    fragment = add_glitches(fragment, args.glitch_rate, args.glitch_size, args.glitch_skip)
+    glitch_start_time = time.perf_counter()
+    fragment = add_glitches(fragment, args.glitch_rate, args.glitch_size, args.glitch_skip, rng)
+    if stats is not None:
+        stats.add_time('build_fragment/add_glitches', time.perf_counter() - glitch_start_time)
 
     return fragment, info
 
 
+def get_chimera_count(chimera_rate, rng):
+    count = 0
+    while random_chance(chimera_rate, rng):
+        count += 1
+    return count
+
+
 def get_ref_contig_weights(ref_seqs, ref_depths):
+    """
+    Returns the contig names and their cumulative weights (depth times length). The weights are
+    accumulated once here so choosing a contig for each read is a binary search, not a pass over
+    every contig.
+    """
     ref_contigs = [x[0] for x in ref_depths.items()]
-    ref_contig_weights = [x[1] * len(ref_seqs[x[0]]) for x in ref_depths.items()]
-    return ref_contigs, ref_contig_weights
+    ref_contig_cum_weights = list(itertools.accumulate(x[1] * len(ref_seqs[x[0]])
+                                                       for x in ref_depths.items()))
+    return ref_contigs, ref_contig_cum_weights
 
 
 def get_target_size(ref_size, quantity):
@@ -145,33 +425,57 @@ def get_target_size(ref_size, quantity):
              '(e.g. 25x)')
 
 
-def get_fragment(frag_lengths, ref_seqs, rev_comp_ref_seqs, ref_contigs, ref_contig_weights,
-                 ref_circular, left_hairpin, right_hairpin, args):
-    fragment_length = frag_lengths.get_fragment_length()
-    fragment_type = get_fragment_type(args)
+def get_fragment(frag_lengths, ref_seqs, ref_contigs, ref_contig_cum_weights,
+                 ref_circular, left_hairpin, right_hairpin, args, rng):
+    fragment_length = frag_lengths.get_fragment_length(rng)
+    fragment_type = get_fragment_type(args, rng)
     if fragment_type == 'junk':
-        return get_junk_fragment(fragment_length), ['junk_seq']
+        return get_junk_fragment(fragment_length, rng), ['junk_seq']
     elif fragment_type == 'random':
-        return get_random_sequence(fragment_length), ['random_seq']
+        return get_random_sequence(fragment_length, rng), ['random_seq']
+
+    return get_good_fragment(fragment_length, ref_seqs, ref_contigs, ref_contig_cum_weights,
+                             ref_circular, left_hairpin, right_hairpin, rng)
 
+
+def get_preset_fragment(params, ref_seqs, ref_contigs, ref_contig_cum_weights, ref_circular,
+                        left_hairpin, right_hairpin, rng):
+    """
+    Like get_fragment, but using the pre-drawn length, type and reference position in params.
+    """
+    if params.fragment_type == 'junk':
+        return get_junk_fragment(params.fragment_length, rng), ['junk_seq']
+    elif params.fragment_type == 'random':
+        return get_random_sequence(params.fragment_length, rng), ['random_seq']
+    seq, info = cut_real_fragment(params.fragment_length, ref_seqs, params.contig, params.strand,
+                                  params.start_pos, ref_circular, left_hairpin, right_hairpin)
+    if seq != '':
+        return seq, info
+    return get_good_fragment(params.fragment_length, ref_seqs, ref_contigs,
+                             ref_contig_cum_weights, ref_circular, left_hairpin, right_hairpin, rng)
+
+
+def get_good_fragment(fragment_length, ref_seqs, ref_contigs, ref_contig_cum_weights,
+                      ref_circular, left_hairpin, right_hairpin, rng):
     # The get_real_fragment function can potentially return nothing, so we try repeatedly until we
     # get a result.
     for _ in range(1000):
-        seq, info = get_real_fragment(fragment_length, ref_seqs, rev_comp_ref_seqs, ref_contigs,
-                                      ref_contig_weights, ref_circular, left_hairpin, right_hairpin)
+        seq, info = get_real_fragment(fragment_length, ref_seqs, ref_contigs,
+                                      ref_contig_cum_weights, ref_circular, left_hairpin, right_hairpin,
+                                      rng)
         if seq != '':
             return seq, info
     sys.exit('Error: failed to generate any sequence fragments - are your read lengths '
              'incompatible with your reference contig lengths?')
 
 
-def get_fragment_type(args):
+def get_fragment_type(args, rng):
     """
     Returns either 'junk_seq', 'random_seq' or 'good'
     """
     junk_read_rate = args.junk_reads / 100      # percentage to fraction
     random_read_rate = args.random_reads / 100  # percentage to fraction
-    random_draw = random.random()
+    random_draw = rng.random()
     if random_draw < junk_read_rate:
         return 'junk'
     elif random_draw < junk_read_rate + random_read_rate:
@@ -180,84 +484,105 @@ def get_fragment_type(args):
         return 'good'
 
 
-def get_real_fragment(fragment_length, ref_seqs, rev_comp_ref_seqs, ref_contigs,
-                      ref_contig_weights, ref_circular, left_hairpin, right_hairpin):
+def get_real_fragment(fragment_length, ref_seqs, ref_contigs, ref_contig_cum_weights, ref_circular,
+                      left_hairpin, right_hairpin, rng):
 
     if len(ref_contigs) == 1:
         contig = ref_contigs[0]
     else:
-        contig = random.choices(ref_contigs, weights=ref_contig_weights)[0]
+        contig = rng.weighted_choice(ref_contigs, ref_contig_cum_weights)
+
+    strand = '+' if random_chance(0.5, rng) else '-'
+    start_pos = rng.randint(0, len(ref_seqs[contig])-1)
+    return cut_real_fragment(fragment_length, ref_seqs, contig, strand, start_pos, ref_circular,
+                             left_hairpin, right_hairpin)
 
-    info = [contig]
+
+def cut_real_fragment(fragment_length, ref_seqs, contig, strand, start_pos, ref_circular,
+                      left_hairpin, right_hairpin):
+    """
+    Returns the fragment at start_pos on the given strand of a contig (along with its info), or an
+    empty fragment if the contig is circular and too short. The start position is ignored when the
+    whole of a linear contig fits in the fragment.
+    """
+    # Positions are in the coordinates of the chosen strand. Minus-strand sequence is only reverse
+    # complemented for the fragment itself (see get_strand_slice).
+    info = [contig, strand + 'strand']
     seq = ref_seqs[contig]
-    rev_seq = rev_comp_ref_seqs[contig]
-    if random_chance(0.5):
-        info.append('+strand')
-        strand = '+'
-    else:
-        seq, rev_seq = rev_seq, seq
-        info.append('-strand')
-        strand = '-'
+    seq_len = len(seq)
 
     hairpin_at_end = right_hairpin[contig] if strand == '+' else left_hairpin[contig]
 
     # If the reference contig is linear and the fragment length is long enough, then we just
     # return the entire fragment, start to end.
-    if fragment_length >= len(seq) and not ref_circular[contig] and not hairpin_at_end:
-        info.append('0-' + str(len(seq)))
-        return seq, info
+    if fragment_length >= seq_len and not ref_circular[contig] and not hairpin_at_end:
+        info.append('0-' + str(seq_len))
+        return get_strand_slice(seq, strand, 0, seq_len), info
 
     # If the reference contig is circular and the fragment length is too long, then we fail to get
     # the read.
-    if fragment_length > len(seq) and ref_circular[contig]:
+    if fragment_length > seq_len and ref_circular[contig]:
         return '', ''
 
-    start_pos = random.randint(0, len(seq)-1)
     end_pos = start_pos + fragment_length
 
     # For circular contigs, we may have to loop the read around the contig.
     if ref_circular[contig]:
         info.append(f'{start_pos}-{end_pos}')
-        if end_pos <= len(seq):
-            return seq[start_pos:end_pos], info
+        if end_pos <= seq_len:
+            return get_strand_slice(seq, strand, start_pos, end_pos), info
         else:
-            looped_end_pos = end_pos - len(seq)
+            looped_end_pos = end_pos - seq_len
             assert looped_end_pos > 0
-            return seq[start_pos:] + seq[:looped_end_pos], info
+            return get_strand_slice(seq, strand, start_pos, seq_len) + \
+                get_strand_slice(seq, strand, 0, looped_end_pos), info
 
     # The ending position might be past the end of the sequence. If the sequence is linear, we fix
     # this now.
 
-    if end_pos > len(seq):
+    if end_pos > seq_len:
         # If the read would extend past the end of a linear contig with a hairpin at the end, we
         # allow it to extend through the hairpin into the other strand (reverse complement), but
         # only as far as the mirrored starting position.
         if hairpin_at_end:
-            fwd_seq = seq[start_pos:]
+            fwd_seq = get_strand_slice(seq, strand, start_pos, seq_len)
             left_over_bases = min(fragment_length - len(fwd_seq), len(fwd_seq))
-            hairpin_seq = rev_seq[:left_over_bases]
-            info.append(f'{start_pos}-{len(seq)} (hairpin) 0-{left_over_bases}')
+            other_strand = '-' if strand == '+' else '+'
+            hairpin_seq = get_strand_slice(seq, other_strand, 0, left_over_bases)
+            info.append(f'{start_pos}-{seq_len} (hairpin) 0-{left_over_bases}')
             return fwd_seq + hairpin_seq, info
 
         # If there is no hairpin, terminate at contig end.
-        end_pos = len(seq)
+        end_pos = seq_len
 
     info.append(f'{start_pos}-{end_pos}')
-    return seq[start_pos:end_pos], info
+    return get_strand_slice(seq, strand, start_pos, end_pos), info
+
 
+def get_strand_slice(seq, strand, start, end):
+    """
+    Returns seq[start:end] on the given strand of a forward-strand sequence. For the minus strand,
+    the positions are in reverse complement coordinates, so the matching forward-strand slice is
+    taken and only that is reverse complemented.
+    """
+    if strand == '+':
+        return seq[start:end]
+    return reverse_complement(seq[len(seq)-end:len(seq)-start])
 
-def get_junk_fragment(fragment_length):
-    repeat_length = random.randint(1, 5)
+
+def get_junk_fragment(fragment_length, rng):
+    repeat_length = rng.randint(1, 5)
     repeat_count = int(round(fragment_length / repeat_length)) + 1
-    junk_frag = get_random_sequence(repeat_length) * repeat_count
+    junk_frag = get_random_sequence(repeat_length, rng) * repeat_count
     return junk_frag[:fragment_length]
 
 
-def sequence_fragment(fragment, target_identity, error_model, qscore_model):
+def sequence_fragment(fragment, target_identity, error_model, qscore_model, rng,
+                      edlib_alignment=False, stats=None):
 
     # Buffer the fragment a bit so errors can be added to the first and last bases.
     k_size = error_model.kmer_size
-    fragment = get_random_sequence(k_size) + fragment + get_random_sequence(k_size)
+    fragment = get_random_sequence(k_size, rng) + fragment + get_random_sequence(k_size, rng)
     frag_len = len(fragment)
 
     # A list to hold the bases for the errors-added fragment. Note that these values can be ''
@@ -269,6 +594,10 @@ def sequence_fragment(fragment, target_identity, error_model, qscore_model):
     max_kmer_index = len(new_fragment_bases) - 1 - k_size
     estimated_errors_needed = frag_len * (1.0 - target_identity)
 
+    # For the run report (see run_stats.py).
+    loop_start_time = time.perf_counter()
+    draw_count, no_change_count, alignment_count, alignment_time = 0, 0, 0, 0.0
+
     while True:
         # If we need less than 1 error (rounded), we can stop immediately.
         if estimated_errors_needed < 0.5:
@@ -291,13 +620,15 @@ def sequence_fragment(fragment, target_identity, error_model, qscore_model):
         if estimated_identity <= target_identity:
             break
 
-        i = random.randint(0, max_kmer_index)
+        i = rng.randint(0, max_kmer_index)
         kmer = fragment[i:i+k_size]
-        new_kmer = error_model.add_errors_to_kmer(kmer)
+        new_kmer = error_model.add_errors_to_kmer(kmer, rng)
+        draw_count += 1
 
         # If the error model didn't make any changes (quite common with a non-random error model),
         # we just try again at a different position.
         if kmer == ''.join(new_kmer):
+            no_change_count += 1
             continue
 
         for j in range(k_size):
@@ -323,6 +654,8 @@ def sequence_fragment(fragment, target_identity, error_model, qscore_model):
                 # Every now and then we actually align a piece of the new sequence to its original
                 # to improve our estimate of the read's identity.
                 if change_count % settings.ALIGNMENT_INTERVAL == 0:
+                    alignment_start_time = time.perf_counter()
+                    alignment_count += 1
 
                     # If the sequence is short enough, we align the whole thing and get an exact
                     # identity.
@@ -335,7 +668,7 @@ def sequence_fragment(fragment, target_identity, error_model, qscore_model):
                     # If the sequence is longer, we align a random part of the sequence and use
                     # the result to update the error estimate.
                     else:
-                        pos = random.randint(0, frag_len - settings.ALIGNMENT_SIZE)
+                        pos = rng.randint(0, frag_len - settings.ALIGNMENT_SIZE)
                         pos2 = pos+settings.ALIGNMENT_SIZE
                         cigar = edlib.align(fragment[pos:pos2],
                                             ''.join(new_fragment_bases[pos:pos2]),
@@ -344,12 +677,27 @@ def sequence_fragment(fragment, target_identity, error_model, qscore_model):
                         estimated_errors = (1.0 - actual_identity) * frag_len
                         weight = settings.ALIGNMENT_SIZE / frag_len
                         errors = (estimated_errors * weight) + (errors * (1-weight))
+                    alignment_time += time.perf_counter() - alignment_start_time
+
+    if stats is not None:
+        stats.add_time('sequence_fragment/error_loop', time.perf_counter() - loop_start_time)
+        stats.add_time('sequence_fragment/error_loop/edlib', alignment_time)
+        stats.add_count('kmer_draws', draw_count)
+        stats.add_count('no_change_kmer_draws', no_change_count)
+        stats.add_count('error_loop_edlib_alignments', alignment_count)
+        stats.add_count('base_changes', change_count)
 
     start_trim = len(''.join(new_fragment_bases[:k_size]))
     end_trim = len(''.join(new_fragment_bases[-k_size:]))
 
     seq = ''.join(new_fragment_bases)
-    qual, actual_identity, identity_by_qscores = get_qscores(seq, fragment, qscore_model)
+    if edlib_alignment:
+        full_cigar = None
+    else:
+        full_cigar = cigar_from_edits(fragment, ((i, b) for i, b in enumerate(new_fragment_bases)
+                                                 if b != fragment[i]))
+    qual, actual_identity, identity_by_qscores = \
+        get_qscores(seq, fragment, qscore_model, rng, full_cigar, stats)
     assert(len(seq) == len(qual))
 
     seq = seq[start_trim:-end_trim]
@@ -358,33 +706,33 @@ def sequence_fragment(fragment, target_identity, error_model, qscore_model):
     return seq, qual, actual_identity, identity_by_qscores
 
 
-def get_start_adapter(rate, amount, adapter):
+def get_start_adapter(rate, amount, adapter, rng):
     if not adapter or rate == 0.0 or amount == 0.0:
         return ''
-    if random_chance(rate):
+    if random_chance(rate, rng):
         if amount == 1.0:
             return adapter
-        adapter_frag_length = get_adapter_frag_length(amount, adapter)
+        adapter_frag_length = get_adapter_frag_length(amount, adapter, rng)
         start_pos = len(adapter) - adapter_frag_length
         return adapter[start_pos:]
     return ''
 
 
-def get_end_adapter(rate, amount, adapter):
+def get_end_adapter(rate, amount, adapter, rng):
     if not adapter or rate == 0.0 or amount == 0.0:
         return ''
-    if random_chance(rate):
+    if random_chance(rate, rng):
         if amount == 1.0:
             return adapter
-        adapter_frag_length = get_adapter_frag_length(amount, adapter)
+        adapter_frag_length = get_adapter_frag_length(amount, adapter, rng)
         return adapter[:adapter_frag_length]
     return ''
 
 
-def get_adapter_frag_length(amount, adapter):
+def get_adapter_frag_length(amount, adapter, rng):
     beta_a = 2.0 * amount
     beta_b = 2.0 - beta_a
-    return round(int(len(adapter) * np.random.beta(beta_a, beta_b)))
+    return round(int(len(adapter) * rng.generator.beta(beta_a, beta_b)))
 
 
 def print_glitch_summary(glitch_rate, glitch_size, glitch_skip, output):
@@ -419,15 +767,15 @@ def adapter_parameters(param_str):
     sys.exit('Error: adapter parameters must be two comma-separated values between 0 and 1')
 
 
-def build_random_adapters(args):
+def build_random_adapters(args, rng):
     random_start, random_end = False, False
     if str_is_int(args.start_adapter_seq):
         start_len = int(args.start_adapter_seq)
-        args.start_adapter_seq = get_random_sequence(start_len)
+        args.start_adapter_seq = get_random_sequence(start_len, rng)
         random_start = True
     if str_is_int(args.end_adapter_seq):
         end_len = int(args.end_adapter_seq)
-        args.end_adapter_seq = get_random_sequence(end_len)
+        args.end_adapter_seq = get_random_sequence(end_len, rng)
         random_end = True
     return random_start, random_end
 
@@ -456,45 +804,62 @@ def print_adapter_summary(start_rate, start_amount, start_seq, end_rate, end_amo
         print('End adapter: none', file=output)
 
 
-def add_glitches(fragment, glitch_rate, glitch_size, glitch_skip):
-    if glitch_rate == 0:
+def add_glitches(fragment, glitch_rate, glitch_size, glitch_skip, rng):
+    """
+    Replaces stretches of the fragment with random sequence. The gaps between glitches, glitch
+    sizes and skips are drawn as arrays, enough for the whole fragment (probably) at once, and the
+    kept pieces are then found with cumulative sums.
+    """
+    if glitch_rate == 0 or (glitch_size == 0 and glitch_skip == 0) or not fragment:
         return fragment
-    i = 0
-    new_fragment = []
-    while True:
-        p = 1 / glitch_rate if glitch_rate > 1 else 1
-        dist_to_glitch = np.random.geometric(p=p)
-        new_fragment.append(fragment[i:i + dist_to_glitch])
-        i += dist_to_glitch
-        if i >= len(fragment):
-            break
-
-        # Add a glitch!
-        if glitch_size > 0:
-            p = 1 / glitch_size if glitch_size > 1 else 1
-            new_fragment.append(get_random_sequence(np.random.geometric(p=p)))
-        if glitch_skip > 0:
-            p = 1 / glitch_skip if glitch_skip > 1 else 1
-            i += np.random.geometric(p=p)
-        if i >= len(fragment):
-            break
+    gap_p = 1 / glitch_rate if glitch_rate > 1 else 1
+    size_p = 1 / glitch_size if glitch_size > 1 else 1
+    skip_p = 1 / glitch_skip if glitch_skip > 1 else 1
+    mean_step = 1 / gap_p + (1 / skip_p if glitch_skip > 0 else 0)
 
+    # Piece j of the fragment runs from starts[j] to ends[j] and is followed by glitch j (unless the
+    # piece reaches the end of the fragment), after which the glitch's skip is jumped over.
+    frag_len = len(fragment)
+    starts, ends, sizes = [], [], []
+    pos = 0
+    while pos < frag_len:
+        count = int(1.1 * (frag_len - pos) / mean_step) + 8
+        gaps = rng.generator.geometric(p=gap_p, size=count)
+        skips = rng.generator.geometric(p=skip_p, size=count) if glitch_skip > 0 \
+            else np.zeros(count, dtype=np.int64)
+        piece_starts = pos + np.concatenate(([0], np.cumsum(gaps + skips)[:-1]))
+        piece_ends = piece_starts + gaps
+        next_starts = piece_ends + skips
+        last = np.flatnonzero((piece_ends >= frag_len) | (next_starts >= frag_len))
+        last = last[0] if len(last) > 0 else count - 1
+        glitch_count = last if piece_ends[last] >= frag_len else last + 1
+        starts.append(piece_starts[:last + 1])
+        ends.append(piece_ends[:last + 1])
+        sizes.append(rng.generator.geometric(p=size_p, size=glitch_count) if glitch_size > 0
+                     else np.zeros(glitch_count, dtype=np.int64))
+        pos = int(next_starts[last])
+    starts, ends, sizes = (np.concatenate(x).tolist() for x in (starts, ends, sizes))
+
+    glitch_seq = get_random_sequence(sum(sizes), rng)
+    glitch_ends = itertools.accumulate(sizes)
+    new_fragment = [None] * (len(starts) + len(sizes))
+    new_fragment[0::2] = [fragment[start:end] for start, end in zip(starts, ends)]
+    new_fragment[1::2] = [glitch_seq[end - size:end] for size, end in zip(sizes, glitch_ends)]
     return ''.join(new_fragment)
 
 
-def print_progress(count, bp, target, output):
-    plural = ' ' if count == 1 else 's'
-    percent = int(1000.0 * bp / target) / 10
-    if percent > 100.0:
-        percent = 100.0
-    print(f'\rSimulating: {count:,} read{plural}  {bp:,} bp  {percent:.1f}%',
-          file=output, flush=True, end='')
-
-
-def load_reference(reference, output):
+def load_reference(reference, output, use_cache=False):
     print('', file=output)
     print(f'Loading reference from {reference}', file=output)
-    ref_seqs, ref_depths, ref_circular, left_hairpin, right_hairpin = load_fasta(reference)
+    fasta_index = find_fasta_index(reference)
+    if use_cache:
+        ref_seqs, ref_depths, ref_circular, left_hairpin, right_hairpin = \
+            load_reference_cache(reference, output)
+    elif fasta_index is not None:
+        ref_seqs, ref_depths, ref_circular, left_hairpin, right_hairpin = \
+            load_indexed_fasta(reference, *fasta_index, output)
+    else:
+        ref_seqs, ref_depths, ref_circular, left_hairpin, right_hairpin = load_fasta(reference)
     plural = '' if len(ref_seqs) == 1 else 's'
     print(f'  {len(ref_seqs):,} contig{plural}:', file=output)
     for contig in ref_seqs:
@@ -513,24 +878,34 @@ def print_intro(output):
     print(f'long read simulation', file=output)
 
 
-def adjust_depths(ref_seqs, ref_depths, ref_circular, frag_lengths, args):
-    sampled_lengths = [frag_lengths.get_fragment_length() for x in range(100000)]
-    total = sum(sampled_lengths)
-    for ref_name, ref_seq in ref_seqs.items():
-        ref_len = len(ref_seq)
-        ref_circ = ref_circular[ref_name]
-
-        # Circular plasmids may have to have their depth increased due compensate for misses.
-        if not args.small_plasmid_bias and ref_circ:
-            passing_total = sum(length for length in sampled_lengths if length <= ref_len)
-            if passing_total == 0:
-                sys.exit('Error: fragment length distribution incompatible with reference lengths '
-                         '- try running with --small_plasmid_bias to avoid this error')
-            adjustment = total / passing_total
-            ref_depths[ref_name] *= adjustment
-
-        # Linear plasmids may have to have their depth increased due compensate for truncations.
-        if not ref_circ:
-            passing_total = sum(min(ref_len, length) for length in sampled_lengths)
-            adjustment = total / passing_total
-            ref_depths[ref_name] *= adjustment
+def adjust_depths(ref_seqs, ref_depths, ref_circular, frag_lengths, args, rng):
+    """
+    Scales up the depths of references which are short compared to the fragments, to make up for
+    the fragments they lose (circular) or truncate (linear). Each reference's totals come from a
+    binary search in the sorted sample lengths' cumulative sums, not a loop over the samples, so
+    even references with many thousands of contigs are quick.
+    """
+    sampled_lengths = np.sort(frag_lengths.get_fragment_lengths(rng, 100000))
+    cum_lengths = np.concatenate(([0], np.cumsum(sampled_lengths)))
+    total = int(cum_lengths[-1])
+
+    ref_names = list(ref_seqs.keys())
+    ref_lens = np.array([len(ref_seqs[n]) for n in ref_names], dtype=np.int64)
+    circular = np.array([ref_circular[n] for n in ref_names], dtype=bool)
+    fits = np.searchsorted(sampled_lengths, ref_lens, side='right')  # samples <= ref length
+    fitting_totals = cum_lengths[fits]
+
+    # Circular plasmids may have to have their depth increased due compensate for misses.
+    if not args.small_plasmid_bias and np.any(fitting_totals[circular] == 0):
+        sys.exit('Error: fragment length distribution incompatible with reference lengths '
+                 '- try running with --small_plasmid_bias to avoid this error')
+
+    # Linear plasmids may have to have their depth increased due compensate for truncations (the
+    # samples longer than the reference count as the reference length).
+    truncated_totals = fitting_totals + (len(sampled_lengths) - fits) * ref_lens
+
+    for i, ref_name in enumerate(ref_names):
+        if circular[i] and not args.small_plasmid_bias:
+            ref_depths[ref_name] *= total / int(fitting_totals[i])
+        elif not circular[i]:
+            ref_depths[ref_name] *= total / int(truncated_totals[i])
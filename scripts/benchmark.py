@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+This script times Badread's hot paths (read simulation, qscore assignment, model lookups, file
+loading and model training) over a grid of read lengths, identities and bundled models. Every
+benchmark is seeded, so two runs do the same work, and results are saved as JSON so runs from
+different commits can be compared:
+    scripts/benchmark.py run --output before.json
+    (make changes)
+    scripts/benchmark.py run --output after.json
+    scripts/benchmark.py compare before.json after.json
+
+The script benchmarks the Badread in the repository it is in, not an installed copy.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import collections
+import contextlib
+import datetime
+import gc
+import gzip
+import json
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import edlib  # noqa: E402
+import numpy as np  # noqa: E402
+
+import badread.error_model  # noqa: E402
+import badread.fast_engine  # noqa: E402
+import badread.misc  # noqa: E402
+import badread.qscore_model  # noqa: E402
+import badread.simulate  # noqa: E402
+from badread.rng import Rng  # noqa: E402
+from badread.version import __version__  # noqa: E402
+
+
+RESULTS_FORMAT = 1
+MODELS = ['random', 'nanopore2018', 'nanopore2020', 'nanopore2023', 'pacbio2016', 'pacbio2021']
+ENGINES = ['standard', 'fast']
+BENCHMARK_NAMES = ['sequence_fragment', 'get_qscores', 'add_errors_to_kmer', 'get_qscore',
+                   'load_fasta', 'load_fastq', 'make_error_model', 'make_qscore_model']
+
+# The full grid and a much smaller one (--quick) for a fast check.
+FULL = {'lengths': [1000, 10000, 100000, 1000000], 'identities': [80.0, 90.0, 95.0, 99.0, 99.9],
+        'training_identities': [85.0, 90.0, 95.0], 'models': MODELS, 'repeats': 3,
+        'lookups': 100000, 'fastq_bases': 20000000, 'training_reads': 200,
+        'training_read_length': 5000}
+QUICK = {'lengths': [1000, 10000], 'identities': [90.0, 99.0], 'training_identities': [90.0],
+         'models': ['random', 'nanopore2023'], 'repeats': 1, 'lookups': 10000,
+         'fastq_bases': 1000000, 'training_reads': 20, 'training_read_length': 2000}
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark Badread and compare results')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help='run the benchmarks and save the results')
+    run.add_argument('--output', type=pathlib.Path, default=None,
+                     help='Save results to this JSON file (default: print them to stdout)')
+    run.add_argument('--quick', action='store_true',
+                     help='Use a small grid of lengths, identities and models')
+    run.add_argument('--benchmarks', type=str, nargs='+', default=BENCHMARK_NAMES,
+                     choices=BENCHMARK_NAMES, help='Only run these benchmarks')
+    run.add_argument('--lengths', type=int, nargs='+',
+                     help='Read/reference lengths in bp (overrides the grid)')
+    run.add_argument('--identities', type=float, nargs='+',
+                     help='Read identities in percent (overrides the grid)')
+    run.add_argument('--models', type=str, nargs='+', choices=MODELS,
+                     help='Bundled models (overrides the grid)')
+    run.add_argument('--repeats', type=int,
+                     help='Times to run each benchmark (overrides the grid)')
+    run.add_argument('--seed', type=int, default=0,
+                     help='Random seed for all benchmarks')
+
+    compare = subparsers.add_parser('compare', help='compare two saved results files')
+    compare.add_argument('old', type=pathlib.Path, help='Results from the earlier commit')
+    compare.add_argument('new', type=pathlib.Path, help='Results from the later commit')
+    compare.add_argument('--threshold', type=float, default=10.0,
+                         help='Percent change in median time to flag as slower/faster')
+
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = get_arguments()
+    if args.command == 'run':
+        run_benchmarks(args)
+    else:
+        sys.exit(compare_results(args.old, args.new, args.threshold))
+
+
+def run_benchmarks(args):
+    grid = dict(QUICK if args.quick else FULL)
+    for name in ['lengths', 'identities', 'models', 'repeats']:
+        if getattr(args, name) is not None:
+            grid[name] = getattr(args, name)
+    if grid['repeats'] < 1:
+        sys.exit('Error: --repeats must be at least 1')
+    for identity in grid['identities']:
+        if not 0.0 < identity <= 100.0:
+            sys.exit('Error: identities must be between 0 and 100')
+
+    results = {'format': RESULTS_FORMAT, 'badread_version': __version__, 'git': get_git_state(),
+               'date': datetime.datetime.now().isoformat(timespec='seconds'),
+               'python': platform.python_version(), 'numpy': np.__version__,
+               'platform': platform.platform(), 'seed': args.seed, 'grid': grid, 'results': []}
+    benchmark_functions = {'sequence_fragment': bench_sequence_fragment,
+                           'get_qscores': bench_get_qscores,
+                           'add_errors_to_kmer': bench_add_errors_to_kmer,
+                           'get_qscore': bench_get_qscore,
+                           'load_fasta': bench_load_fasta,
+                           'load_fastq': bench_load_fastq,
+                           'make_error_model': bench_make_error_model,
+                           'make_qscore_model': bench_make_qscore_model}
+    models = Models()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in BENCHMARK_NAMES:
+            if name not in args.benchmarks:
+                continue
+            for params, work, run in benchmark_functions[name](grid, models, args.seed,
+                                                                pathlib.Path(temp_dir)):
+                result = time_benchmark(name, params, work, run, grid['repeats'])
+                print(format_result(result), file=sys.stderr, flush=True)
+                results['results'].append(result)
+
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'wt') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+
+def time_benchmark(name, params, work, run, repeats):
+    """
+    Runs one benchmark the given number of times. The work value is the benchmark's size in its
+    natural unit (e.g. bases or calls), so throughput can be compared between grid points.
+    """
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        start_time = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start_time)
+    median = statistics.median(times)
+    return {'benchmark': name, 'params': params, 'work': work, 'times': times,
+            'min': min(times), 'median': median,
+            'throughput': work / median if median > 0.0 else None}
+
+
+def format_result(result):
+    params = ' '.join(f'{k}={v}' for k, v in result['params'].items())
+    return f'{result["benchmark"]:<20} {params:<60} {result["median"]:10.4f} s'
+
+
+def get_git_state():
+    """
+    Returns the commit being benchmarked and whether it has uncommitted changes, or None if the
+    repository's Git state isn't available.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                cwd=REPO_DIR, check=True, capture_output=True, text=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return {'commit': commit, 'dirty': bool(status.strip())}
+
+
+class Models(object):
+    """
+    Loads each bundled model once, as loading isn't what's being timed.
+    """
+    def __init__(self):
+        self.null = open(os.devnull, 'wt')
+        self.error_models, self.qscore_models = {}, {}
+
+    def error_model(self, name):
+        if name not in self.error_models:
+            self.error_models[name] = badread.error_model.ErrorModel(name, output=self.null)
+            self.error_models[name].get_edit_tables()  # built on first use by the fast engine
+        return self.error_models[name]
+
+    def qscore_model(self, name):
+        if name not in self.qscore_models:
+            self.qscore_models[name] = badread.qscore_model.QScoreModel(name, output=self.null)
+        return self.qscore_models[name]
+
+
+def simulate_read(length, identity, error_model, qscore_model, seed):
+    """
+    Returns a random fragment and a read made from it with the given identity (in percent).
+    """
+    rng = Rng(seed)
+    fragment = badread.misc.get_random_sequence(length, rng)
+    seq, qual, _, _ = badread.simulate.sequence_fragment(fragment, identity / 100.0, error_model,
+                                                         qscore_model, rng)
+    return fragment, seq, qual
+
+
+def bench_sequence_fragment(grid, models, seed, temp_dir):
+    for model in grid['models']:
+        error_model, qscore_model = models.error_model(model), models.qscore_model(model)
+        for engine in ENGINES:
+            sequence_fragment = badread.simulate.sequence_fragment if engine == 'standard' \
+                else badread.fast_engine.sequence_fragment_fast
+            for length in grid['lengths']:
+                fragment = badread.misc.get_random_sequence(length, Rng(seed))
+                for identity in grid['identities']:
+                    def run():
+                        sequence_fragment(fragment, identity / 100.0, error_model, qscore_model,
+                                          Rng(seed))
+                    yield {'model': model, 'engine': engine, 'length': length,
+                           'identity': identity}, length, run
+
+
+def bench_get_qscores(grid, models, seed, temp_dir):
+    error_model = models.error_model('nanopore2023')
+    for model in grid['models']:
+        qscore_model = models.qscore_model(model)
+        for length in grid['lengths']:
+            for identity in grid['identities']:
+                fragment, seq, _ = simulate_read(length, identity, error_model, qscore_model, seed)
+
+                def run():
+                    badread.qscore_model.get_qscores(seq, fragment, qscore_model, Rng(seed))
+                yield {'model': model, 'length': length, 'identity': identity}, len(seq), run
+
+
+def bench_add_errors_to_kmer(grid, models, seed, temp_dir):
+    count = grid['lookups']
+    for model in grid['models']:
+        error_model = models.error_model(model)
+        k_size = error_model.kmer_size
+        seq = badread.misc.get_random_sequence(count + k_size, Rng(seed))
+        kmers = [seq[i:i+k_size] for i in range(count)]
+
+        def run():
+            rng = Rng(seed)
+            for kmer in kmers:
+                error_model.add_errors_to_kmer(kmer, rng)
+        yield {'model': model, 'calls': count}, count, run
+
+
+def bench_get_qscore(grid, models, seed, temp_dir):
+    """
+    Times qscore lookups for the cigar contexts of a simulated read, so the mix of contexts (and
+    how often they need trimming to be found in the model) is realistic for the identity.
+    """
+    count = grid['lookups']
+    error_model = models.error_model('nanopore2023')
+    for model in grid['models']:
+        qscore_model = models.qscore_model(model)
+        for identity in grid['identities']:
+            contexts = get_cigar_contexts(count, identity, qscore_model.kmer_size, error_model,
+                                          qscore_model, seed)
+
+            def run():
+                rng = Rng(seed)
+                for cigar in contexts:
+                    qscore_model.get_qscore(cigar, rng)
+            yield {'model': model, 'identity': identity, 'calls': count}, count, run
+
+
+def get_cigar_contexts(count, identity, k_size, error_model, qscore_model, seed):
+    """
+    Returns the given number of cigar contexts (k_size read bases, centred on one read base, along
+    with any deletions between them) from a simulated read.
+    """
+    fragment, seq, _ = simulate_read(count + 2 * k_size, identity, error_model, qscore_model, seed)
+    cigar = edlib.align(seq, fragment, task='path')['cigar']
+    full_cigar = ''.join(op * int(size) for size, op in
+                         zip(cigar_sizes(cigar), cigar_ops(cigar)))
+    read_positions = [i for i, op in enumerate(full_cigar) if op != 'D']
+    margin = k_size // 2
+    contexts = [full_cigar[read_positions[i-margin]:read_positions[i+margin]+1]
+                for i in range(margin, len(read_positions) - margin)]
+    return (contexts * (count // len(contexts) + 1))[:count]
+
+
+def cigar_sizes(cigar):
+    return [int(x) for x in ''.join(c if c.isdigit() else ' ' for c in cigar).split()]
+
+
+def cigar_ops(cigar):
+    return [c for c in cigar if not c.isdigit()]
+
+
+def bench_load_fasta(grid, models, seed, temp_dir):
+    for length in grid['lengths']:
+        for compressed in [False, True]:
+            filename = temp_dir / f'ref_{length}.fasta{".gz" if compressed else ""}'
+            if not filename.is_file():
+                seq = badread.misc.get_random_sequence(length, Rng(seed))
+                lines = [seq[i:i+80] for i in range(0, length, 80)]
+                text = '>ref\n' + '\n'.join(lines) + '\n'
+                with (gzip.open if compressed else open)(filename, 'wt') as f:
+                    f.write(text)
+
+            def run():
+                badread.misc.load_fasta(str(filename))
+            yield {'length': length, 'gzipped': compressed}, length, run
+
+
+def bench_load_fastq(grid, models, seed, temp_dir):
+    """
+    Loads the same number of bases (grid['fastq_bases']) for each read length. The reads are
+    random, as the contents don't affect loading.
+    """
+    null = models.null
+    for length in grid['lengths']:
+        read_count = max(grid['fastq_bases'] // length, 1)
+        filename = temp_dir / f'reads_{length}.fastq'
+        rng = Rng(seed)
+        with open(filename, 'wt') as f:
+            for i in range(read_count):
+                seq = badread.misc.get_random_sequence(length, rng)
+                qual = ''.join(chr(q) for q in rng.generator.integers(35, 75, length).tolist())
+                f.write(f'@read_{i}\n{seq}\n+\n{qual}\n')
+
+        def run():
+            badread.misc.load_fastq(str(filename), output=null)
+        yield {'length': length, 'reads': read_count}, read_count * length, run
+
+
+def bench_make_error_model(grid, models, seed, temp_dir):
+    Args = collections.namedtuple('Args', ['reference', 'reads', 'alignment', 'k_size',
+                                           'max_alignments', 'max_alt'])
+    for model, identity, files, bases in training_sets(grid, models, seed, temp_dir):
+        args = Args(reference=files[0], reads=files[1], alignment=files[2], k_size=7,
+                    max_alignments=None, max_alt=25)
+
+        def run():
+            with contextlib.redirect_stdout(models.null):
+                badread.error_model.make_error_model(args, output=models.null)
+        yield {'model': model, 'identity': identity, 'reads': grid['training_reads'],
+               'read_length': grid['training_read_length']}, bases, run
+
+
+def bench_make_qscore_model(grid, models, seed, temp_dir):
+    Args = collections.namedtuple('Args', ['reference', 'reads', 'alignment', 'k_size',
+                                           'max_alignments', 'max_del', 'min_occur',
+                                           'max_output'])
+    for model, identity, files, bases in training_sets(grid, models, seed, temp_dir):
+        args = Args(reference=files[0], reads=files[1], alignment=files[2], k_size=9,
+                    max_alignments=None, max_del=6, min_occur=100, max_output=10000)
+
+        def run():
+            with contextlib.redirect_stdout(models.null):
+                badread.qscore_model.make_qscore_model(args, output=models.null)
+        yield {'model': model, 'identity': identity, 'reads': grid['training_reads'],
+               'read_length': grid['training_read_length']}, bases, run
+
+
+def training_sets(grid, models, seed, temp_dir):
+    """
+    Yields the model, identity, (reference, reads, alignment) filenames and aligned read bases of
+    each training set, simulating them the first time they're needed. Model training normally uses
+    minimap2 alignments of real reads, so these are simulated reads aligned with edlib instead.
+    """
+    for model in grid['models']:
+        for identity in grid['training_identities']:
+            prefix = temp_dir / f'training_{model}_{identity}'
+            files = tuple(str(prefix) + suffix for suffix in ['.fasta', '.fastq', '.paf'])
+            if not pathlib.Path(files[2]).is_file():
+                write_training_set(files, models.error_model(model), models.qscore_model(model),
+                                   identity, grid['training_reads'],
+                                   grid['training_read_length'], seed)
+            yield model, identity, files, grid['training_reads'] * grid['training_read_length']
+
+
+def write_training_set(files, error_model, qscore_model, identity, read_count, read_length, seed):
+    rng = Rng(seed)
+    ref_length = read_count * read_length
+    ref = badread.misc.get_random_sequence(ref_length, rng)
+    with open(files[0], 'wt') as f:
+        f.write(f'>ref\n{ref}\n')
+    with open(files[1], 'wt') as fastq, open(files[2], 'wt') as paf:
+        for i in range(read_count):
+            start = rng.randint(0, ref_length - read_length)
+            end = start + read_length
+            strand = rng.choice('+-')
+            fragment = badread.simulate.get_strand_slice(ref, strand, start, end)
+            seq, qual, _, _ = badread.simulate.sequence_fragment(fragment, identity / 100.0,
+                                                                 error_model, qscore_model, rng)
+            fastq.write(f'@read_{i}\n{seq}\n+\n{qual}\n')
+            paf.write(paf_line(f'read_{i}', seq, fragment, strand, start, end, ref_length) + '\n')
+
+
+def paf_line(read_name, seq, fragment, strand, start, end, ref_length):
+    """
+    Returns a minimap2-style PAF line (with an M/I/D cigar in reference orientation) for a read
+    aligned to the fragment it came from. Like minimap2, the alignment is clipped to start and end
+    with a match, as make_error_model and make_qscore_model expect.
+    """
+    cigar = edlib.align(seq, fragment, task='path')['cigar']
+    parts = []
+    for size, op in zip(cigar_sizes(cigar), cigar_ops(cigar)):
+        op = 'M' if op in '=X' else op
+        if parts and parts[-1][1] == op:
+            parts[-1][0] += size
+        else:
+            parts.append([size, op])
+    read_start, read_end, frag_start, frag_end = 0, len(seq), 0, len(fragment)
+    while parts[0][1] != 'M':
+        size, op = parts.pop(0)
+        read_start += size if op == 'I' else 0
+        frag_start += size if op == 'D' else 0
+    while parts[-1][1] != 'M':
+        size, op = parts.pop()
+        read_end -= size if op == 'I' else 0
+        frag_end -= size if op == 'D' else 0
+
+    # Count the matches in the clipped alignment.
+    read_aligned, frag_aligned = seq[read_start:read_end], fragment[frag_start:frag_end]
+    matches, aligned_length, read_pos, frag_pos = 0, 0, 0, 0
+    for size, op in parts:
+        aligned_length += size
+        if op == 'M':
+            matches += sum(a == b for a, b in zip(read_aligned[read_pos:read_pos+size],
+                                                  frag_aligned[frag_pos:frag_pos+size]))
+        read_pos += size if op != 'D' else 0
+        frag_pos += size if op != 'I' else 0
+
+    # Minus-strand fragment positions are in reverse complement coordinates (see
+    # simulate.get_strand_slice), but PAF reference positions are on the forward strand.
+    if strand == '+':
+        ref_start, ref_end = start + frag_start, start + frag_end
+    else:
+        parts = parts[::-1]
+        ref_start, ref_end = ref_length - start - frag_end, ref_length - start - frag_start
+    score = 2 * matches - 4 * (aligned_length - matches)
+    cigar = ''.join(f'{size}{op}' for size, op in parts)
+    return '\t'.join([read_name, str(len(seq)), str(read_start), str(read_end), strand, 'ref',
+                      str(ref_length), str(ref_start), str(ref_end), str(matches),
+                      str(aligned_length), '60', f'AS:i:{score}', f'cg:Z:{cigar}'])
+
+
+def compare_results(old_filename, new_filename, threshold):
+    """
+    Prints the change in median time for each benchmark in both results files. Returns 1 if any
+    benchmark got slower by more than the threshold (in percent), otherwise 0.
+    """
+    old, new = load_results(old_filename), load_results(new_filename)
+    old_results = {result_key(r): r for r in old['results']}
+    print(f'old: {describe_run(old)}')
+    print(f'new: {describe_run(new)}')
+    print()
+    slower, faster, missing = 0, 0, 0
+    for r in new['results']:
+        key = result_key(r)
+        if key not in old_results:
+            missing += 1
+            continue
+        old_median, new_median = old_results[key]['median'], r['median']
+        change = 100.0 * (new_median - old_median) / old_median if old_median > 0.0 else 0.0
+        if change > threshold:
+            flag = 'slower'
+            slower += 1
+        elif change < -threshold:
+            flag = 'faster'
+            faster += 1
+        else:
+            flag = ''
+        params = ' '.join(f'{k}={v}' for k, v in r['params'].items())
+        print(f'{r["benchmark"]:<20} {params:<60} {old_median:10.4f} s {new_median:10.4f} s '
+              f'{change:+7.1f}%  {flag}')
+    print()
+    print(f'{slower} slower, {faster} faster (threshold {threshold:g}%)')
+    if missing:
+        print(f'{missing} benchmark{"" if missing == 1 else "s"} not in {old_filename}')
+    return 1 if slower else 0
+
+
+def load_results(filename):
+    try:
+        with open(filename, 'rt') as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        sys.exit(f'Error: could not load benchmark results from {filename}')
+    if results.get('format') != RESULTS_FORMAT:
+        sys.exit(f'Error: {filename} is not in a supported results format')
+    return results
+
+
+def result_key(result):
+    return result['benchmark'], json.dumps(result['params'], sort_keys=True)
+
+
+def describe_run(results):
+    git = results['git']
+    commit = 'unknown commit' if git is None else \
+        git['commit'][:7] + (' (with uncommitted changes)' if git['dirty'] else '')
+    return f'{commit}, {results["date"]}, Python {results["python"]}, NumPy {results["numpy"]}'
+
+
+if __name__ == '__main__':
+    main()
@@ -60,10 +60,14 @@ class BadreadInstall(install):
                             os.path.join(error_models_dest_dir, 'nanopore2020.gz'))
             shutil.copyfile(os.path.join(error_models_source_dir, 'nanopore2023.gz'),
                             os.path.join(error_models_dest_dir, 'nanopore2023.gz'))
+            shutil.copyfile(os.path.join(error_models_source_dir, 'nanopore2023.npz'),
+                            os.path.join(error_models_dest_dir, 'nanopore2023.npz'))
             shutil.copyfile(os.path.join(error_models_source_dir, 'pacbio2016.gz'),
                             os.path.join(error_models_dest_dir, 'pacbio2016.gz'))
             shutil.copyfile(os.path.join(error_models_source_dir, 'pacbio2021.gz'),
                             os.path.join(error_models_dest_dir, 'pacbio2021.gz'))
+            shutil.copyfile(os.path.join(error_models_source_dir, 'pacbio2021.npz'),
+                            os.path.join(error_models_dest_dir, 'pacbio2021.npz'))
 
             # Copy qscore models to installation directory.
             qscore_models_source_dir = os.path.join('badread', 'qscore_models')
@@ -76,10 +80,14 @@ class BadreadInstall(install):
                             os.path.join(qscore_models_dest_dir, 'nanopore2020.gz'))
             shutil.copyfile(os.path.join(qscore_models_source_dir, 'nanopore2023.gz'),
                             os.path.join(qscore_models_dest_dir, 'nanopore2023.gz'))
+            shutil.copyfile(os.path.join(qscore_models_source_dir, 'nanopore2023.npz'),
+                            os.path.join(qscore_models_dest_dir, 'nanopore2023.npz'))
             shutil.copyfile(os.path.join(qscore_models_source_dir, 'pacbio2016.gz'),
                             os.path.join(qscore_models_dest_dir, 'pacbio2016.gz'))
             shutil.copyfile(os.path.join(qscore_models_source_dir, 'pacbio2021.gz'),
                             os.path.join(qscore_models_dest_dir, 'pacbio2021.gz'))
+            shutil.copyfile(os.path.join(qscore_models_source_dir, 'pacbio2021.npz'),
+                            os.path.join(qscore_models_dest_dir, 'pacbio2021.npz'))
 
 
 setup(name='Badread',
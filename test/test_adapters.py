@@ -19,6 +19,7 @@ import unittest
 import badread.__main__
 import badread.fragment_lengths
 import badread.misc
+import badread.rng
 import badread.simulate
 
 
@@ -54,6 +55,7 @@ class TestParameterParsing(unittest.TestCase):
 class TestStartAdapters(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.trials = 100
         self.seq = 'TGTATAATACGACGCCGAGC'
 
@@ -61,7 +63,7 @@ class TestStartAdapters(unittest.TestCase):
         # A rate and amount of 1 means the adapter is always returned in its entirety.
         rate, amount = 1.0, 1.0
         for _ in range(self.trials):
-            adapter = badread.simulate.get_start_adapter(rate, amount, self.seq)
+            adapter = badread.simulate.get_start_adapter(rate, amount, self.seq, self.rng)
             self.assertEqual(adapter, self.seq)
 
     def test_start_adapters_2(self):
@@ -69,7 +71,7 @@ class TestStartAdapters(unittest.TestCase):
         rate, amount = 0.5, 1.0
         results = set()
         for _ in range(self.trials):
-            results.add(badread.simulate.get_start_adapter(rate, amount, self.seq))
+            results.add(badread.simulate.get_start_adapter(rate, amount, self.seq, self.rng))
         self.assertEqual(len(results), 2)
         self.assertTrue('' in results)
         self.assertTrue(self.seq in results)
@@ -79,7 +81,7 @@ class TestStartAdapters(unittest.TestCase):
         rate, amount = 1.0, 0.5
         lengths = set()
         for _ in range(self.trials):
-            adapter = badread.simulate.get_start_adapter(rate, amount, self.seq)
+            adapter = badread.simulate.get_start_adapter(rate, amount, self.seq, self.rng)
             lengths.add(len(adapter))
             self.assertTrue(self.seq.endswith(adapter))
         self.assertGreater(len(lengths), 15)
@@ -88,25 +90,26 @@ class TestStartAdapters(unittest.TestCase):
     def test_no_start_adapters_1(self):
         rate, amount = 0.0, 1.0
         for _ in range(self.trials):
-            adapter = badread.simulate.get_start_adapter(rate, amount, self.seq)
+            adapter = badread.simulate.get_start_adapter(rate, amount, self.seq, self.rng)
             self.assertEqual(adapter, '')
 
     def test_no_start_adapters_2(self):
         rate, amount = 1.0, 0.0
         for _ in range(self.trials):
-            adapter = badread.simulate.get_start_adapter(rate, amount, self.seq)
+            adapter = badread.simulate.get_start_adapter(rate, amount, self.seq, self.rng)
             self.assertEqual(adapter, '')
 
     def test_no_start_adapters_3(self):
         rate, amount = 1.0, 1.0
         for _ in range(self.trials):
-            adapter = badread.simulate.get_start_adapter(rate, amount, '')
+            adapter = badread.simulate.get_start_adapter(rate, amount, '', self.rng)
             self.assertEqual(adapter, '')
 
 
 class TestEndAdapters(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.trials = 100
         self.seq = 'ATAACAAACGCTAATTGCAA'
 
@@ -114,7 +117,7 @@ class TestEndAdapters(unittest.TestCase):
         # A rate and amount of 1 means the adapter is always returned in its entirety.
         rate, amount = 1.0, 1.0
         for _ in range(self.trials):
-            adapter = badread.simulate.get_end_adapter(rate, amount, self.seq)
+            adapter = badread.simulate.get_end_adapter(rate, amount, self.seq, self.rng)
             self.assertEqual(adapter, self.seq)
 
     def test_start_adapters_2(self):
@@ -122,7 +125,7 @@ class TestEndAdapters(unittest.TestCase):
         rate, amount = 0.5, 1.0
         results = set()
         for _ in range(self.trials):
-            results.add(badread.simulate.get_end_adapter(rate, amount, self.seq))
+            results.add(badread.simulate.get_end_adapter(rate, amount, self.seq, self.rng))
         self.assertEqual(len(results), 2)
         self.assertTrue('' in results)
         self.assertTrue(self.seq in results)
@@ -132,7 +135,7 @@ class TestEndAdapters(unittest.TestCase):
         rate, amount = 1.0, 0.5
         lengths = set()
         for _ in range(self.trials):
-            adapter = badread.simulate.get_end_adapter(rate, amount, self.seq)
+            adapter = badread.simulate.get_end_adapter(rate, amount, self.seq, self.rng)
             lengths.add(len(adapter))
             self.assertTrue(self.seq.startswith(adapter))
         self.assertGreater(len(lengths), 15)
@@ -141,25 +144,26 @@ class TestEndAdapters(unittest.TestCase):
     def test_no_end_adapters_1(self):
         rate, amount = 0.0, 1.0
         for _ in range(self.trials):
-            adapter = badread.simulate.get_end_adapter(rate, amount, self.seq)
+            adapter = badread.simulate.get_end_adapter(rate, amount, self.seq, self.rng)
             self.assertEqual(adapter, '')
 
     def test_no_end_adapters_2(self):
         rate, amount = 1.0, 0.0
         for _ in range(self.trials):
-            adapter = badread.simulate.get_end_adapter(rate, amount, self.seq)
+            adapter = badread.simulate.get_end_adapter(rate, amount, self.seq, self.rng)
             self.assertEqual(adapter, '')
 
     def test_no_end_adapters_3(self):
         rate, amount = 1.0, 1.0
         for _ in range(self.trials):
-            adapter = badread.simulate.get_end_adapter(rate, amount, '')
+            adapter = badread.simulate.get_end_adapter(rate, amount, '', self.rng)
             self.assertEqual(adapter, '')
 
 
 class TestRandomAdapters(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.args = badread.__main__.parse_args(['simulate',
                                                  '--reference', 'ref.fasta',
                                                  '--quantity', '10x'])
@@ -167,7 +171,7 @@ class TestRandomAdapters(unittest.TestCase):
     def test_no_adapters(self):
         self.args.start_adapter_seq = ''
         self.args.end_adapter_seq = ''
-        random_start, random_end = badread.simulate.build_random_adapters(self.args)
+        random_start, random_end = badread.simulate.build_random_adapters(self.args, self.rng)
         self.assertEqual(self.args.start_adapter_seq, '')
         self.assertEqual(self.args.end_adapter_seq, '')
         self.assertEqual(random_start, False)
@@ -176,7 +180,7 @@ class TestRandomAdapters(unittest.TestCase):
     def test_fixed_adapters(self):
         self.args.start_adapter_seq = 'ACGACTACGACT'
         self.args.end_adapter_seq = 'TACGCTACGACT'
-        random_start, random_end = badread.simulate.build_random_adapters(self.args)
+        random_start, random_end = badread.simulate.build_random_adapters(self.args, self.rng)
         self.assertEqual(self.args.start_adapter_seq, 'ACGACTACGACT')
         self.assertEqual(self.args.end_adapter_seq, 'TACGCTACGACT')
         self.assertEqual(random_start, False)
@@ -185,7 +189,7 @@ class TestRandomAdapters(unittest.TestCase):
     def test_random_start(self):
         self.args.start_adapter_seq = '40'
         self.args.end_adapter_seq = 'TACGCTACGACT'
-        random_start, random_end = badread.simulate.build_random_adapters(self.args)
+        random_start, random_end = badread.simulate.build_random_adapters(self.args, self.rng)
         self.assertEqual(len(self.args.start_adapter_seq), 40)
         self.assertEqual(self.args.end_adapter_seq, 'TACGCTACGACT')
         self.assertEqual(random_start, True)
@@ -194,7 +198,7 @@ class TestRandomAdapters(unittest.TestCase):
     def test_random_end(self):
         self.args.start_adapter_seq = 'A'
         self.args.end_adapter_seq = '81'
-        random_start, random_end = badread.simulate.build_random_adapters(self.args)
+        random_start, random_end = badread.simulate.build_random_adapters(self.args, self.rng)
         self.assertEqual(self.args.start_adapter_seq, 'A')
         self.assertEqual(len(self.args.end_adapter_seq), 81)
         self.assertEqual(random_start, False)
@@ -203,7 +207,7 @@ class TestRandomAdapters(unittest.TestCase):
     def test_both_random(self):
         self.args.start_adapter_seq = '76'
         self.args.end_adapter_seq = '143'
-        random_start, random_end = badread.simulate.build_random_adapters(self.args)
+        random_start, random_end = badread.simulate.build_random_adapters(self.args, self.rng)
         self.assertEqual(len(self.args.start_adapter_seq), 76)
         self.assertEqual(len(self.args.end_adapter_seq), 143)
         self.assertEqual(random_start, True)
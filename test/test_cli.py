@@ -43,6 +43,16 @@ class TestWholeCommands(unittest.TestCase):
         out, err = out.getvalue(), err.getvalue()
         self.assertTrue(out.startswith('@'))
 
+    def test_simulate_quiet(self):
+        test_args = ['badread', 'simulate', '--reference', self.ref_filename, '--quantity', '1x',
+                     '--error_model', 'random', '--qscore_model', 'random', '--quiet']
+        with unittest.mock.patch.object(sys, 'argv', test_args):
+            with badread.misc.captured_output() as (out, err):
+                badread.__main__.main(output=sys.stderr)
+        out, err = out.getvalue(), err.getvalue()
+        self.assertTrue(out.startswith('@'))
+        self.assertEqual(err, '')
+
     def test_error_model(self):
         test_args = ['badread', 'error_model', '--reference', self.ref_filename,
                      '--reads', self.reads_filename, '--alignment', self.paf_filename]
@@ -0,0 +1,85 @@
+"""
+This module contains some tests for Badread. To run them, execute `python3 -m unittest` from the
+root Badread directory.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import os
+import tempfile
+import unittest
+
+import badread.compile_model
+import badread.error_model
+import badread.qscore_model
+
+
+class TestCompileModel(unittest.TestCase):
+
+    def setUp(self):
+        self.null = open(os.devnull, 'w')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.error_model_filename = os.path.join(os.path.dirname(__file__), '4-mer_error_model')
+        self.qscore_model_filename = os.path.join(os.path.dirname(__file__),
+                                                  'simple_qscore_model')
+        self.Args = collections.namedtuple('Args', ['model', 'output'])
+
+    def tearDown(self):
+        self.null.close()
+        self.temp_dir.cleanup()
+
+    def test_model_types(self):
+        self.assertEqual(badread.compile_model.get_text_model_type(self.error_model_filename),
+                         'error')
+        self.assertEqual(badread.compile_model.get_text_model_type(self.qscore_model_filename),
+                         'qscore')
+
+    def test_compile_error_model(self):
+        compiled_filename = os.path.join(self.temp_dir.name, 'error_model.npz')
+        args = self.Args(model=self.error_model_filename, output=compiled_filename)
+        badread.compile_model.compile_model(args, output=self.null)
+        text_model = badread.error_model.ErrorModel(self.error_model_filename, output=self.null)
+        compiled_model = badread.error_model.ErrorModel(compiled_filename, output=self.null)
+        self.assertEqual(compiled_model.kmer_size, text_model.kmer_size)
+        self.assertEqual(compiled_model.alternatives, text_model.alternatives)
+        self.assertEqual(compiled_model.probabilities, text_model.probabilities)
+        self.assertEqual(compiled_model.sampling_tables, text_model.sampling_tables)
+
+    def test_compile_qscore_model(self):
+        compiled_filename = os.path.join(self.temp_dir.name, 'qscore_model.npz')
+        args = self.Args(model=self.qscore_model_filename, output=compiled_filename)
+        badread.compile_model.compile_model(args, output=self.null)
+        text_model = badread.qscore_model.QScoreModel(self.qscore_model_filename,
+                                                      output=self.null)
+        compiled_model = badread.qscore_model.QScoreModel(compiled_filename, output=self.null)
+        self.assertEqual(compiled_model.kmer_size, text_model.kmer_size)
+        self.assertEqual(compiled_model.scores, text_model.scores)
+        self.assertEqual(compiled_model.probabilities, text_model.probabilities)
+        self.assertEqual(compiled_model.alias_tables, text_model.alias_tables)
+
+    def test_wrong_model_type(self):
+        compiled_filename = os.path.join(self.temp_dir.name, 'qscore_model.npz')
+        args = self.Args(model=self.qscore_model_filename, output=compiled_filename)
+        badread.compile_model.compile_model(args, output=self.null)
+        with self.assertRaises(SystemExit) as cm:
+            badread.error_model.ErrorModel(compiled_filename, output=self.null)
+        self.assertTrue('is not a compiled error model' in str(cm.exception))
+
+    def test_already_compiled(self):
+        compiled_filename = os.path.join(self.temp_dir.name, 'error_model.npz')
+        args = self.Args(model=self.error_model_filename, output=compiled_filename)
+        badread.compile_model.compile_model(args, output=self.null)
+        args = self.Args(model=compiled_filename, output=compiled_filename + '.2')
+        with self.assertRaises(SystemExit) as cm:
+            badread.compile_model.compile_model(args, output=self.null)
+        self.assertTrue('already a compiled model' in str(cm.exception))
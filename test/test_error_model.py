@@ -21,6 +21,7 @@ import unittest
 
 import badread.error_model
 import badread.misc
+import badread.rng
 
 
 class TestKmerAlignment(unittest.TestCase):
@@ -154,6 +155,7 @@ class TestLoadErrorModel(unittest.TestCase):
     Loads a simple 4-mer error model from a file and makes sure it looks okay.
     """
     def setUp(self):
+        self.rng = badread.rng.Rng()
         null = open(os.devnull, 'w')
         model_filename = os.path.join(os.path.dirname(__file__), '4-mer_error_model')
         self.model = badread.error_model.ErrorModel(model_filename, output=null)
@@ -230,6 +232,7 @@ class Test4MerErrorModel(unittest.TestCase):
     Uses a simple 4-mer error model to make errors.
     """
     def setUp(self):
+        self.rng = badread.rng.Rng()
         null = open(os.devnull, 'w')
         model_filename = os.path.join(os.path.dirname(__file__), '4-mer_error_model')
         self.model = badread.error_model.ErrorModel(model_filename, output=null)
@@ -237,15 +240,24 @@ class Test4MerErrorModel(unittest.TestCase):
 
     def test_ACAC(self):
         # The model never gets this k-mer wrong.
-        new_kmer = self.model.add_errors_to_kmer('ACAC')
+        new_kmer = self.model.add_errors_to_kmer('ACAC', self.rng)
         for i in range(100):
             self.assertEqual(new_kmer, ['A', 'C', 'A', 'C'])
 
+    def test_model_unchanged_by_use(self):
+        # Adding errors shouldn't change the loaded model (e.g. by appending random change options).
+        alts = [list(x) for x in self.model.alternatives['ACCA']]
+        probs = list(self.model.probabilities['ACCA'])
+        for i in range(1000):
+            self.model.add_errors_to_kmer('ACCA', self.rng)
+        self.assertEqual(self.model.alternatives['ACCA'], alts)
+        self.assertEqual(self.model.probabilities['ACCA'], probs)
+
     def test_ACAG(self):
         # The gets this k-mer wrong half of the time, always to ACGG.
         correct_count, alt_count = 0, 0
         for i in range(10000):
-            new_kmer = self.model.add_errors_to_kmer('ACAG')
+            new_kmer = self.model.add_errors_to_kmer('ACAG', self.rng)
             self.assertTrue(new_kmer == ['A', 'C', 'A', 'G'] or
                             new_kmer == ['A', 'C', 'G', 'G'])
             if new_kmer == ['A', 'C', 'A', 'G']:
@@ -260,7 +272,7 @@ class Test4MerErrorModel(unittest.TestCase):
         # other half are to ATAT.
         correct_count, alt_1_count, alt_2_count = 0, 0, 0
         for i in range(10000):
-            new_kmer = self.model.add_errors_to_kmer('ACAT')
+            new_kmer = self.model.add_errors_to_kmer('ACAT', self.rng)
             self.assertTrue(new_kmer == ['A', 'C', 'A', 'T'] or
                             new_kmer == ['A', 'C', 'G', 'T'] or
                             new_kmer == ['A', 'T', 'A', 'T'])
@@ -280,7 +292,7 @@ class Test4MerErrorModel(unittest.TestCase):
         correct_count, alt_count = 0, 0
         new_kmers = set()
         for i in range(10000):
-            new_kmer = self.model.add_errors_to_kmer('ACCA')
+            new_kmer = self.model.add_errors_to_kmer('ACCA', self.rng)
             if new_kmer == ['A', 'C', 'C', 'A']:
                 correct_count += 1
             elif new_kmer == ['A', 'G', 'G', 'A']:
@@ -295,7 +307,7 @@ class Test4MerErrorModel(unittest.TestCase):
 
     def test_ACCC(self):
         # The model always gets this k-mer wrong (as ACC).
-        new_kmer = self.model.add_errors_to_kmer('ACCC')
+        new_kmer = self.model.add_errors_to_kmer('ACCC', self.rng)
         for i in range(100):
             self.assertEqual(''.join(new_kmer), 'ACC')
 
@@ -304,7 +316,7 @@ class Test4MerErrorModel(unittest.TestCase):
         alt_count = 0
         new_kmers = set()
         for i in range(10000):
-            new_kmer = self.model.add_errors_to_kmer('ACCG')
+            new_kmer = self.model.add_errors_to_kmer('ACCG', self.rng)
             self.assertNotEqual(new_kmer, ['A', 'C', 'C', 'G'])
             if ''.join(new_kmer) == 'ACG':
                 alt_count += 1
@@ -320,7 +332,7 @@ class Test4MerErrorModel(unittest.TestCase):
         correct_count = 0
         new_kmers = set()
         for i in range(10000):
-            new_kmer = self.model.add_errors_to_kmer('ACCT')
+            new_kmer = self.model.add_errors_to_kmer('ACCT', self.rng)
             if new_kmer == ['A', 'C', 'C', 'T']:
                 correct_count += 1
             new_kmers.add('_'.join(new_kmer))
@@ -334,7 +346,7 @@ class Test4MerErrorModel(unittest.TestCase):
         correct_count = 0
         new_kmers = set()
         for i in range(10000):
-            new_kmer = self.model.add_errors_to_kmer('ACGA')
+            new_kmer = self.model.add_errors_to_kmer('ACGA', self.rng)
             if new_kmer == ['A', 'C', 'G', 'A']:
                 correct_count += 1
             new_kmers.add('_'.join(new_kmer))
@@ -349,6 +361,7 @@ class TestRandomErrorModel(unittest.TestCase):
     Tests a random error model (i.e. an error model not based on k-mers and loaded from a file).
     """
     def setUp(self):
+        self.rng = badread.rng.Rng()
         null = open(os.devnull, 'w')
         self.model = badread.error_model.ErrorModel('random', output=null)
         null.close()
@@ -364,7 +377,7 @@ class TestRandomErrorModel(unittest.TestCase):
         """
         new_kmers = set()
         for i in range(10000):  # try many times to make sure we get them all
-            new_kmer = self.model.add_errors_to_kmer('A')
+            new_kmer = self.model.add_errors_to_kmer('A', self.rng)
             new_kmers.add('_'.join(new_kmer))
         self.assertEqual(len(new_kmers), 11)
 
@@ -374,7 +387,7 @@ class TestRandomErrorModel(unittest.TestCase):
         """
         new_kmers = set()
         for i in range(10000):  # try many times to make sure we get them all
-            new_kmer = self.model.add_errors_to_kmer('AC')
+            new_kmer = self.model.add_errors_to_kmer('AC', self.rng)
             new_kmers.add('_'.join(new_kmer))
         self.assertEqual(len(new_kmers), 22)
 
@@ -384,7 +397,7 @@ class TestRandomErrorModel(unittest.TestCase):
         """
         new_kmers = set()
         for i in range(10000):  # try many times to make sure we get them all
-            new_kmer = self.model.add_errors_to_kmer('ACG')
+            new_kmer = self.model.add_errors_to_kmer('ACG', self.rng)
             new_kmers.add('_'.join(new_kmer))
         self.assertEqual(len(new_kmers), 33)
 
@@ -394,7 +407,7 @@ class TestRandomErrorModel(unittest.TestCase):
         """
         new_kmers = set()
         for i in range(10000):  # try many times to make sure we get them all
-            new_kmer = self.model.add_errors_to_kmer('ACGT')
+            new_kmer = self.model.add_errors_to_kmer('ACGT', self.rng)
             new_kmers.add('_'.join(new_kmer))
         self.assertEqual(len(new_kmers), 44)
 
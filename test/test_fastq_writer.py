@@ -0,0 +1,163 @@
+"""
+This module contains some tests for Badread. To run them, execute `python3 -m unittest` from the
+root Badread directory.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import gzip
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+
+import badread.fastq_writer
+import badread.indexed_fasta
+import badread.misc
+import badread.rng
+
+
+class TestFastqWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.reads = [(f'read_{i}', 'ACGT' * (i + 1), '+' * 4 * (i + 1), f'info={i}')
+                      for i in range(100)]
+        self.expected = ''.join(f'@{n} {i}\n{s}\n+\n{q}\n' for n, s, q, i in self.reads)
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filename = os.path.join(temp_dir, 'reads.fastq')
+            for buffer_size in [0, 100, 1000000]:
+                with badread.fastq_writer.FastqWriter(filename, buffer_size) as writer:
+                    for read in self.reads:
+                        writer.write(*read)
+                with open(filename, 'rt') as f:
+                    self.assertEqual(f.read(), self.expected)
+
+    def test_buffering(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filename = os.path.join(temp_dir, 'reads.fastq')
+            with badread.fastq_writer.FastqWriter(filename, 1000000) as writer:
+                writer.write(*self.reads[0])
+                self.assertEqual(os.path.getsize(filename), 0)
+            self.assertGreater(os.path.getsize(filename), 0)
+            with badread.fastq_writer.FastqWriter(filename, 0) as writer:
+                writer.write(*self.reads[0])
+                self.assertGreater(os.path.getsize(filename), 0)
+
+    def test_stdout(self):
+        with badread.misc.captured_output() as (out, err):
+            with badread.fastq_writer.FastqWriter(buffer_size=100) as writer:
+                for read in self.reads:
+                    writer.write(*read)
+        self.assertEqual(out.getvalue(), self.expected)
+
+    def test_bad_filename(self):
+        with self.assertRaises(SystemExit):
+            badread.fastq_writer.FastqWriter('/not/a/directory/reads.fastq')
+
+
+class TestBgzfWriter(unittest.TestCase):
+
+    def setUp(self):
+        rng = badread.rng.Rng(0)
+        self.reads = [(f'read_{i}', badread.misc.get_random_sequence(1000, rng), 'A' * 1000,
+                       f'info={i}') for i in range(500)]
+        self.expected = ''.join(f'@{n} {i}\n{s}\n+\n{q}\n' for n, s, q, i in self.reads)
+
+    def write_reads(self, filename, threads, buffer_size=100000):
+        with badread.fastq_writer.FastqWriter(filename, buffer_size, threads) as writer:
+            for read in self.reads:
+                writer.write(*read)
+        with open(filename, 'rb') as f:
+            return f.read()
+
+    def test_gzip_readable(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filename = os.path.join(temp_dir, 'reads.fastq.gz')
+            self.write_reads(filename, 1)
+            with gzip.open(filename, 'rt') as f:
+                self.assertEqual(f.read(), self.expected)
+
+    def test_blocks(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data = self.write_reads(os.path.join(temp_dir, 'reads.fastq.gz'), 1)
+        self.assertTrue(data.endswith(badread.fastq_writer.BGZF_EOF))
+        pos, blocks = 0, []
+        while pos < len(data):
+            self.assertTrue(badread.indexed_fasta.is_bgzf(data[pos:pos + 18]))
+            block_size = struct.unpack('<H', data[pos + 16:pos + 18])[0] + 1
+            blocks.append(zlib.decompress(data[pos:pos + block_size], wbits=31))
+            pos += block_size
+        self.assertEqual(pos, len(data))
+        self.assertTrue(all(len(b) == badread.fastq_writer.BGZF_BLOCK_SIZE for b in blocks[:-2]))
+        self.assertEqual(blocks[-1], b'')
+        self.assertEqual(b''.join(blocks).decode(), self.expected)
+
+    def test_threads(self):
+        # Blocks are written in order, so the file is the same for any number of threads.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data_1 = self.write_reads(os.path.join(temp_dir, 'reads_1.fastq.gz'), 1)
+            data_2 = self.write_reads(os.path.join(temp_dir, 'reads_2.fastq.gz'), 4, 0)
+        self.assertEqual(data_1, data_2)
+
+    def test_empty(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filename = os.path.join(temp_dir, 'reads.fastq.gz')
+            with badread.fastq_writer.FastqWriter(filename):
+                pass
+            with open(filename, 'rb') as f:
+                self.assertEqual(f.read(), badread.fastq_writer.BGZF_EOF)
+
+
+class TestShardedFastqWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.reads = [(f'read_{i}', 'ACGT' * (i + 1), '+' * 4 * (i + 1), f'info={i}')
+                      for i in range(25)]
+
+    def test_shards(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            out_dir = os.path.join(temp_dir, 'reads')
+            with badread.fastq_writer.ShardedFastqWriter(out_dir, 10) as writer:
+                for i, read in enumerate(self.reads):
+                    writer.write(*read)
+                    if i == 14:
+                        # Unfinished shards have a hidden name.
+                        writer.flush()
+                        self.assertIn('.reads_00001.fastq', os.listdir(out_dir))
+                        self.assertNotIn('reads_00001.fastq', os.listdir(out_dir))
+            self.assertEqual(sorted(os.listdir(out_dir)),
+                             ['reads_00000.fastq', 'reads_00001.fastq', 'reads_00002.fastq'])
+            self.assertEqual(badread.fastq_writer.find_shard_files(out_dir),
+                             sorted(os.listdir(out_dir)))
+            for shard, read_count in enumerate([10, 10, 5]):
+                with open(os.path.join(out_dir, f'reads_{shard:05d}.fastq'), 'rt') as f:
+                    self.assertEqual(len(f.read().splitlines()), read_count * 4)
+
+    def test_compressed_shards(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with badread.fastq_writer.ShardedFastqWriter(temp_dir, 20, compress=True,
+                                                         threads=2) as writer:
+                for read in self.reads:
+                    writer.write(*read)
+            self.assertEqual(sorted(os.listdir(temp_dir)),
+                             ['reads_00000.fastq.gz', 'reads_00001.fastq.gz'])
+            with gzip.open(os.path.join(temp_dir, 'reads_00001.fastq.gz'), 'rt') as f:
+                self.assertTrue(f.read().startswith('@read_20 info=20\n'))
+
+    def test_no_reads(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with badread.fastq_writer.ShardedFastqWriter(temp_dir, 20):
+                pass
+            self.assertEqual(os.listdir(temp_dir), [])
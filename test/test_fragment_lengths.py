@@ -18,12 +18,14 @@ import os
 import statistics
 import unittest
 import badread.fragment_lengths
+import badread.rng
 
 
 class TestConstantFragmentLength(unittest.TestCase):
 
     def setUp(self):
         self.null = open(os.devnull, 'w')
+        self.rng = badread.rng.Rng()
 
     def tearDown(self):
         self.null.close()
@@ -31,23 +33,24 @@ class TestConstantFragmentLength(unittest.TestCase):
     def test_constant_length_1(self):
         lengths = badread.fragment_lengths.FragmentLengths(1000, 0, output=self.null)
         for _ in range(100):
-            self.assertEqual(lengths.get_fragment_length(), 1000)
+            self.assertEqual(lengths.get_fragment_length(self.rng), 1000)
 
     def test_constant_length_2(self):
         lengths = badread.fragment_lengths.FragmentLengths(5000, 0, output=self.null)
         for _ in range(100):
-            self.assertEqual(lengths.get_fragment_length(), 5000)
+            self.assertEqual(lengths.get_fragment_length(self.rng), 5000)
 
     def test_constant_length_3(self):
         lengths = badread.fragment_lengths.FragmentLengths(8000, 0, output=self.null)
         for _ in range(100):
-            self.assertEqual(lengths.get_fragment_length(), 8000)
+            self.assertEqual(lengths.get_fragment_length(self.rng), 8000)
 
 
 class TestGammaFragmentLength(unittest.TestCase):
 
     def setUp(self):
         self.null = open(os.devnull, 'w')
+        self.rng = badread.rng.Rng()
         self.trials = 100000
 
     def tearDown(self):
@@ -55,18 +58,39 @@ class TestGammaFragmentLength(unittest.TestCase):
 
     def test_gamma_length_1(self):
         lengths = badread.fragment_lengths.FragmentLengths(5000, 1000, output=self.null)
-        all_lengths = [lengths.get_fragment_length() for _ in range(self.trials)]
+        all_lengths = [lengths.get_fragment_length(self.rng) for _ in range(self.trials)]
         self.assertAlmostEqual(statistics.mean(all_lengths), 5000, delta=100)
         self.assertAlmostEqual(statistics.stdev(all_lengths), 1000, delta=100)
 
     def test_gamma_length_2(self):
         lengths = badread.fragment_lengths.FragmentLengths(5000, 3000, output=self.null)
-        all_lengths = [lengths.get_fragment_length() for _ in range(self.trials)]
+        all_lengths = [lengths.get_fragment_length(self.rng) for _ in range(self.trials)]
         self.assertAlmostEqual(statistics.mean(all_lengths), 5000, delta=100)
         self.assertAlmostEqual(statistics.stdev(all_lengths), 3000, delta=100)
 
     def test_gamma_length_3(self):
         lengths = badread.fragment_lengths.FragmentLengths(20000, 30000, output=self.null)
-        all_lengths = [lengths.get_fragment_length() for _ in range(self.trials)]
+        all_lengths = [lengths.get_fragment_length(self.rng) for _ in range(self.trials)]
         self.assertAlmostEqual(statistics.mean(all_lengths), 20000, delta=1000)
         self.assertAlmostEqual(statistics.stdev(all_lengths), 30000, delta=1000)
+
+
+class TestFragmentLengthArrays(unittest.TestCase):
+
+    def setUp(self):
+        self.null = open(os.devnull, 'w')
+        self.rng = badread.rng.Rng(0)
+
+    def tearDown(self):
+        self.null.close()
+
+    def test_constant_lengths(self):
+        lengths = badread.fragment_lengths.FragmentLengths(1000, 0, output=self.null)
+        self.assertEqual(lengths.get_fragment_lengths(self.rng, 100).tolist(), [1000] * 100)
+
+    def test_gamma_lengths(self):
+        lengths = badread.fragment_lengths.FragmentLengths(5000, 3000, output=self.null)
+        all_lengths = lengths.get_fragment_lengths(self.rng, 100000)
+        self.assertAlmostEqual(all_lengths.mean(), 5000, delta=100)
+        self.assertAlmostEqual(all_lengths.std(), 3000, delta=100)
+        self.assertGreaterEqual(all_lengths.min(), 1)
@@ -23,19 +23,21 @@ import zlib
 import badread.simulate
 import badread.fragment_lengths
 import badread.misc
+import badread.rng
 
 
 class TestLinearFragments(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.null = open(os.devnull, 'w')
         self.lengths = badread.fragment_lengths.FragmentLengths(1000, 0, self.null)
-        self.ref_seqs = {'r': badread.misc.get_random_sequence(10000)}
+        self.ref_seqs = {'r': badread.misc.get_random_sequence(10000, self.rng)}
         self.ref_depths = {'r': 1.0}
         self.ref_circular = {'r': False}
         self.rev_comp_ref_seqs = {name: badread.misc.reverse_complement(seq)
                                   for name, seq in self.ref_seqs.items()}
-        self.ref_contigs, self.ref_contig_weights = \
+        self.ref_contigs, self.ref_contig_cum_weights = \
             badread.simulate.get_ref_contig_weights(self.ref_seqs, self.ref_depths)
         self.trials = 100
         self.hairpin_left = {'r': False}
@@ -59,11 +61,11 @@ class TestLinearFragments(unittest.TestCase):
         forward_ref, reverse_ref = self.ref_seqs['r'], self.rev_comp_ref_seqs['r']
         for _ in range(self.trials):
             fragment, info = \
-                badread.simulate.build_fragment(self.lengths, self.ref_seqs, self.rev_comp_ref_seqs,
-                                                self.ref_contigs, self.ref_contig_weights,
+                badread.simulate.build_fragment(self.lengths, self.ref_seqs,
+                                                self.ref_contigs, self.ref_contig_cum_weights,
                                                 self.ref_circular, self.hairpin_left, self.hairpin_right,
                                                 args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                                                end_adapt_amount)
+                                                end_adapt_amount, self.rng)
             if fragment in forward_ref:
                 forward_count += 1
             if fragment in reverse_ref:
@@ -104,11 +106,11 @@ class TestLinearFragments(unittest.TestCase):
         lengths = []
         for _ in range(self.trials):
             fragment, info = \
-                badread.simulate.build_fragment(self.lengths, self.ref_seqs, self.rev_comp_ref_seqs,
-                                                self.ref_contigs, self.ref_contig_weights,
+                badread.simulate.build_fragment(self.lengths, self.ref_seqs,
+                                                self.ref_contigs, self.ref_contig_cum_weights,
                                                 self.ref_circular, self.hairpin_left, self.hairpin_right,
                                                 args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                                                end_adapt_amount)
+                                                end_adapt_amount, self.rng)
             self.assertTrue(fragment.startswith(args.start_adapter_seq))
             self.assertTrue(fragment.endswith(args.end_adapter_seq))
             self.assertLessEqual(len(fragment),
@@ -131,11 +133,11 @@ class TestLinearFragments(unittest.TestCase):
         lengths = []
         for _ in range(self.trials):
             fragment, info = \
-                badread.simulate.build_fragment(self.lengths, self.ref_seqs, self.rev_comp_ref_seqs,
-                                                self.ref_contigs, self.ref_contig_weights,
+                badread.simulate.build_fragment(self.lengths, self.ref_seqs,
+                                                self.ref_contigs, self.ref_contig_cum_weights,
                                                 self.ref_circular, self.hairpin_left, self.hairpin_right,
                                                 args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                                                end_adapt_amount)
+                                                end_adapt_amount, self.rng)
             lengths.append(len(fragment))
         self.assertGreater(max(lengths), 1000)  # Chimeras make for some longer fragments
 
@@ -143,14 +145,15 @@ class TestLinearFragments(unittest.TestCase):
 class TestCircularFragments(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.null = open(os.devnull, 'w')
         self.lengths = badread.fragment_lengths.FragmentLengths(1000, 0, self.null)
-        self.ref_seqs = {'r': badread.misc.get_random_sequence(10000)}
+        self.ref_seqs = {'r': badread.misc.get_random_sequence(10000, self.rng)}
         self.ref_depths = {'r': 1.0}
         self.ref_circular = {'r': True}
         self.rev_comp_ref_seqs = {name: badread.misc.reverse_complement(seq)
                                   for name, seq in self.ref_seqs.items()}
-        self.ref_contigs, self.ref_contig_weights = \
+        self.ref_contigs, self.ref_contig_cum_weights = \
             badread.simulate.get_ref_contig_weights(self.ref_seqs, self.ref_depths)
         self.trials = 100
         self.hairpin_left = {'r': False}
@@ -174,11 +177,11 @@ class TestCircularFragments(unittest.TestCase):
         reverse_ref = self.rev_comp_ref_seqs['r'] + self.rev_comp_ref_seqs['r']
         for _ in range(self.trials):
             fragment, info = \
-                badread.simulate.build_fragment(self.lengths, self.ref_seqs, self.rev_comp_ref_seqs,
-                                                self.ref_contigs, self.ref_contig_weights,
+                badread.simulate.build_fragment(self.lengths, self.ref_seqs,
+                                                self.ref_contigs, self.ref_contig_cum_weights,
                                                 self.ref_circular, self.hairpin_left, self.hairpin_right,
                                                 args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                                                end_adapt_amount)
+                                                end_adapt_amount, self.rng)
             if fragment in forward_ref:
                 forward_count += 1
             if fragment in reverse_ref:
@@ -203,11 +206,11 @@ class TestCircularFragments(unittest.TestCase):
                     glitch_rate=0, glitch_size=0, glitch_skip=0)
         for _ in range(self.trials):
             fragment, info = \
-                badread.simulate.build_fragment(self.lengths, self.ref_seqs, self.rev_comp_ref_seqs,
-                                                self.ref_contigs, self.ref_contig_weights,
+                badread.simulate.build_fragment(self.lengths, self.ref_seqs,
+                                                self.ref_contigs, self.ref_contig_cum_weights,
                                                 self.ref_circular, self.hairpin_left, self.hairpin_right,
                                                 args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                                                end_adapt_amount)
+                                                end_adapt_amount, self.rng)
             self.assertTrue(fragment.startswith(args.start_adapter_seq))
             self.assertTrue(fragment.endswith(args.end_adapter_seq))
             self.assertEqual(len(fragment),
@@ -226,11 +229,11 @@ class TestCircularFragments(unittest.TestCase):
         lengths = []
         for _ in range(self.trials):
             fragment, info = \
-                badread.simulate.build_fragment(self.lengths, self.ref_seqs, self.rev_comp_ref_seqs,
-                                                self.ref_contigs, self.ref_contig_weights,
+                badread.simulate.build_fragment(self.lengths, self.ref_seqs,
+                                                self.ref_contigs, self.ref_contig_cum_weights,
                                                 self.ref_circular, self.hairpin_left, self.hairpin_right,
                                                 args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                                                end_adapt_amount)
+                                                end_adapt_amount, self.rng)
             lengths.append(len(fragment))
             self.assertTrue(len(fragment) % 1000 == 0)
         self.assertGreater(statistics.mean(lengths), 1000)  # Chimeras make for longer fragments
@@ -248,11 +251,11 @@ class TestCircularFragments(unittest.TestCase):
         lengths = []
         for _ in range(self.trials):
             fragment, info = \
-                badread.simulate.build_fragment(self.lengths, self.ref_seqs, self.rev_comp_ref_seqs,
-                                                self.ref_contigs, self.ref_contig_weights,
+                badread.simulate.build_fragment(self.lengths, self.ref_seqs,
+                                                self.ref_contigs, self.ref_contig_cum_weights,
                                                 self.ref_circular, self.hairpin_left, self.hairpin_right,
                                                 args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                                                end_adapt_amount)
+                                                end_adapt_amount, self.rng)
             lengths.append(len(fragment))
         self.assertGreater(statistics.mean(lengths), 1000)
 
@@ -269,11 +272,11 @@ class TestCircularFragments(unittest.TestCase):
         lengths = []
         for _ in range(self.trials):
             fragment, info = \
-                badread.simulate.build_fragment(self.lengths, self.ref_seqs, self.rev_comp_ref_seqs,
-                                                self.ref_contigs, self.ref_contig_weights,
+                badread.simulate.build_fragment(self.lengths, self.ref_seqs,
+                                                self.ref_contigs, self.ref_contig_cum_weights,
                                                 self.ref_circular, self.hairpin_left, self.hairpin_right,
                                                 args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                                                end_adapt_amount)
+                                                end_adapt_amount, self.rng)
             lengths.append(len(fragment))
         self.assertLess(statistics.mean(lengths), 1000)
 
@@ -291,11 +294,11 @@ class TestCircularFragments(unittest.TestCase):
         reverse_ref = self.rev_comp_ref_seqs['r'] + self.rev_comp_ref_seqs['r']
         for _ in range(self.trials):
             fragment, info = \
-                badread.simulate.build_fragment(self.lengths, self.ref_seqs, self.rev_comp_ref_seqs,
-                                                self.ref_contigs, self.ref_contig_weights,
+                badread.simulate.build_fragment(self.lengths, self.ref_seqs,
+                                                self.ref_contigs, self.ref_contig_cum_weights,
                                                 self.ref_circular, self.hairpin_left, self.hairpin_right,
                                                 args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                                                end_adapt_amount)
+                                                end_adapt_amount, self.rng)
             if fragment in forward_ref:
                 forward_count += 1
             if fragment in reverse_ref:
@@ -311,15 +314,16 @@ class TestCircularFragments(unittest.TestCase):
 class TestSmallPlasmidBias(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         # Frag lengths of 10000 and reference length 1000.
         self.null = open(os.devnull, 'w')
         self.lengths = badread.fragment_lengths.FragmentLengths(10000, 0, self.null)
-        self.ref_seqs = {'r': badread.misc.get_random_sequence(1000)}
+        self.ref_seqs = {'r': badread.misc.get_random_sequence(1000, self.rng)}
         self.ref_depths = {'r': 1.0}
         self.ref_circular = {'r': True}
         self.rev_comp_ref_seqs = {name: badread.misc.reverse_complement(seq)
                                   for name, seq in self.ref_seqs.items()}
-        self.ref_contigs, self.ref_contig_weights = \
+        self.ref_contigs, self.ref_contig_cum_weights = \
             badread.simulate.get_ref_contig_weights(self.ref_seqs, self.ref_depths)
         self.trials = 100
         self.hairpin_left = {'r': False}
@@ -342,26 +346,27 @@ class TestSmallPlasmidBias(unittest.TestCase):
                     small_plasmid_bias=True)
         with self.assertRaises(SystemExit):
             fragment, info = \
-                badread.simulate.build_fragment(self.lengths, self.ref_seqs, self.rev_comp_ref_seqs,
-                                                self.ref_contigs, self.ref_contig_weights,
+                badread.simulate.build_fragment(self.lengths, self.ref_seqs,
+                                                self.ref_contigs, self.ref_contig_cum_weights,
                                                 self.ref_circular, self.hairpin_left, self.hairpin_right,
                                                 args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                                                end_adapt_amount)
+                                                end_adapt_amount, self.rng)
             self.assertEqual(len(fragment), 1000)
 
 
 class TestWholeRef(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         # Frag lengths of 10000 and reference length 1000.
         self.null = open(os.devnull, 'w')
         self.lengths = badread.fragment_lengths.FragmentLengths(10000, 0, self.null)
-        self.ref_seqs = {'r': badread.misc.get_random_sequence(1000)}
+        self.ref_seqs = {'r': badread.misc.get_random_sequence(1000, self.rng)}
         self.ref_depths = {'r': 1.0}
         self.ref_circular = {'r': False}
         self.rev_comp_ref_seqs = {name: badread.misc.reverse_complement(seq)
                                   for name, seq in self.ref_seqs.items()}
-        self.ref_contigs, self.ref_contig_weights = \
+        self.ref_contigs, self.ref_contig_cum_weights = \
             badread.simulate.get_ref_contig_weights(self.ref_seqs, self.ref_depths)
         self.trials = 100
         self.hairpin_left = {'r': False}
@@ -383,11 +388,11 @@ class TestWholeRef(unittest.TestCase):
         forward_count, reverse_count = 0, 0
         for _ in range(self.trials):
             fragment, info = \
-                badread.simulate.build_fragment(self.lengths, self.ref_seqs, self.rev_comp_ref_seqs,
-                                                self.ref_contigs, self.ref_contig_weights,
+                badread.simulate.build_fragment(self.lengths, self.ref_seqs,
+                                                self.ref_contigs, self.ref_contig_cum_weights,
                                                 self.ref_circular, self.hairpin_left, self.hairpin_right,
                                                 args, start_adapt_rate, start_adapt_amount, end_adapt_rate,
-                                                end_adapt_amount)
+                                                end_adapt_amount, self.rng)
             self.assertEqual(len(fragment), 1000)
             if fragment == self.ref_seqs['r']:
                 forward_count += 1
@@ -403,35 +408,37 @@ class TestWholeRef(unittest.TestCase):
 class TestRandomJunk(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.trials = 20
         self.seq_len = 10000
 
     def test_random(self):
         # Random sequences compress normally - they get smaller but not too small.
         for _ in range(self.trials):
-            random_seq = badread.misc.get_random_sequence(self.seq_len)
+            random_seq = badread.misc.get_random_sequence(self.seq_len, self.rng)
             compressed_seq = zlib.compress(random_seq.encode())
             self.assertGreater(len(compressed_seq), len(random_seq) / 10)
 
     def test_junk(self):
         # Junk sequences compress a lot - they get very small
         for _ in range(self.trials):
-            random_seq = badread.simulate.get_junk_fragment(self.seq_len)
+            random_seq = badread.simulate.get_junk_fragment(self.seq_len, self.rng)
             compressed_seq = zlib.compress(random_seq.encode())
             self.assertLess(len(compressed_seq), len(random_seq) / 10)
 
 class TestHairpinReadthrough(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.null = open(os.devnull, 'w')
         self.ref_len = 1000
-        self.ref_seqs = {'r': badread.misc.get_random_sequence(self.ref_len)}
+        self.ref_seqs = {'r': badread.misc.get_random_sequence(self.ref_len, self.rng)}
         self.rev_comp_ref_seqs = {'r': badread.misc.reverse_complement(self.ref_seqs['r'])}
         self.ref_depths = {'r': 1.0}
         self.ref_circular = {'r': False}
         self.left_hairpin = {'r': True}
         self.right_hairpin = {'r': True}
-        self.ref_contigs, self.ref_contig_weights = badread.simulate.get_ref_contig_weights(
+        self.ref_contigs, self.ref_contig_cum_weights = badread.simulate.get_ref_contig_weights(
             self.ref_seqs, self.ref_depths)
         self.trials = 100
 
@@ -444,9 +451,9 @@ class TestHairpinReadthrough(unittest.TestCase):
 
         for _ in range(self.trials):
             seq, info = badread.simulate.get_real_fragment(
-                frag_len, self.ref_seqs, self.rev_comp_ref_seqs, self.ref_contigs,
-                self.ref_contig_weights, self.ref_circular, self.left_hairpin,
-                self.right_hairpin
+                frag_len, self.ref_seqs, self.ref_contigs,
+                self.ref_contig_cum_weights, self.ref_circular, self.left_hairpin,
+                self.right_hairpin, self.rng
             )
             self.assertNotEqual(seq, '')
             self.assertTrue(any('hairpin' in x for x in info))
@@ -460,11 +467,59 @@ class TestHairpinReadthrough(unittest.TestCase):
 
         for _ in range(self.trials):
             seq, info = badread.simulate.get_real_fragment(
-                frag_len, self.ref_seqs, self.rev_comp_ref_seqs, self.ref_contigs,
-                self.ref_contig_weights, self.ref_circular, self.left_hairpin,
-                self.right_hairpin
+                frag_len, self.ref_seqs, self.ref_contigs,
+                self.ref_contig_cum_weights, self.ref_circular, self.left_hairpin,
+                self.right_hairpin, self.rng
             )
             self.assertNotEqual(seq, '')
             self.assertTrue(any('hairpin' in x for x in info))
             start_pos = int(info[2].split('-', 1)[0])
             self.assertEqual(len(seq), 2 * (self.ref_len - start_pos))
+
+    def test_readthrough_sequence(self):
+        # The part after the hairpin is the other strand, back to the mirrored start position.
+        frag_len = 2500
+        forward = self.ref_seqs['r']
+        reverse = self.rev_comp_ref_seqs['r']
+        for _ in range(self.trials):
+            seq, info = badread.simulate.get_real_fragment(
+                frag_len, self.ref_seqs, self.ref_contigs,
+                self.ref_contig_cum_weights, self.ref_circular, self.left_hairpin,
+                self.right_hairpin, self.rng
+            )
+            start_pos = int(info[2].split('-', 1)[0])
+            strand_seq, other_strand_seq = (forward, reverse) if info[1] == '+strand' \
+                else (reverse, forward)
+            self.assertEqual(seq, strand_seq[start_pos:] +
+                             other_strand_seq[:self.ref_len - start_pos])
+
+
+class TestContigWeights(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = badread.rng.Rng()
+
+    def test_cumulative_weights(self):
+        ref_seqs = {'a': 'A' * 100, 'b': 'C' * 300, 'c': 'G' * 50}
+        ref_depths = {'a': 1.0, 'b': 2.0, 'c': 4.0}
+        contigs, cum_weights = badread.simulate.get_ref_contig_weights(ref_seqs, ref_depths)
+        self.assertEqual(contigs, ['a', 'b', 'c'])
+        self.assertEqual(cum_weights, [100.0, 700.0, 900.0])
+
+    def test_contig_choice(self):
+        # Contigs are chosen in proportion to depth times length.
+        ref_seqs = {'a': badread.misc.get_random_sequence(1000, self.rng),
+                    'b': badread.misc.get_random_sequence(3000, self.rng),
+                    'c': badread.misc.get_random_sequence(1000, self.rng)}
+        ref_depths = {'a': 1.0, 'b': 1.0, 'c': 0.0}
+        contigs, cum_weights = badread.simulate.get_ref_contig_weights(ref_seqs, ref_depths)
+        no_setting = {name: False for name in ref_seqs}
+        counts = collections.Counter()
+        for _ in range(2000):
+            _, info = badread.simulate.get_real_fragment(100, ref_seqs, contigs, cum_weights,
+                                                         no_setting, no_setting, no_setting,
+                                                         self.rng)
+            counts[info[0]] += 1
+        self.assertEqual(counts['c'], 0)
+        self.assertGreater(counts['b'], counts['a'] * 2)
+        self.assertLess(counts['b'], counts['a'] * 4)
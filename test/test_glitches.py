@@ -21,33 +21,40 @@ import badread.simulate
 import badread.identities
 import badread.error_model
 import badread.misc
+import badread.rng
 
 
 class TestGlitches(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.frag_length = 1000
         self.trials = 100
 
     def test_no_glitches_1(self):
         for i in range(self.trials):
-            frag = badread.misc.get_random_sequence(self.frag_length)
-            glitched_frag = badread.simulate.add_glitches(frag, 0, 0, 0)
+            frag = badread.misc.get_random_sequence(self.frag_length, self.rng)
+            glitched_frag = badread.simulate.add_glitches(frag, 0, 0, 0, self.rng)
             self.assertEqual(frag, glitched_frag)
 
     def test_no_glitches_2(self):
         # Having a positive glitch rate shouldn't matter if the size and skip are 0.
         for i in range(self.trials):
-            frag = badread.misc.get_random_sequence(self.frag_length)
-            glitched_frag = badread.simulate.add_glitches(frag, 100, 0, 0)
+            frag = badread.misc.get_random_sequence(self.frag_length, self.rng)
+            glitched_frag = badread.simulate.add_glitches(frag, 100, 0, 0, self.rng)
             self.assertEqual(frag, glitched_frag)
 
+    def test_empty_fragment(self):
+        for i in range(self.trials):
+            self.assertEqual(badread.simulate.add_glitches('', 100, 10, 10, self.rng), '')
+            self.assertEqual(badread.simulate.add_glitches('', 1, 0, 10, self.rng), '')
+
     def test_no_skip_glitches(self):
         # If the glitches have no skip, then the resulting sequence can only get longer.
         new_lengths = []
         for i in range(self.trials):
-            frag = badread.misc.get_random_sequence(self.frag_length)
-            glitched_frag = badread.simulate.add_glitches(frag, 100, 10, 0)
+            frag = badread.misc.get_random_sequence(self.frag_length, self.rng)
+            glitched_frag = badread.simulate.add_glitches(frag, 100, 10, 0, self.rng)
             self.assertTrue(len(glitched_frag) >= self.frag_length)
             new_lengths.append(len(glitched_frag))
         self.assertTrue(statistics.mean(new_lengths) > self.frag_length)
@@ -56,8 +63,8 @@ class TestGlitches(unittest.TestCase):
         # If the glitches have no size, then the resulting sequence can only get shorter.
         new_lengths = []
         for i in range(self.trials):
-            frag = badread.misc.get_random_sequence(self.frag_length)
-            glitched_frag = badread.simulate.add_glitches(frag, 100, 0, 10)
+            frag = badread.misc.get_random_sequence(self.frag_length, self.rng)
+            glitched_frag = badread.simulate.add_glitches(frag, 100, 0, 10, self.rng)
             self.assertTrue(len(glitched_frag) <= self.frag_length)
             new_lengths.append(len(glitched_frag))
         self.assertTrue(statistics.mean(new_lengths) < self.frag_length)
@@ -67,8 +74,8 @@ class TestGlitches(unittest.TestCase):
         # to get shorter.
         longer_count, shorter_count = 0, 0
         for i in range(self.trials):
-            frag = badread.misc.get_random_sequence(1000)
-            glitched_frag = badread.simulate.add_glitches(frag, 100, 10, 10)
+            frag = badread.misc.get_random_sequence(1000, self.rng)
+            glitched_frag = badread.simulate.add_glitches(frag, 100, 10, 10, self.rng)
             if len(glitched_frag) > self.frag_length:
                 longer_count += 1
             elif len(glitched_frag) < self.frag_length:
@@ -81,8 +88,8 @@ class TestGlitches(unittest.TestCase):
         # glitches and other to not.
         glitch_count, no_glitch_count = 0, 0
         for i in range(self.trials):
-            frag = badread.misc.get_random_sequence(1000)
-            glitched_frag = badread.simulate.add_glitches(frag, 1000, 10, 10)
+            frag = badread.misc.get_random_sequence(1000, self.rng)
+            glitched_frag = badread.simulate.add_glitches(frag, 1000, 10, 10, self.rng)
             if frag == glitched_frag:
                 no_glitch_count += 1
             else:
@@ -94,15 +101,27 @@ class TestGlitches(unittest.TestCase):
         # Giving a glitch rate/size/skip that's between 0 and 1 used to cause a crash until I fixed
         # the bug.
         for i in range(self.trials):
-            frag = badread.misc.get_random_sequence(self.frag_length)
-            _ = badread.simulate.add_glitches(frag, 0.5, 10, 10)
+            frag = badread.misc.get_random_sequence(self.frag_length, self.rng)
+            _ = badread.simulate.add_glitches(frag, 0.5, 10, 10, self.rng)
 
     def test_less_than_one_2(self):
         for i in range(self.trials):
-            frag = badread.misc.get_random_sequence(self.frag_length)
-            _ = badread.simulate.add_glitches(frag, 1000, 0.5, 10)
+            frag = badread.misc.get_random_sequence(self.frag_length, self.rng)
+            _ = badread.simulate.add_glitches(frag, 1000, 0.5, 10, self.rng)
 
     def test_less_than_one_3(self):
         for i in range(self.trials):
-            frag = badread.misc.get_random_sequence(self.frag_length)
-            _ = badread.simulate.add_glitches(frag, 1000, 10, 0.5)
+            frag = badread.misc.get_random_sequence(self.frag_length, self.rng)
+            _ = badread.simulate.add_glitches(frag, 1000, 10, 0.5, self.rng)
+
+    def test_expected_length_change(self):
+        # With a glitch rate of 100 and a glitch size of 10, a 10 kbp fragment gets about 100
+        # glitches, so about 1000 bp of added sequence. With a skip of 10 instead, there are
+        # about 10000 / (100 + 10) glitches, removing about 900 bp.
+        frag = badread.misc.get_random_sequence(10000, self.rng)
+        longer = [len(badread.simulate.add_glitches(frag, 100, 10, 0, self.rng))
+                  for _ in range(self.trials)]
+        self.assertAlmostEqual(statistics.mean(longer), 11000, delta=50)
+        shorter = [len(badread.simulate.add_glitches(frag, 100, 0, 10, self.rng))
+                   for _ in range(self.trials)]
+        self.assertAlmostEqual(statistics.mean(shorter), 10000 - 10000 / 110 * 10, delta=50)
@@ -18,12 +18,14 @@ import os
 import unittest
 import badread.error_model
 import badread.identities
+import badread.rng
 
 
 class TestConstantIdentity(unittest.TestCase):
 
     def setUp(self):
         self.null = open(os.devnull, 'w')
+        self.rng = badread.rng.Rng()
         self.trials = 20
 
     def tearDown(self):
@@ -32,23 +34,24 @@ class TestConstantIdentity(unittest.TestCase):
     def test_constant_identity_1(self):
         identities = badread.identities.Identities(100, 4, 100, output=self.null)
         for _ in range(self.trials):
-            self.assertEqual(identities.get_identity(), 1.0)
+            self.assertEqual(identities.get_identity(self.rng), 1.0)
 
     def test_constant_identity_2(self):
         identities = badread.identities.Identities(80, 4, 80, output=self.null)
         for _ in range(self.trials):
-            self.assertEqual(identities.get_identity(), 0.8)
+            self.assertEqual(identities.get_identity(self.rng), 0.8)
 
     def test_constant_identity_3(self):
         identities = badread.identities.Identities(90, 0, 100, output=self.null)
         for _ in range(self.trials):
-            self.assertEqual(identities.get_identity(), 0.9)
+            self.assertEqual(identities.get_identity(self.rng), 0.9)
 
 
 class TestBetaIdentity(unittest.TestCase):
 
     def setUp(self):
         self.null = open(os.devnull, 'w')
+        self.rng = badread.rng.Rng()
         self.trials = 100000
 
     def tearDown(self):
@@ -56,38 +59,38 @@ class TestBetaIdentity(unittest.TestCase):
 
     def test_beta_identity_1(self):
         identities = badread.identities.Identities(90, 4, 100, output=self.null)
-        mean = sum(identities.get_identity() for _ in range(self.trials)) / self.trials
+        mean = sum(identities.get_identity(self.rng) for _ in range(self.trials)) / self.trials
         self.assertAlmostEqual(mean, 0.9, delta=0.01)
 
     def test_beta_identity_2(self):
         identities = badread.identities.Identities(90, 4, 95, output=self.null)
-        mean = sum(identities.get_identity() for _ in range(self.trials)) / self.trials
+        mean = sum(identities.get_identity(self.rng) for _ in range(self.trials)) / self.trials
         self.assertAlmostEqual(mean, 0.9, delta=0.01)
 
     def test_beta_identity_3(self):
         identities = badread.identities.Identities(90, 4, 90, output=self.null)
-        mean = sum(identities.get_identity() for _ in range(self.trials)) / self.trials
+        mean = sum(identities.get_identity(self.rng) for _ in range(self.trials)) / self.trials
         self.assertAlmostEqual(mean, 0.9, delta=0.01)
 
     def test_beta_identity_4(self):
         identities = badread.identities.Identities(90, 3, 100, output=self.null)
-        mean = sum(identities.get_identity() for _ in range(self.trials)) / self.trials
+        mean = sum(identities.get_identity(self.rng) for _ in range(self.trials)) / self.trials
         self.assertAlmostEqual(mean, 0.9, delta=0.01)
 
     def test_beta_identity_5(self):
         identities = badread.identities.Identities(90, 2, 100, output=self.null)
-        mean = sum(identities.get_identity() for _ in range(self.trials)) / self.trials
+        mean = sum(identities.get_identity(self.rng) for _ in range(self.trials)) / self.trials
         self.assertAlmostEqual(mean, 0.9, delta=0.01)
 
     def test_beta_identity_6(self):
         identities = badread.identities.Identities(90, 8, 100, output=self.null)
-        mean = sum(identities.get_identity() for _ in range(self.trials)) / self.trials
+        mean = sum(identities.get_identity(self.rng) for _ in range(self.trials)) / self.trials
         self.assertAlmostEqual(mean, 0.9, delta=0.01)
 
     def test_bad_identity(self):
         with self.assertRaises(SystemExit) as cm:
             identities = badread.identities.Identities(81.9, 5.5, 82.1, output=self.null)
-            identities.get_identity()
+            identities.get_identity(self.rng)
         self.assertTrue('invalid beta parameters' in str(cm.exception))
 
 
@@ -95,6 +98,7 @@ class TestNormalIdentity(unittest.TestCase):
 
     def setUp(self):
         self.null = open(os.devnull, 'w')
+        self.rng = badread.rng.Rng()
         self.trials = 100000
 
     def tearDown(self):
@@ -102,20 +106,49 @@ class TestNormalIdentity(unittest.TestCase):
 
     def test_normal_identity_1(self):
         identities = badread.identities.Identities(20, 2, None, output=self.null)
-        mean = sum(identities.get_identity() for _ in range(self.trials)) / self.trials
+        mean = sum(identities.get_identity(self.rng) for _ in range(self.trials)) / self.trials
         self.assertAlmostEqual(mean, 0.98888, delta=0.01)
 
     def test_normal_identity_2(self):
         identities = badread.identities.Identities(10, 0, None, output=self.null)
-        mean = sum(identities.get_identity() for _ in range(self.trials)) / self.trials
+        mean = sum(identities.get_identity(self.rng) for _ in range(self.trials)) / self.trials
         self.assertAlmostEqual(mean, 0.9, delta=0.01)
 
     def test_normal_identity_3(self):
         identities = badread.identities.Identities(20, 0, None, output=self.null)
-        mean = sum(identities.get_identity() for _ in range(self.trials)) / self.trials
+        mean = sum(identities.get_identity(self.rng) for _ in range(self.trials)) / self.trials
         self.assertAlmostEqual(mean, 0.99, delta=0.01)
 
     def test_normal_identity_4(self):
         identities = badread.identities.Identities(30, 0, None, output=self.null)
-        mean = sum(identities.get_identity() for _ in range(self.trials)) / self.trials
+        mean = sum(identities.get_identity(self.rng) for _ in range(self.trials)) / self.trials
         self.assertAlmostEqual(mean, 0.999, delta=0.01)
+
+
+class TestIdentityArrays(unittest.TestCase):
+
+    def setUp(self):
+        self.null = open(os.devnull, 'w')
+        self.rng = badread.rng.Rng(0)
+        self.trials = 100000
+
+    def tearDown(self):
+        self.null.close()
+
+    def test_constant_identities(self):
+        identities = badread.identities.Identities(90, 0, 100, output=self.null)
+        self.assertEqual(identities.get_identities(self.rng, 20).tolist(), [0.9] * 20)
+
+    def test_beta_identities(self):
+        identities = badread.identities.Identities(90, 4, 95, output=self.null)
+        values = identities.get_identities(self.rng, self.trials)
+        self.assertAlmostEqual(values.mean(), 0.9, delta=0.01)
+        self.assertLessEqual(values.max(), 0.95)
+
+    def test_normal_identities(self):
+        # Low qscores give some negative identities, which must be redrawn.
+        identities = badread.identities.Identities(2, 2, None, output=self.null)
+        values = identities.get_identities(self.rng, self.trials)
+        self.assertGreaterEqual(values.min(), 0.0)
+        mean = sum(identities.get_identity(self.rng) for _ in range(self.trials)) / self.trials
+        self.assertAlmostEqual(values.mean(), mean, delta=0.01)
@@ -0,0 +1,152 @@
+"""
+This module contains some tests for Badread. To run them, execute `python3 -m unittest` from the
+root Badread directory.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import pickle
+import random
+import struct
+import tempfile
+import unittest
+import zlib
+
+import badread.indexed_fasta
+import badread.misc
+import badread.simulate
+
+
+def write_fasta_and_fai(filename, contigs, line_bases):
+    """
+    Writes a FASTA and its index (in the same format as samtools faidx). Returns the FASTA's bytes.
+    """
+    fasta, fai_lines = [], []
+    pos = 0
+    for header, seq in contigs:
+        header_line = f'>{header}\n'.encode()
+        pos += len(header_line)
+        lines = [seq[i:i + line_bases] + '\n' for i in range(0, len(seq), line_bases)]
+        fai_lines.append(f'{header.split()[0]}\t{len(seq)}\t{pos}\t{line_bases}\t{line_bases + 1}\n')
+        fasta.append(header_line + ''.join(lines).encode())
+        pos += len(fasta[-1]) - len(header_line)
+    fasta = b''.join(fasta)
+    with open(filename, 'wb') as f:
+        f.write(fasta)
+    with open(filename + '.fai', 'wt') as f:
+        f.write(''.join(fai_lines))
+    return fasta
+
+
+def write_bgzf_and_gzi(filename, data, block_size):
+    """
+    Writes data as a BGZF file (with small blocks, to test reads which span blocks) and its .gzi
+    index.
+    """
+    blocks, gzi_entries = [], []
+    compressed_pos = 0
+    for i in range(0, len(data), block_size):
+        chunk = data[i:i + block_size]
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        cdata = compressor.compress(chunk) + compressor.flush()
+        header = b'\x1f\x8b\x08\x04' + bytes(4) + b'\x00\xff' + struct.pack('<H', 6) + b'BC' + \
+            struct.pack('<HH', 2, 18 + len(cdata) + 8 - 1)
+        block = header + cdata + struct.pack('<II', zlib.crc32(chunk), len(chunk))
+        if i > 0:
+            gzi_entries.append((compressed_pos, i))
+        blocks.append(block)
+        compressed_pos += len(block)
+    eof = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+    with open(filename, 'wb') as f:
+        f.write(b''.join(blocks) + eof)
+    with open(filename + '.gzi', 'wb') as f:
+        f.write(struct.pack('<Q', len(gzi_entries)))
+        for compressed_offset, uncompressed_offset in gzi_entries:
+            f.write(struct.pack('<QQ', compressed_offset, uncompressed_offset))
+
+
+class TestIndexedFasta(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        random.seed(0)
+        self.contigs = [('seq_1 depth=2.5 circular=true',
+                         ''.join(random.choice('ACGT') for _ in range(1003))),
+                        ('seq_2 hairpin_left=true',
+                         ''.join(random.choice('ACGTN') for _ in range(250))),
+                        ('seq_3', 'ACGTA')]
+        self.plain_filename = os.path.join(self.temp_dir.name, 'ref.fasta')
+        fasta = write_fasta_and_fai(self.plain_filename, self.contigs, 60)
+        self.bgzf_filename = os.path.join(self.temp_dir.name, 'ref.fasta.gz')
+        write_bgzf_and_gzi(self.bgzf_filename, fasta, 100)
+        with open(self.plain_filename + '.fai', 'rb') as f:
+            fai = f.read()
+        with open(self.bgzf_filename + '.fai', 'wb') as f:
+            f.write(fai)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def load(self, filename):
+        index = badread.indexed_fasta.find_fasta_index(filename)
+        self.assertIsNotNone(index)
+        null = open(os.devnull, 'w')
+        result = badread.indexed_fasta.load_indexed_fasta(filename, *index, null)
+        null.close()
+        return result
+
+    def check_same_as_fasta(self, filename):
+        seqs, depths, circular, left, right = self.load(filename)
+        fasta_seqs, fasta_depths, fasta_circular, fasta_left, fasta_right = \
+            badread.misc.load_fasta(filename)
+        self.assertEqual(list(seqs.keys()), list(fasta_seqs.keys()))
+        self.assertEqual(depths, fasta_depths)
+        self.assertEqual(circular, fasta_circular)
+        self.assertEqual(left, fasta_left)
+        self.assertEqual(right, fasta_right)
+        for name, fasta_seq in fasta_seqs.items():
+            seq = seqs[name]
+            self.assertEqual(len(seq), len(fasta_seq))
+            self.assertEqual(seq[:], fasta_seq)
+            for start in range(0, len(fasta_seq), 7):
+                for end in range(start, min(start + 130, len(fasta_seq) + 1), 3):
+                    self.assertEqual(seq[start:end], fasta_seq[start:end])
+            rev_comp = badread.misc.reverse_complement(fasta_seq)
+            self.assertEqual(badread.simulate.get_strand_slice(seq, '-', 0, len(seq)), rev_comp)
+            self.assertEqual(badread.simulate.get_strand_slice(seq, '-', 2, 70), rev_comp[2:70])
+
+    def test_plain(self):
+        self.check_same_as_fasta(self.plain_filename)
+
+    def test_bgzf(self):
+        self.check_same_as_fasta(self.bgzf_filename)
+
+    def test_no_index(self):
+        os.remove(self.plain_filename + '.fai')
+        self.assertIsNone(badread.indexed_fasta.find_fasta_index(self.plain_filename))
+
+    def test_bgzf_without_gzi(self):
+        os.remove(self.bgzf_filename + '.gzi')
+        self.assertIsNone(badread.indexed_fasta.find_fasta_index(self.bgzf_filename))
+
+    def test_stale_index(self):
+        fai_time = os.path.getmtime(self.plain_filename + '.fai')
+        os.utime(self.plain_filename, (fai_time + 10, fai_time + 10))
+        self.assertIsNone(badread.indexed_fasta.find_fasta_index(self.plain_filename))
+
+    def test_pickle(self):
+        seqs = self.load(self.bgzf_filename)[0]
+        seq = seqs['seq_1']
+        seq[0:10]  # opens the file
+        unpickled = pickle.loads(pickle.dumps(seq))
+        self.assertEqual(unpickled[:], seq[:])
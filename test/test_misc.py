@@ -19,6 +19,7 @@ import os
 import unittest
 
 import badread.misc
+import badread.rng
 
 
 class TestCompressionType(unittest.TestCase):
@@ -178,23 +179,38 @@ class TestLoadSequences(unittest.TestCase):
 
 class TestRandomSeqs(unittest.TestCase):
 
+    def setUp(self):
+        self.rng = badread.rng.Rng()
+
     def test_random_base(self):
         for _ in range(10):
-            b = badread.misc.get_random_base()
+            b = badread.misc.get_random_base(self.rng)
             self.assertTrue(b == 'A' or b == 'C' or b == 'G' or b == 'T')
 
     def test_random_different_base(self):
         for b in ['A', 'C', 'G', 'T']:
             for _ in range(10):
-                diff_b = badread.misc.get_random_different_base(b)
+                diff_b = badread.misc.get_random_different_base(b, self.rng)
                 self.assertTrue(b == 'A' or b == 'C' or b == 'G' or b == 'T')
                 self.assertNotEqual(b, diff_b)
 
     def test_random_seq(self):
         for seq_len in range(100):
-            random_seq = badread.misc.get_random_sequence(seq_len)
+            random_seq = badread.misc.get_random_sequence(seq_len, self.rng)
             self.assertEqual(len(random_seq), seq_len)
 
+    def test_random_seq_composition(self):
+        random_seq = badread.misc.get_random_sequence(100000, self.rng)
+        self.assertEqual(set(random_seq), {'A', 'C', 'G', 'T'})
+        for b in 'ACGT':
+            self.assertAlmostEqual(random_seq.count(b) / 100000, 0.25, delta=0.01)
+
+    def test_random_seq_seeded(self):
+        seq_1 = badread.misc.get_random_sequence(1000, badread.rng.Rng(3))
+        seq_2 = badread.misc.get_random_sequence(1000, badread.rng.Rng(3))
+        self.assertEqual(seq_1, seq_2)
+        self.assertNotEqual(seq_1, badread.misc.get_random_sequence(1000, badread.rng.Rng(4)))
+
 
 class TestNumFormatting(unittest.TestCase):
 
@@ -219,6 +235,9 @@ class TestNumFormatting(unittest.TestCase):
 
 class TestOther(unittest.TestCase):
 
+    def setUp(self):
+        self.rng = badread.rng.Rng()
+
     def test_str_is_int_1(self):
         self.assertTrue(badread.misc.str_is_int('12'))
 
@@ -244,15 +263,15 @@ class TestOther(unittest.TestCase):
         self.assertEqual(badread.misc.identity_from_edlib_cigar(''), 0.0)
 
     def test_random_chance_0(self):
-        successes = sum(1 if badread.misc.random_chance(0.0) else 0 for _ in range(1000))
+        successes = sum(1 if badread.misc.random_chance(0.0, self.rng) else 0 for _ in range(1000))
         self.assertEqual(successes, 0)
 
     def test_random_chance_100(self):
-        successes = sum(1 if badread.misc.random_chance(1.0) else 0 for _ in range(1000))
+        successes = sum(1 if badread.misc.random_chance(1.0, self.rng) else 0 for _ in range(1000))
         self.assertEqual(successes, 1000)
 
     def test_random_chance_50(self):
-        successes = sum(1 if badread.misc.random_chance(0.5) else 0 for _ in range(1000))
+        successes = sum(1 if badread.misc.random_chance(0.5, self.rng) else 0 for _ in range(1000))
         self.assertTrue(200 < successes < 800)
 
     def test_only_acgt(self):
@@ -0,0 +1,85 @@
+"""
+This module contains some tests for Badread. To run them, execute `python3 -m unittest` from the
+root Badread directory.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import unittest
+import unittest.mock
+
+import badread.progress
+import badread.settings
+
+
+class TestProgress(unittest.TestCase):
+
+    def test_log_lines(self):
+        # When not writing to a terminal, each update is on its own line.
+        output = io.StringIO()
+        with unittest.mock.patch.object(badread.settings, 'PROGRESS_LOG_INTERVAL', 0):
+            progress = badread.progress.Progress(1000, output)
+            for i in range(1, 11):
+                progress.update(i, i * 100)
+            progress.finish(10, 1000)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 12)  # 10 updates, the final line and a blank line
+        self.assertTrue(lines[0].startswith('Simulating: 1 read   100 bp  10.0%'))
+        self.assertTrue(lines[-2].startswith('Simulating: 10 reads  1,000 bp  100.0%'))
+        self.assertEqual(lines[-1], '')
+        self.assertTrue(all('\r' not in line for line in lines))
+
+    def test_rate_limited(self):
+        output = io.StringIO()
+        with unittest.mock.patch.object(badread.settings, 'PROGRESS_LOG_INTERVAL', 1000):
+            progress = badread.progress.Progress(1000000, output)
+            for i in range(1, 10001):
+                progress.update(i, i * 100)
+        self.assertEqual(len(output.getvalue().splitlines()), 1)
+
+    def test_terminal(self):
+        output = io.StringIO()
+        output.isatty = lambda: True
+        progress = badread.progress.Progress(1000, output)
+        progress.update(1, 100)
+        progress.finish(2, 1000)
+        self.assertTrue(output.getvalue().startswith('\rSimulating: 1 read '))
+        self.assertIn('\rSimulating: 2 reads  1,000 bp  100.0%', output.getvalue())
+        self.assertTrue(output.getvalue().endswith('\n\n'))
+
+
+class TestProgressLine(unittest.TestCase):
+
+    def test_no_rate_yet(self):
+        self.assertEqual(badread.progress.get_progress_line(0, 0, 1000, 0.0, 0, 0),
+                         'Simulating: 0 reads  0 bp  0.0%')
+
+    def test_rates_and_eta(self):
+        line = badread.progress.get_progress_line(100, 250000, 1000000, 10.0, 100, 250000)
+        self.assertEqual(line, 'Simulating: 100 reads  250,000 bp  25.0%  10.0 reads/s  '
+                               '25,000 bp/s  ETA 0:00:30')
+
+    def test_resumed(self):
+        # Rates only count this run's reads.
+        line = badread.progress.get_progress_line(200, 500000, 1000000, 10.0, 100, 250000)
+        self.assertIn('10.0 reads/s  25,000 bp/s  ETA 0:00:20', line)
+
+    def test_done(self):
+        line = badread.progress.get_progress_line(100, 1000100, 1000000, 10.0, 100, 1000100)
+        self.assertTrue(line.startswith('Simulating: 100 reads  1,000,100 bp  100.0%'))
+        self.assertNotIn('ETA', line)
+
+    def test_format_duration(self):
+        self.assertEqual(badread.progress.format_duration(0.4), '0:00:00')
+        self.assertEqual(badread.progress.format_duration(3725), '1:02:05')
+        self.assertEqual(badread.progress.format_duration(90000), '1 day, 1:00:00')
@@ -16,6 +16,7 @@ If not, see <http://www.gnu.org/licenses/>.
 
 import collections
 import math
+import numpy as np
 import os
 import random
 import statistics
@@ -23,6 +24,7 @@ import unittest
 
 import badread.misc
 import badread.qscore_model
+import badread.rng
 import badread.settings
 
 
@@ -93,6 +95,80 @@ class TestUniformDist(unittest.TestCase):
         self.assertEqual(probs, [0.2, 0.2, 0.2, 0.2, 0.2])
 
 
+class TestAliasTable(unittest.TestCase):
+    """
+    Checks that alias tables exactly reproduce the distributions they were built from.
+    """
+    def check_alias_table(self, scores, probs):
+        chars, thresholds, aliases = badread.qscore_model.make_alias_table(scores, probs)
+        self.assertEqual(len(chars), len(scores))
+        table_probs = collections.defaultdict(float)
+        for i, c in enumerate(chars):
+            table_probs[c] += thresholds[i] / len(chars)
+            table_probs[chars[aliases[i]]] += (1.0 - thresholds[i]) / len(chars)
+        for q, p in zip(scores, probs):
+            self.assertAlmostEqual(table_probs[badread.qscore_model.qscore_val_to_char(q)],
+                                   p / sum(probs))
+
+    def test_alias_table_1(self):
+        self.check_alias_table([1, 2], [0.5, 0.5])
+
+    def test_alias_table_2(self):
+        self.check_alias_table([3, 5, 8, 13, 21], [0.1, 0.5, 0.05, 0.3, 0.05])
+
+    def test_alias_table_3(self):
+        self.check_alias_table([10, 20, 30], [0.0, 0.999, 0.001])
+
+
+class TestCigarArrays(unittest.TestCase):
+
+    def test_cigar_to_array(self):
+        full_cigar = badread.qscore_model.cigar_to_array('3=1I2D1X')
+        self.assertEqual(full_cigar.tolist(), [0, 0, 0, 2, 3, 3, 1])
+
+    def test_cigar_from_edits(self):
+        # A substitution, a deletion and insertions after, before and instead of a base.
+        fragment = 'ACGTACGTAC'
+        edits = [(1, 'G'), (3, ''), (5, 'CA'), (7, 'GT'), (9, 'TT')]
+        full_cigar = badread.qscore_model.cigar_from_edits(fragment, edits)
+        self.assertEqual(full_cigar.tolist(), [0, 1, 0, 3, 0, 0, 2, 0, 2, 0, 0, 1, 2])
+
+    def test_cigar_from_edits_identity(self):
+        # With a few scattered errors, the edits make an optimal alignment, so the identity should
+        # match edlib's.
+        null = open(os.devnull, 'w')
+        model = badread.qscore_model.QScoreModel('ideal', output=null)
+        null.close()
+        fragment = 'ACGTTGCAAGCTTACGGATCCAGTCGATCGGATCCAGTAGCTAGTCGATCAGTCA'
+        edits = [(5, 'C'), (20, ''), (35, 'AT')]
+        seq = list(fragment)
+        for pos, new_bases in edits:
+            seq[pos] = new_bases
+        seq = ''.join(seq)
+        full_cigar = badread.qscore_model.cigar_from_edits(fragment, edits)
+        rng = badread.rng.Rng()
+        _, identity_1, _ = badread.qscore_model.get_qscores(seq, fragment, model, rng, full_cigar)
+        _, identity_2, _ = badread.qscore_model.get_qscores(seq, fragment, model, rng)
+        self.assertAlmostEqual(identity_1, identity_2)
+
+    def test_cigar_to_key(self):
+        keys = [badread.qscore_model.cigar_to_key(c) for c in ['=', 'X', '==', '=X=', '=D=']]
+        self.assertEqual(len(set(keys)), 5)
+
+    def test_get_context_ids(self):
+        null = open(os.devnull, 'w')
+        model = badread.qscore_model.QScoreModel('ideal', output=null)
+        null.close()
+        full_cigar = badread.qscore_model.cigar_to_array('2=1X2=')
+        starts, ends = [0, 2, 0, 1], [0, 2, 4, 3]  # '=', 'X', '==X==', '=X='
+        ids = model.get_context_ids(full_cigar, np.array(starts),
+                                    np.array(ends))
+        self.assertTrue(ids[0] >= 0)
+        self.assertTrue(ids[1] >= 0)
+        self.assertEqual(ids[2], -1)
+        self.assertEqual(ids[3], -1)
+
+
 class TestQScoreConversions(unittest.TestCase):
 
     def test_qscore_char_to_val(self):
@@ -113,6 +189,7 @@ class TestQScoreConversions(unittest.TestCase):
 class TestRandomModel(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.trials = 10000
         null = open(os.devnull, 'w')
         self.model = badread.qscore_model.QScoreModel('random', output=null)
@@ -138,7 +215,7 @@ class TestRandomModel(unittest.TestCase):
         qscores = []
         for _ in range(self.trials):
             cigar = random.choice(['=', 'X', 'I'])  # cigar doesn't matter for random qscore model
-            q = self.model.get_qscore(cigar)
+            q = self.model.get_qscore(cigar, self.rng)
             q = badread.qscore_model.qscore_char_to_val(q)
             qscores.append(q)
         dist_min = badread.settings.RANDOM_QSCORE_MIN
@@ -152,6 +229,7 @@ class TestRandomModel(unittest.TestCase):
 class TestIdealModel(unittest.TestCase):
 
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.trials = 10000
         null = open(os.devnull, 'w')
         self.model = badread.qscore_model.QScoreModel('ideal', output=null)
@@ -169,7 +247,7 @@ class TestIdealModel(unittest.TestCase):
     def one_cigar_test(self, cigar, dist_min, dist_max):
         qscores = []
         for _ in range(self.trials):
-            q = self.model.get_qscore(cigar)
+            q = self.model.get_qscore(cigar, self.rng)
             q = badread.qscore_model.qscore_char_to_val(q)
             qscores.append(q)
         target_mean = (dist_min + dist_max) / 2
@@ -291,6 +369,7 @@ class TestLoadedQScoreModelDistributions(unittest.TestCase):
     particular CIGARs look okay.
     """
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.trials = 10000
         null = open(os.devnull, 'w')
         model_filename = os.path.join(os.path.dirname(__file__), 'simple_qscore_model')
@@ -300,7 +379,7 @@ class TestLoadedQScoreModelDistributions(unittest.TestCase):
     def get_mean_stdev(self, cigar):
         qscores = []
         for _ in range(self.trials):
-            q = self.model.get_qscore(cigar)
+            q = self.model.get_qscore(cigar, self.rng)
             q = badread.qscore_model.qscore_char_to_val(q)
             qscores.append(q)
         return statistics.mean(qscores), statistics.stdev(qscores)
@@ -327,6 +406,7 @@ class TestGetQScoresRandom(unittest.TestCase):
     qscores can appear in any place.
     """
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.trials = 1000
         null = open(os.devnull, 'w')
         self.model = badread.qscore_model.QScoreModel('random', output=null)
@@ -336,7 +416,8 @@ class TestGetQScoresRandom(unittest.TestCase):
         min_indices = set()
         max_indices = set()
         for _ in range(self.trials):
-            qscores, _, _ = badread.qscore_model.get_qscores(sequence, fragment, self.model)
+            qscores, _, _ = badread.qscore_model.get_qscores(sequence, fragment, self.model,
+                                                             self.rng)
             self.assertEqual(len(qscores), len(sequence))
             qscores = [badread.qscore_model.qscore_char_to_val(q) for q in qscores]
             min_indices.add(qscores.index(min(qscores)))
@@ -363,6 +444,7 @@ class TestGetQScoresIdeal(unittest.TestCase):
     positions.
     """
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.trials = 100
         null = open(os.devnull, 'w')
         self.model = badread.qscore_model.QScoreModel('ideal', output=null)
@@ -371,7 +453,8 @@ class TestGetQScoresIdeal(unittest.TestCase):
     def check_min_positions(self, sequence, fragment, expected_min):
         min_indices = set()
         for _ in range(self.trials):
-            qscores, _, _ = badread.qscore_model.get_qscores(sequence, fragment, self.model)
+            qscores, _, _ = badread.qscore_model.get_qscores(sequence, fragment, self.model,
+                                                             self.rng)
             self.assertEqual(len(qscores), len(sequence))
             qscores = [badread.qscore_model.qscore_char_to_val(q) for q in qscores]
             min_indices.add(qscores.index(min(qscores)))
@@ -393,6 +476,7 @@ class TestGetQScoresLoadedModel(unittest.TestCase):
     positions, but not always.
     """
     def setUp(self):
+        self.rng = badread.rng.Rng()
         self.trials = 1000
         null = open(os.devnull, 'w')
         model_filename = os.path.join(os.path.dirname(__file__), 'simple_qscore_model')
@@ -402,7 +486,8 @@ class TestGetQScoresLoadedModel(unittest.TestCase):
     def check_min_positions(self, sequence, fragment, expected_min):
         min_position_counts = collections.defaultdict(int)
         for _ in range(self.trials):
-            qscores, _, _ = badread.qscore_model.get_qscores(sequence, fragment, self.model)
+            qscores, _, _ = badread.qscore_model.get_qscores(sequence, fragment, self.model,
+                                                             self.rng)
             self.assertEqual(len(qscores), len(sequence))
             qscores = [badread.qscore_model.qscore_char_to_val(q) for q in qscores]
             min_position_counts[qscores.index(min(qscores))] += 1
@@ -497,6 +582,7 @@ class TestBugs(unittest.TestCase):
     These tests are for bugs I found (and fixed).
     """
     def setUp(self):
+        self.rng = badread.rng.Rng()
         null = open(os.devnull, 'w')
         self.model = badread.qscore_model.QScoreModel('nanopore2018', output=null)
         null.close()
@@ -508,7 +594,7 @@ class TestBugs(unittest.TestCase):
         """
         seq = 'CGGGCGCAACGCGTTCGATGCTCCACGTCAGTGAGCCTAAGCATATAAGCGAAAGGCT'
         frag = 'CGTCCGCTACGGCGGCAGTTCCCCATTCTTCCCCCGCATCGAGTGATAAACCGTAAACATGGGCGTAGACGGCATCCCCT'
-        qscores, _, _ = badread.qscore_model.get_qscores(seq, frag, self.model)
+        qscores, _, _ = badread.qscore_model.get_qscores(seq, frag, self.model, self.rng)
         self.assertEqual(len(seq), len(qscores))
 
     def test_bug_2(self):
@@ -518,5 +604,5 @@ class TestBugs(unittest.TestCase):
         """
         seq = 'CGGCGGCAGTTCCCCATTCTTCCCCCGCATCGAGTGATAAACCGTAAACATGGGCGTAGACGGCATCCCCT'
         frag = 'ATATCGGCGGCAGTTCCCCATTCTTCCCCCGCATCGAGTGATAAACCGTAAACATGGGCGTAGACGGCATCCCCT'
-        qscores, _, _ = badread.qscore_model.get_qscores(seq, frag, self.model)
+        qscores, _, _ = badread.qscore_model.get_qscores(seq, frag, self.model, self.rng)
         self.assertEqual(len(seq), len(qscores))
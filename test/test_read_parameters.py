@@ -0,0 +1,162 @@
+"""
+This module contains some tests for Badread. To run them, execute `python3 -m unittest` from the
+root Badread directory.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import os
+import pickle
+import statistics
+import unittest
+
+import badread.fragment_lengths
+import badread.identities
+import badread.misc
+import badread.read_parameters
+import badread.rng
+import badread.settings
+import badread.simulate
+
+
+Args = collections.namedtuple('Args', ['junk_reads', 'random_reads', 'chimeras',
+                                       'start_adapter_seq', 'end_adapter_seq'])
+
+
+class TestReadParameters(unittest.TestCase):
+
+    def setUp(self):
+        self.null = open(os.devnull, 'w')
+        self.rng = badread.rng.Rng()
+        self.ref_seqs = {'a': badread.misc.get_random_sequence(1000, self.rng),
+                         'b': badread.misc.get_random_sequence(3000, self.rng)}
+        self.ref_depths = {'a': 1.0, 'b': 1.0}
+        self.trials = 5000
+
+    def tearDown(self):
+        self.null.close()
+
+    def read_parameters(self, seed=0, junk_reads=0.0, random_reads=0.0, chimeras=0.0,
+                        start_adapter=('', 0.0, 0.0), end_adapter=('', 0.0, 0.0)):
+        frag_lengths = badread.fragment_lengths.FragmentLengths(500, 100, output=self.null)
+        identities = badread.identities.Identities(90, 4, 100, output=self.null)
+        contigs, cum_weights = badread.simulate.get_ref_contig_weights(self.ref_seqs,
+                                                                       self.ref_depths)
+        args = Args(junk_reads, random_reads, chimeras, start_adapter[0], end_adapter[0])
+        return badread.read_parameters.ReadParameters(
+            seed, frag_lengths, identities, self.ref_seqs, contigs, cum_weights, args,
+            start_adapter[1], start_adapter[2], end_adapter[1], end_adapter[2])
+
+    def test_same_for_read_index(self):
+        # A read's parameters don't depend on which other reads were drawn first.
+        block_size = badread.settings.READ_PARAMETER_BLOCK_SIZE
+        indices = [0, 1, block_size - 1, block_size, 3 * block_size + 7]
+        params_1 = self.read_parameters(seed=3)
+        forward = [params_1.get(i) for i in indices]
+        params_2 = self.read_parameters(seed=3)
+        backward = [params_2.get(i) for i in reversed(indices)][::-1]
+        self.assertEqual(forward, backward)
+        self.assertNotEqual(forward[0], forward[1])
+        self.assertNotEqual(self.read_parameters(seed=4).get(0), forward[0])
+
+    def test_blocks_cached(self):
+        # Going back and forth between blocks draws each only once, up to the number cached.
+        block_size = badread.settings.READ_PARAMETER_BLOCK_SIZE
+        cached_blocks = badread.settings.READ_PARAMETER_CACHED_BLOCKS
+        params = self.read_parameters(seed=3)
+        drawn = []
+        draw_block = params.draw_block
+        params.draw_block = lambda block_index: drawn.append(block_index) or \
+            draw_block(block_index)
+        for i in range(3):
+            for block_index in range(cached_blocks):
+                params.get(block_index * block_size + i)
+        self.assertEqual(drawn, list(range(cached_blocks)))
+        params.get(cached_blocks * block_size)
+        self.assertEqual(len(params.blocks), cached_blocks)
+        self.assertNotIn(0, params.blocks)
+
+    def test_pickle(self):
+        params = self.read_parameters(seed=3)
+        first = params.get(0)
+        unpickled = pickle.loads(pickle.dumps(params))
+        self.assertEqual(len(unpickled.blocks), 0)
+        self.assertEqual(unpickled.get(0), first)
+
+    def test_values(self):
+        params = self.read_parameters()
+        contig_counts = collections.Counter()
+        for i in range(self.trials):
+            p = params.get(i)
+            self.assertEqual(p.fragment_type, 'good')
+            self.assertIn(p.strand, ('+', '-'))
+            self.assertGreaterEqual(p.start_pos, 0)
+            self.assertLess(p.start_pos, len(self.ref_seqs[p.contig]))
+            self.assertGreaterEqual(p.fragment_length, 1)
+            self.assertTrue(0.0 <= p.identity <= 1.0)
+            self.assertEqual(p.chimeras, 0)
+            self.assertEqual(p.start_adapter, '')
+            self.assertEqual(p.end_adapter, '')
+            contig_counts[p.contig] += 1
+        self.assertAlmostEqual(contig_counts['b'] / self.trials, 0.75, delta=0.03)
+
+    def test_fragment_types(self):
+        params = self.read_parameters(junk_reads=10.0, random_reads=20.0)
+        types = collections.Counter(params.get(i).fragment_type for i in range(self.trials))
+        self.assertAlmostEqual(types['junk'] / self.trials, 0.1, delta=0.02)
+        self.assertAlmostEqual(types['random'] / self.trials, 0.2, delta=0.02)
+
+    def test_chimeras(self):
+        # The mean number of joins for a chimera rate of r is r / (1 - r).
+        params = self.read_parameters(chimeras=20.0)
+        chimeras = [params.get(i).chimeras for i in range(self.trials)]
+        self.assertAlmostEqual(statistics.mean(chimeras), 0.25, delta=0.03)
+
+    def test_adapters(self):
+        start, end = 'AAAAACCCCC', 'GGGGGTTTTT'
+        params = self.read_parameters(start_adapter=(start, 0.5, 1.0),
+                                      end_adapter=(end, 1.0, 0.5))
+        start_count = 0
+        for i in range(self.trials):
+            p = params.get(i)
+            if p.start_adapter:
+                self.assertEqual(p.start_adapter, start)
+                start_count += 1
+            self.assertTrue(end.startswith(p.end_adapter))
+        self.assertAlmostEqual(start_count / self.trials, 0.5, delta=0.03)
+
+    def test_partial_start_adapter(self):
+        start = 'AAAAACCCCC'
+        params = self.read_parameters(start_adapter=(start, 1.0, 0.5))
+        lengths = [len(params.get(i).start_adapter) for i in range(self.trials)]
+        for i in range(100):
+            self.assertTrue(start.endswith(params.get(i).start_adapter))
+        self.assertAlmostEqual(statistics.mean(lengths), 4.5, delta=0.3)
+
+    def test_build_fragment(self):
+        params = self.read_parameters(start_adapter=('AAAAACCCCC', 1.0, 1.0))
+        p = params.get(0)
+        lengths = badread.fragment_lengths.FragmentLengths(500, 100, output=self.null)
+        contigs, cum_weights = badread.simulate.get_ref_contig_weights(self.ref_seqs,
+                                                                       self.ref_depths)
+        no_setting = {name: False for name in self.ref_seqs}
+        args = collections.namedtuple('Args', ['start_adapter_seq', 'end_adapter_seq', 'chimeras',
+                                               'glitch_rate', 'glitch_size', 'glitch_skip'])\
+            ('AAAAACCCCC', '', 0.0, 0, 0, 0)
+        fragment, info = badread.simulate.build_fragment(lengths, self.ref_seqs, contigs,
+                                                         cum_weights, no_setting, no_setting,
+                                                         no_setting, args, 1.0, 1.0, 0.0, 0.0,
+                                                         self.rng, p)
+        end_pos = min(p.start_pos + p.fragment_length, len(self.ref_seqs[p.contig]))
+        self.assertEqual(info, [f'{p.contig},{p.strand}strand,{p.start_pos}-{end_pos}'])
+        self.assertTrue(fragment.startswith('AAAAACCCCC'))
@@ -0,0 +1,69 @@
+"""
+This module contains some tests for Badread. To run them, execute `python3 -m unittest` from the
+root Badread directory.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import itertools
+import os
+import pickle
+import unittest
+
+import badread.read_set
+import badread.simulate
+
+
+class TestReadSet(unittest.TestCase):
+
+    def setUp(self):
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        self.simulator = badread.simulate.Simulator(ref_filename, seed=3, length='500,100',
+                                                    error_model='random',
+                                                    qscore_model='ideal')
+        self.read_set = badread.read_set.ReadSet(self.simulator, 50)
+
+    def test_same_as_simulator(self):
+        self.assertEqual(list(self.read_set[:20]),
+                         list(itertools.islice(self.simulator.reads(), 20)))
+
+    def test_random_access(self):
+        forward = [self.read_set[i] for i in range(10)]
+        backward = [self.read_set[i] for i in reversed(range(10))][::-1]
+        self.assertEqual(forward, backward)
+        self.assertEqual(len(set(forward)), 10)
+        self.assertEqual(self.read_set[-1], self.read_set[49])
+        with self.assertRaises(IndexError):
+            _ = self.read_set[50]
+
+    def test_slices(self):
+        self.assertEqual(len(self.read_set), 50)
+        evens, odds = self.read_set[0::2], self.read_set[1::2]
+        self.assertEqual(len(evens), 25)
+        self.assertEqual(len(odds), 25)
+        self.assertEqual(odds[3], self.read_set[7])
+        self.assertEqual(len(self.read_set[40:60]), 10)
+
+    def test_different_seeds(self):
+        other = badread.read_set.ReadSet(
+            badread.simulate.Simulator(self.simulator.args.reference, seed=4, length='500,100',
+                                       error_model='random', qscore_model='ideal'), 50)
+        self.assertNotEqual(other[0], self.read_set[0])
+
+    def test_pickle(self):
+        # Read sets can be sent to worker processes.
+        unpickled = pickle.loads(pickle.dumps(self.read_set[10:20]))
+        self.assertEqual(unpickled[5], self.read_set[15])
+
+    def test_bad_count(self):
+        with self.assertRaises(ValueError):
+            badread.read_set.ReadSet(self.simulator, -1)
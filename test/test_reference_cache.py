@@ -0,0 +1,119 @@
+"""
+This module contains some tests for Badread. To run them, execute `python3 -m unittest` from the
+root Badread directory.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import os
+import pickle
+import random
+import tempfile
+import unittest
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+import badread.misc
+import badread.reference_cache
+import badread.simulate
+
+
+class TestReferenceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.ref_filename = os.path.join(self.temp_dir.name, 'ref.fasta')
+        random.seed(0)
+        seq_1 = ''.join(random.choice('ACGT') for _ in range(1001))
+        seq_2 = ''.join(random.choice('ACGTacgt') for _ in range(50)) + 'NNNNN' + \
+            ''.join(random.choice('ACGT') for _ in range(20)) + 'RYN' + 'acgn'
+        with open(self.ref_filename, 'wt') as f:
+            f.write(f'>seq_1 depth=2.5 circular=true\n{seq_1[:500]}\n{seq_1[500:]}\n')
+            f.write(f'>seq_2 hairpin_left=true\n{seq_2}\n')
+            f.write('>seq_3\nA\n')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def load(self):
+        output = io.StringIO()
+        result = badread.reference_cache.load_reference_cache(self.ref_filename, output)
+        return result, output.getvalue()
+
+    def test_same_as_fasta(self):
+        (seqs, depths, circular, left, right), _ = self.load()
+        fasta_seqs, fasta_depths, fasta_circular, fasta_left, fasta_right = \
+            badread.misc.load_fasta(self.ref_filename)
+        self.assertEqual(list(seqs.keys()), list(fasta_seqs.keys()))
+        self.assertEqual(depths, fasta_depths)
+        self.assertEqual(circular, fasta_circular)
+        self.assertEqual(left, fasta_left)
+        self.assertEqual(right, fasta_right)
+        for name, fasta_seq in fasta_seqs.items():
+            seq = seqs[name]
+            self.assertEqual(len(seq), len(fasta_seq))
+            self.assertEqual(seq[:], fasta_seq)
+            for start in range(len(fasta_seq)):
+                for end in range(start, min(start + 12, len(fasta_seq) + 1)):
+                    self.assertEqual(seq[start:end], fasta_seq[start:end])
+
+    def test_reverse_complement(self):
+        (seqs, _, _, _, _), _ = self.load()
+        fasta_seqs = badread.misc.load_fasta(self.ref_filename)[0]
+        for name, fasta_seq in fasta_seqs.items():
+            rev_comp = badread.misc.reverse_complement(fasta_seq)
+            seq = seqs[name]
+            self.assertEqual(badread.simulate.get_strand_slice(seq, '-', 0, len(seq)), rev_comp)
+            self.assertEqual(badread.simulate.get_strand_slice(seq, '-', 3, 40), rev_comp[3:40])
+            self.assertEqual(badread.simulate.get_strand_slice(seq, '+', 3, 40), fasta_seq[3:40])
+
+    def test_cache_reused(self):
+        _, output = self.load()
+        self.assertTrue('building reference cache' in output)
+        _, output = self.load()
+        self.assertTrue('using reference cache' in output)
+
+    def test_cache_rebuilt_after_change(self):
+        self.load()
+        with open(self.ref_filename, 'at') as f:
+            f.write('>seq_4\nACGT\n')
+        (seqs, _, _, _, _), output = self.load()
+        self.assertTrue('building reference cache' in output)
+        self.assertEqual(seqs['seq_4'][:], 'ACGT')
+
+    def test_pickle(self):
+        (seqs, _, _, _, _), _ = self.load()
+        seq = seqs['seq_2']
+        seq[0:10]  # memory-maps the cache
+        unpickled = pickle.loads(pickle.dumps(seq))
+        self.assertEqual(unpickled[:], seq[:])
+
+    @unittest.skipIf(resource is None, 'needs the resource module')
+    def test_more_contigs_than_file_descriptors(self):
+        # All contigs share one memory map, so reading many contigs doesn't use a file descriptor
+        # for each.
+        soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+        contig_count = 1000
+        with open(self.ref_filename, 'wt') as f:
+            for i in range(contig_count):
+                f.write(f'>contig_{i}\n{"ACGT"[i % 4] * 20}\n')
+        (seqs, _, _, _, _), _ = self.load()
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(256, soft_limit), hard_limit))
+        try:
+            for i in range(contig_count):
+                self.assertEqual(seqs[f'contig_{i}'][5:10], 'ACGT'[i % 4] * 5)
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft_limit, hard_limit))
@@ -14,9 +14,12 @@ details. You should have received a copy of the GNU General Public License along
 If not, see <http://www.gnu.org/licenses/>.
 """
 
+import collections
 import os
 import unittest
 
+import badread.fragment_lengths
+import badread.rng
 import badread.simulate
 
 
@@ -63,3 +66,56 @@ class TestLinearFragments(unittest.TestCase):
         self.assertEqual(self.ref_depths['I'], 1.0)
         self.assertEqual(self.ref_depths['J'], 5.4321)
         self.assertEqual(self.ref_depths['K'], 1.23456)
+
+
+class TestAdjustDepths(unittest.TestCase):
+
+    def setUp(self):
+        self.null = open(os.devnull, 'w')
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_1.fasta')
+        self.ref_seqs, self.ref_depths, self.ref_circular, _, _ = \
+            badread.simulate.load_reference(ref_filename, output=self.null)
+        self.Args = collections.namedtuple('Args', ['small_plasmid_bias'])
+
+    def tearDown(self):
+        self.null.close()
+
+    def expected_depths(self, frag_lengths, small_plasmid_bias):
+        # The adjustments made one sample at a time.
+        rng = badread.rng.Rng(0)
+        sampled_lengths = [frag_lengths.get_fragment_length(rng) for _ in range(100000)]
+        total = sum(sampled_lengths)
+        depths = dict(self.ref_depths)
+        for name, seq in self.ref_seqs.items():
+            if self.ref_circular[name] and not small_plasmid_bias:
+                depths[name] *= total / sum(x for x in sampled_lengths if x <= len(seq))
+            elif not self.ref_circular[name]:
+                depths[name] *= total / sum(min(len(seq), x) for x in sampled_lengths)
+        return depths
+
+    def test_adjust_depths(self):
+        frag_lengths = badread.fragment_lengths.FragmentLengths(20, 10, output=self.null)
+        for small_plasmid_bias in [False, True]:
+            depths = dict(self.ref_depths)
+            badread.simulate.adjust_depths(self.ref_seqs, depths, self.ref_circular,
+                                           frag_lengths, self.Args(small_plasmid_bias),
+                                           badread.rng.Rng(0))
+            expected = self.expected_depths(frag_lengths, small_plasmid_bias)
+            for name in self.ref_seqs:
+                self.assertAlmostEqual(depths[name], expected[name], places=12)
+            self.assertGreater(depths['B'], self.ref_depths['B'])
+
+    def test_no_adjustment_for_long_references(self):
+        frag_lengths = badread.fragment_lengths.FragmentLengths(5, 0, output=self.null)
+        depths = dict(self.ref_depths)
+        badread.simulate.adjust_depths(self.ref_seqs, depths, self.ref_circular, frag_lengths,
+                                       self.Args(False), badread.rng.Rng(0))
+        self.assertEqual(depths, self.ref_depths)
+
+    def test_incompatible_circular_reference(self):
+        frag_lengths = badread.fragment_lengths.FragmentLengths(1000, 0, output=self.null)
+        with self.assertRaises(SystemExit) as cm:
+            badread.simulate.adjust_depths(self.ref_seqs, dict(self.ref_depths),
+                                           self.ref_circular, frag_lengths, self.Args(False),
+                                           badread.rng.Rng(0))
+        self.assertIn('--small_plasmid_bias', str(cm.exception))
@@ -0,0 +1,98 @@
+"""
+This module contains some tests for Badread. To run them, execute `python3 -m unittest` from the
+root Badread directory.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import unittest
+
+import numpy as np
+
+import badread.rng
+
+
+class TestRng(unittest.TestCase):
+
+    def setUp(self):
+        self.trials = 10000
+
+    def test_same_seed(self):
+        rng_1, rng_2 = badread.rng.Rng(7), badread.rng.Rng(7)
+        self.assertEqual([rng_1.random() for _ in range(2000)],
+                         [rng_2.random() for _ in range(2000)])
+        self.assertEqual(rng_1.getrandbits(128), rng_2.getrandbits(128))
+
+    def test_different_seed(self):
+        rng_1, rng_2 = badread.rng.Rng(7), badread.rng.Rng(8)
+        self.assertNotEqual([rng_1.random() for _ in range(10)],
+                            [rng_2.random() for _ in range(10)])
+
+    def test_random(self):
+        rng = badread.rng.Rng(0)
+        values = [rng.random() for _ in range(self.trials)]
+        self.assertTrue(all(0.0 <= v < 1.0 for v in values))
+        self.assertAlmostEqual(sum(values) / self.trials, 0.5, delta=0.02)
+
+    def test_randint(self):
+        rng = badread.rng.Rng(0)
+        counts = collections.Counter(rng.randint(3, 6) for _ in range(self.trials))
+        self.assertEqual(sorted(counts), [3, 4, 5, 6])
+        for value in range(3, 7):
+            self.assertAlmostEqual(counts[value] / self.trials, 0.25, delta=0.02)
+
+    def test_choice(self):
+        rng = badread.rng.Rng(0)
+        counts = collections.Counter(rng.choice('ACGT') for _ in range(self.trials))
+        self.assertEqual(sorted(counts), ['A', 'C', 'G', 'T'])
+
+    def test_weighted_choice(self):
+        rng = badread.rng.Rng(0)
+        cum_weights = [1.0, 1.0, 4.0]  # the middle item has no weight
+        counts = collections.Counter(rng.weighted_choice('abc', cum_weights)
+                                     for _ in range(self.trials))
+        self.assertEqual(counts['b'], 0)
+        self.assertAlmostEqual(counts['a'] / self.trials, 0.25, delta=0.02)
+        self.assertAlmostEqual(counts['c'] / self.trials, 0.75, delta=0.02)
+
+    def test_getrandbits(self):
+        rng = badread.rng.Rng(0)
+        for k in (1, 8, 64, 65, 128):
+            values = [rng.getrandbits(k) for _ in range(200)]
+            self.assertTrue(all(0 <= v < 2 ** k for v in values))
+            self.assertGreaterEqual(max(values), 2 ** (k - 1))
+
+    def test_bytes(self):
+        rng_1, rng_2 = badread.rng.Rng(0), badread.rng.Rng(0)
+        lengths = [0, 1, 7, 4000, 200, 10000, 3]  # some from the buffered block, some not
+        chunks = [rng_1.bytes(n) for n in lengths]
+        self.assertEqual([len(c) for c in chunks], lengths)
+        self.assertEqual(chunks, [rng_2.bytes(n) for n in lengths])
+        self.assertNotEqual(chunks[2], rng_1.bytes(7))
+        counts = collections.Counter(rng_1.bytes(self.trials))
+        self.assertGreater(len(counts), 250)
+
+    def test_spawn(self):
+        children = badread.rng.Rng(5).spawn(3)
+        values = [c.generator.random() for c in children]
+        self.assertEqual(len(set(values)), 3)
+        again = [c.generator.random() for c in badread.rng.Rng(5).spawn(3)]
+        self.assertEqual(values, again)
+
+    def test_child_rng(self):
+        # A child stream is the same one spawning would give, without spawning the others first.
+        child = badread.rng.get_child_rng(5, 1, 123)
+        spawned = badread.rng.Rng(np.random.SeedSequence(5).spawn(2)[1].spawn(124)[123])
+        self.assertEqual(child.generator.random(5).tolist(), spawned.generator.random(5).tolist())
+        other = badread.rng.get_child_rng(5, 1, 124)
+        self.assertNotEqual(child.generator.random(), other.generator.random())
@@ -0,0 +1,54 @@
+"""
+This module contains some tests for Badread. To run them, execute `python3 -m unittest` from the
+root Badread directory.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import json
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+import badread.run_stats
+
+
+class TestRunStats(unittest.TestCase):
+
+    def test_merge(self):
+        stats_1, stats_2 = badread.run_stats.RunStats(), badread.run_stats.RunStats()
+        stats_1.add_time('a', 1.5)
+        stats_1.add_count('x', 3)
+        stats_2.add_time('a', 0.5)
+        stats_2.add_time('b', 2.0)
+        stats_2.add_count('x')
+        stats_1.merge(pickle.loads(pickle.dumps(stats_2)))  # as if from a worker process
+        self.assertEqual(stats_1.times, {'a': 2.0, 'b': 2.0})
+        self.assertEqual(stats_1.counts, {'x': 4})
+
+    def test_report(self):
+        stats = badread.run_stats.RunStats()
+        stats.add_time('sequence_fragment', 2.0)
+        stats.add_time('build_fragment', 1.0)
+        stats.add_count('kmer_draws', np.int64(10))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filename = os.path.join(temp_dir, 'report.json')
+            stats.write_report(filename, 3.5, 4)
+            with open(filename, 'rt') as f:
+                report = json.load(f)
+        self.assertEqual(report['wall_time'], 3.5)
+        self.assertEqual(report['threads'], 4)
+        self.assertEqual(list(report['stage_times']), ['build_fragment', 'sequence_fragment'])
+        self.assertEqual(report['counts'], {'kmer_draws': 10})
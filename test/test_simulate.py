@@ -21,10 +21,12 @@ import statistics
 import unittest
 
 import badread.simulate
+import badread.fast_engine
 import badread.identities
 import badread.error_model
 import badread.qscore_model
 import badread.misc
+import badread.rng
 
 
 VERBOSE = False  # Turn this on to see detailed read identity output
@@ -38,6 +40,7 @@ class TestPerfectSequenceFragment(unittest.TestCase):
         self.null = open(os.devnull, 'w')
         self.error_model = badread.error_model.ErrorModel('random', output=self.null)
         self.qscore_model = badread.qscore_model.QScoreModel('random', output=self.null)
+        self.rng = badread.rng.Rng()
 
     def tearDown(self):
         self.null.close()
@@ -45,7 +48,14 @@ class TestPerfectSequenceFragment(unittest.TestCase):
     def test_perfect_sequence_fragment(self):
         frag = 'GACCCAGTTTTTTTACTGATTCAGCGTAGGTGCTCTGATCTTCACGCATCTTTGACCGCC'
         seq, qual, _, _ = badread.simulate.sequence_fragment(frag, 1.0, self.error_model,
-                                                             self.qscore_model)
+                                                             self.qscore_model, self.rng)
+        self.assertEqual(frag, seq)
+        self.assertEqual(len(frag), len(qual))
+
+    def test_perfect_sequence_fragment_fast(self):
+        frag = 'GACCCAGTTTTTTTACTGATTCAGCGTAGGTGCTCTGATCTTCACGCATCTTTGACCGCC'
+        seq, qual, _, _ = badread.fast_engine.sequence_fragment_fast(frag, 1.0, self.error_model,
+                                                                     self.qscore_model, self.rng)
         self.assertEqual(frag, seq)
         self.assertEqual(len(frag), len(qual))
 
@@ -62,6 +72,8 @@ class TestSequenceFragment(unittest.TestCase):
         self.read_delta = 0.5
         self.mean_delta = 0.05
         self.repo_dir = pathlib.Path(__file__).parent.parent
+        self.sequence_func = badread.simulate.sequence_fragment
+        self.rng = badread.rng.Rng(0)
 
     def tearDown(self):
         self.null.close()
@@ -79,9 +91,9 @@ class TestSequenceFragment(unittest.TestCase):
 
         read_identities = []
         for i in range(self.trials):
-            frag = badread.misc.get_random_sequence(read_length)
-            seq, qual, _, _ = badread.simulate.sequence_fragment(frag, target_identity,
-                                                                 error_model, qscore_model)
+            frag = badread.misc.get_random_sequence(read_length, self.rng)
+            seq, qual, _, _ = self.sequence_func(frag, target_identity, error_model, qscore_model,
+                                              self.rng)
             cigar = edlib.align(frag, seq, task='path')['cigar']
             read_identity = badread.misc.identity_from_edlib_cigar(cigar)
             read_identities.append(read_identity)
@@ -159,3 +171,12 @@ class TestSequenceFragment(unittest.TestCase):
         for identity in self.identities_to_test:
             for read_length in self.read_lengths_to_test:
                 self.identity_test(identity, read_length, error_model, qscore_model)
+
+
+class TestFastSequenceFragment(TestSequenceFragment):
+    """
+    Runs the same identity tests using the fast (vectorised) sequencing engine.
+    """
+    def setUp(self):
+        super().setUp()
+        self.sequence_func = badread.fast_engine.sequence_fragment_fast
@@ -15,24 +15,39 @@ If not, see <http://www.gnu.org/licenses/>.
 """
 
 from io import StringIO
+import argparse
 import collections
+import gzip
+import json
 import os
+import shutil
+import tempfile
 import unittest
+import unittest.mock
 
 import badread.simulate
 import badread.identities
 import badread.error_model
 import badread.qscore_model
 import badread.misc
+import badread.settings
+from . import test_indexed_fasta
 
 
 def sequence(reference_filename, read_count=5000, mean_frag_length=100, small_plasmid_bias=False,
-             seed=None, mean_identity=85):
+             seed=None, mean_identity=85, threads=1, engine='standard',
+             read_alignment='edlib', ref_cache=False, output=None, output_buffer=4096,
+             output_dir=None, reads_per_file=4000, compress_shards=False, checkpoint=False,
+             resume=False, report=None, start_adapter='0,0', start_adapter_seq=''):
     quantity = mean_frag_length * read_count
     Args = collections.namedtuple('Args', ['reference', 'quantity',
                                            'mean_frag_length', 'frag_length_stdev',
                                            'mean_identity', 'max_identity', 'identity_stdev',
-                                           'error_model', 'qscore_model', 'seed',
+                                           'error_model', 'qscore_model', 'engine',
+                                           'read_alignment', 'ref_cache', 'seed',
+                                           'threads', 'output', 'output_buffer',
+                                           'output_dir', 'reads_per_file', 'compress_shards',
+                                           'checkpoint', 'resume', 'report',
                                            'start_adapter', 'end_adapter',
                                            'start_adapter_seq', 'end_adapter_seq',
                                            'junk_reads', 'random_reads', 'chimeras',
@@ -41,12 +56,18 @@ def sequence(reference_filename, read_count=5000, mean_frag_length=100, small_pl
     args = Args(reference=reference_filename, quantity=quantity,
                 mean_frag_length=mean_frag_length, frag_length_stdev=10,
                 mean_identity=mean_identity, max_identity=95, identity_stdev=5,
-                error_model='random', qscore_model='ideal', seed=seed,
-                start_adapter='0,0', end_adapter='0,0',
-                start_adapter_seq='', end_adapter_seq='',
+                error_model='random', qscore_model='ideal', engine=engine,
+                read_alignment=read_alignment, ref_cache=ref_cache, seed=seed,
+                threads=threads, output=output, output_buffer=output_buffer,
+                output_dir=output_dir, reads_per_file=reads_per_file,
+                compress_shards=compress_shards, checkpoint=checkpoint, resume=resume,
+                report=report,
+                start_adapter=start_adapter, end_adapter='0,0',
+                start_adapter_seq=start_adapter_seq, end_adapter_seq='',
                 junk_reads=0, random_reads=0, chimeras=0,
                 glitch_rate=0, glitch_size=0, glitch_skip=0,
                 small_plasmid_bias=small_plasmid_bias)
+    args = argparse.Namespace(**args._asdict())  # mutable, like parsed arguments
 
     with open(os.devnull, 'w') as null:
         badread.simulate.simulate(args, output=null)
@@ -176,6 +197,229 @@ class TestSimulate(unittest.TestCase):
         self.assertEqual(out3, out4)
         self.assertNotEqual(out1, out3)
 
+    def test_threads(self):
+        # With a seed, the output should be the same regardless of the number of threads.
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        with badread.misc.captured_output() as (out1, err1):
+            sequence(ref_filename, read_count=100, seed=1, threads=1)
+        out1, err1 = out1.getvalue().strip(), err1.getvalue().strip()
+        with badread.misc.captured_output() as (out2, err2):
+            sequence(ref_filename, read_count=100, seed=1, threads=3)
+        out2, err2 = out2.getvalue().strip(), err2.getvalue().strip()
+        self.assertEqual(out1, out2)
+        self.assertEqual(len(out1.splitlines()) % 4, 0)
+
+    def test_ref_cache(self):
+        # With a seed, reading fragments from the reference cache should give the same output as
+        # reading them from the FASTA.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            ref_filename = os.path.join(temp_dir, 'ref.fasta')
+            shutil.copyfile(os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta'),
+                            ref_filename)
+            with badread.misc.captured_output() as (out1, err1):
+                sequence(ref_filename, read_count=100, seed=1)
+            out1 = out1.getvalue().strip()
+            with badread.misc.captured_output() as (out2, err2):
+                sequence(ref_filename, read_count=100, seed=1, ref_cache=True)
+            out2 = out2.getvalue().strip()
+            self.assertTrue(os.path.isfile(ref_filename + '.badread_cache'))
+        self.assertEqual(out1, out2)
+
+    def test_indexed_reference(self):
+        # With a seed, reading fragments from an indexed FASTA should give the same output as
+        # loading the whole FASTA.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            ref_filename = os.path.join(temp_dir, 'ref.fasta')
+            seqs = badread.misc.load_fasta(os.path.join(os.path.dirname(__file__),
+                                                        'test_ref_2.fasta'))[0]
+            contigs = [(name, seq) for name, seq in seqs.items()]
+            test_indexed_fasta.write_fasta_and_fai(ref_filename, contigs, 70)
+            os.remove(ref_filename + '.fai')
+            with badread.misc.captured_output() as (out1, err1):
+                sequence(ref_filename, read_count=100, seed=1)
+            out1 = out1.getvalue().strip()
+            test_indexed_fasta.write_fasta_and_fai(ref_filename, contigs, 70)
+            with badread.misc.captured_output() as (out2, err2):
+                sequence(ref_filename, read_count=100, seed=1)
+            out2 = out2.getvalue().strip()
+            load_output = StringIO()
+            badread.simulate.load_reference(ref_filename, load_output)
+        self.assertTrue('using index' in load_output.getvalue())
+        self.assertEqual(out1, out2)
+
+    def test_output_file(self):
+        # Writing to a file (with any buffer size) should give the same reads as stdout.
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        with badread.misc.captured_output() as (out1, err1):
+            sequence(ref_filename, read_count=100, seed=1)
+        out1 = out1.getvalue()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for output_buffer in [0, 1, 4096]:
+                out_filename = os.path.join(temp_dir, 'reads.fastq')
+                with badread.misc.captured_output() as (out2, err2):
+                    sequence(ref_filename, read_count=100, seed=1, output=out_filename,
+                             output_buffer=output_buffer)
+                self.assertEqual(out2.getvalue(), '')
+                with open(out_filename, 'rt') as f:
+                    self.assertEqual(f.read(), out1)
+
+    def test_output_dir(self):
+        # The shards in an output directory should hold the same reads as stdout.
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        with badread.misc.captured_output() as (out1, err1):
+            sequence(ref_filename, read_count=100, seed=1)
+        out1 = out1.getvalue()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for compress_shards in [False, True]:
+                out_dir = os.path.join(temp_dir, str(compress_shards), 'reads')
+                with badread.misc.captured_output() as (out2, err2):
+                    sequence(ref_filename, read_count=100, seed=1, output_dir=out_dir,
+                             reads_per_file=30, compress_shards=compress_shards, threads=2)
+                self.assertEqual(out2.getvalue(), '')
+                filenames = sorted(os.listdir(out_dir))
+                open_func = gzip.open if compress_shards else open
+                self.assertTrue(all(f.endswith('.gz') == compress_shards for f in filenames))
+                shards = []
+                for f in filenames:
+                    with open_func(os.path.join(out_dir, f), 'rt') as shard:
+                        shards.append(shard.read())
+                self.assertEqual(''.join(shards), out1)
+                self.assertTrue(all(len(s.splitlines()) == 120 for s in shards[:-1]))
+
+    def test_resume(self):
+        # Extending a checkpointed run, or resuming one which wrote more after its checkpoint,
+        # should give the same output as a single run.
+        # A random adapter (made from the seed during setup) shouldn't count as a changed setting.
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        random_adapter = {'start_adapter': '100,100', 'start_adapter_seq': '20'}
+        for filename, options in [('reads.fastq', {}), ('reads.fastq.gz', {}),
+                                  ('reads.fastq', random_adapter)]:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                out_filename = os.path.join(temp_dir, filename)
+                with badread.misc.captured_output():
+                    sequence(ref_filename, read_count=200, seed=1, output=out_filename,
+                             **options)
+                with open(out_filename, 'rb') as f:
+                    single_run = f.read()
+                with badread.misc.captured_output():
+                    sequence(ref_filename, read_count=100, seed=1, output=out_filename,
+                             checkpoint=True, **options)
+                    sequence(ref_filename, read_count=150, seed=1, output=out_filename,
+                             resume=True, **options)
+                with open(out_filename, 'ab') as f:
+                    f.write(b'written after the checkpoint')
+                with badread.misc.captured_output():
+                    sequence(ref_filename, read_count=200, seed=1, output=out_filename,
+                             resume=True, **options)
+                with open(out_filename, 'rb') as f:
+                    self.assertEqual(f.read(), single_run)
+
+    def test_resume_changed_settings(self):
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            out_filename = os.path.join(temp_dir, 'reads.fastq')
+            with badread.misc.captured_output():
+                sequence(ref_filename, read_count=10, seed=1, output=out_filename,
+                         checkpoint=True)
+                with self.assertRaises(SystemExit) as cm:
+                    sequence(ref_filename, read_count=20, seed=2, output=out_filename,
+                             resume=True)
+        self.assertIn('seed', str(cm.exception))
+
+    def test_frequent_checkpoints(self):
+        # Checkpoints don't change the output, even with compression.
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            out_filename = os.path.join(temp_dir, 'reads.fastq.gz')
+            with badread.misc.captured_output():
+                sequence(ref_filename, read_count=2000, seed=1, output=out_filename)
+            with open(out_filename, 'rb') as f:
+                single_run = f.read()
+            with unittest.mock.patch.object(badread.settings, 'CHECKPOINT_INTERVAL', 0):
+                with badread.misc.captured_output():
+                    sequence(ref_filename, read_count=2000, seed=1, output=out_filename,
+                             checkpoint=True)
+            with open(out_filename, 'rb') as f:
+                self.assertEqual(f.read(), single_run)
+
+    def test_resume_output_dir(self):
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            def read_shards(out_dir):
+                shards = {}
+                for f in sorted(os.listdir(out_dir)):
+                    if not f.startswith('.'):
+                        with open(os.path.join(out_dir, f), 'rb') as shard:
+                            shards[f] = shard.read()
+                return shards
+            dir_1, dir_2 = os.path.join(temp_dir, 'out_1'), os.path.join(temp_dir, 'out_2')
+            with badread.misc.captured_output():
+                sequence(ref_filename, read_count=200, seed=1, output_dir=dir_1,
+                         reads_per_file=30, compress_shards=True)
+                sequence(ref_filename, read_count=100, seed=1, output_dir=dir_2,
+                         reads_per_file=30, compress_shards=True, checkpoint=True)
+                sequence(ref_filename, read_count=200, seed=1, output_dir=dir_2,
+                         reads_per_file=30, compress_shards=True, resume=True)
+            self.assertEqual(read_shards(dir_1), read_shards(dir_2))
+
+    def test_report(self):
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            count_names = {}
+            for engine, threads in [('standard', 1), ('fast', 2)]:
+                report_filename = os.path.join(temp_dir, 'report.json')
+                with badread.misc.captured_output() as (out, err):
+                    sequence(ref_filename, read_count=100, seed=1, engine=engine,
+                             threads=threads, report=report_filename)
+                with open(report_filename, 'rt') as f:
+                    report = json.load(f)
+                self.assertEqual(report['threads'], threads)
+                for stage in ['setup', 'build_fragment', 'build_fragment/add_glitches',
+                              'sequence_fragment', 'sequence_fragment/error_loop',
+                              'sequence_fragment/error_loop/edlib',
+                              'sequence_fragment/get_qscores/alignment',
+                              'sequence_fragment/get_qscores/sampling', 'output']:
+                    self.assertGreaterEqual(report['stage_times'][stage], 0.0)
+                counts = report['counts']
+                self.assertEqual(counts['reads_written'], len(out.getvalue().splitlines()) // 4)
+                self.assertGreaterEqual(counts['reads_made'], counts['reads_written'])
+                self.assertGreater(counts['kmer_draws'], 0)
+                self.assertEqual(counts['qscore_edlib_alignments'], counts['reads_made'])
+                self.assertLessEqual(counts['no_change_kmer_draws'], counts['kmer_draws'])
+                count_names[engine] = set(counts) - {'fast_engine_batches'}
+            # The engines' reports can be compared, counter for counter.
+            self.assertEqual(count_names['standard'], count_names['fast'])
+
+    def test_fast_engine(self):
+        # The fast engine should make a complete read set, deterministic with a seed.
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        with badread.misc.captured_output() as (out1, err1):
+            sequence(ref_filename, read_count=100, seed=1, engine='fast')
+        out1, err1 = out1.getvalue().strip(), err1.getvalue().strip()
+        with badread.misc.captured_output() as (out2, err2):
+            sequence(ref_filename, read_count=100, seed=1, engine='fast')
+        out2, err2 = out2.getvalue().strip(), err2.getvalue().strip()
+        self.assertEqual(out1, out2)
+        self.assertEqual(len(out1.splitlines()) % 4, 0)
+        self.assertGreater(len(out1.splitlines()), 20)
+
+    def test_read_alignment_from_edits(self):
+        # Building the read alignments from the added errors should make a complete read set,
+        # deterministic with a seed.
+        ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        for engine in ['standard', 'fast']:
+            with badread.misc.captured_output() as (out1, err1):
+                sequence(ref_filename, read_count=100, seed=1, engine=engine,
+                         read_alignment='edits')
+            out1 = out1.getvalue().strip()
+            with badread.misc.captured_output() as (out2, err2):
+                sequence(ref_filename, read_count=100, seed=1, engine=engine,
+                         read_alignment='edits')
+            out2 = out2.getvalue().strip()
+            self.assertEqual(out1, out2)
+            self.assertEqual(len(out1.splitlines()) % 4, 0)
+            self.assertGreater(len(out1.splitlines()), 20)
+
     def test_very_low_id(self):
         # If we ask for reads with extremely low id, Badread should do the best it can (not get
         # caught in an infinite loop).
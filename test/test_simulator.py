@@ -0,0 +1,103 @@
+"""
+This module contains some tests for Badread. To run them, execute `python3 -m unittest` from the
+root Badread directory.
+
+Copyright 2018 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Badread
+
+This file is part of Badread. Badread is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Badread is distributed
+in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Badread.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+
+import badread.__main__
+import badread.misc
+import badread.simulate
+
+
+class TestSimulator(unittest.TestCase):
+
+    def setUp(self):
+        self.ref_filename = os.path.join(os.path.dirname(__file__), 'test_ref_2.fasta')
+        self.options = {'seed': 3, 'length': '500,100', 'error_model': 'random',
+                        'qscore_model': 'ideal'}
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def simulator(self, **options):
+        return badread.simulate.Simulator(self.ref_filename, **{**self.options, **options})
+
+    def test_same_as_simulate(self):
+        reads = list(self.simulator().reads('5x'))
+        self.assertGreater(len(reads), 10)
+        output = os.path.join(self.temp_dir, 'reads.fastq')
+        args = badread.__main__.get_simulate_args(self.ref_filename, quantity='5x', output=output,
+                                                  **self.options)
+        with open(os.devnull, 'wt') as null:
+            badread.simulate.simulate(args, output=null)
+        with open(output, 'rt') as f:
+            expected = f.read()
+        self.assertEqual(''.join(f'@{name} {info}\n{seq}\n+\n{qual}\n'
+                                 for name, seq, qual, info in reads), expected)
+
+    def test_quantity(self):
+        simulator = self.simulator(quantity='2x')
+        total = sum(len(seq) for _, seq, _, _ in simulator.reads())
+        self.assertGreaterEqual(total, 2 * simulator.ref_size)
+        total = sum(len(seq) for _, seq, _, _ in simulator.reads(1000))
+        self.assertGreaterEqual(total, 1000)
+        self.assertLess(total, 1000 + 2000)
+
+    def test_calls_carry_on(self):
+        simulator = self.simulator()
+        first = list(itertools.islice(simulator.reads(), 5))
+        second = list(itertools.islice(simulator.reads(), 5))
+        self.assertEqual(first + second, list(itertools.islice(self.simulator().reads(), 10)))
+
+    def test_threads(self):
+        reads = list(itertools.islice(self.simulator().reads(), 20))
+        threaded = list(itertools.islice(self.simulator(threads=2).reads(), 20))
+        self.assertEqual(reads, threaded)
+
+    def test_nothing_printed(self):
+        with badread.misc.captured_output() as (out, err):
+            simulator = self.simulator()
+            _ = list(itertools.islice(simulator.reads(), 5))
+        self.assertEqual(out.getvalue(), '')
+        self.assertEqual(err.getvalue(), '')
+
+    def test_log(self):
+        log = io.StringIO()
+        badread.simulate.Simulator(self.ref_filename, log=log, **self.options)
+        self.assertIn('Loading reference from', log.getvalue())
+
+    def test_output_option(self):
+        # output is a simulate option like any other, not the log stream.
+        output = os.path.join(self.temp_dir, 'reads.fastq')
+        with badread.misc.captured_output() as (out, err):
+            simulator = self.simulator(output=output)
+            reads = list(itertools.islice(simulator.reads(), 5))
+        self.assertEqual(simulator.args.output, output)
+        self.assertEqual(len(reads), 5)
+        self.assertEqual(err.getvalue(), '')
+
+    def test_bad_option(self):
+        with self.assertRaises(ValueError) as cm:
+            self.simulator(not_an_option=1)
+        self.assertEqual(str(cm.exception), 'Error: not_an_option is not a simulate option')
+        with self.assertRaises(ValueError) as cm:
+            self.simulator(length='abc')
+        self.assertTrue(str(cm.exception).startswith('Error: '))